@@ -37,10 +37,21 @@ const ASSET_DATA = {
     }
 };
 
+// Factor order of the beta matrix
+const FACTORS = ['MktRF', 'SMB', 'HML', 'RMW'];
+
 // Global variables
 let allocationChart = null;
 let exposureChart = null;
 let currentResults = null;
+let currentUniverse = null;
+
+// Solver worker state: the latest solve wins, older messages are dropped
+let solverWorker;
+let workerUniverse = null;
+let latestSolve = { id: 0 };
+let latestMessage = null;
+let renderFrame = null;
 
 // Initialize the application
 document.addEventListener('DOMContentLoaded', function() {
@@ -65,8 +76,15 @@ function initializeSliders() {
         
         element.addEventListener('input', function() {
             valueElement.textContent = this.value;
+
+            // Once a portfolio is shown, re-solve live; the new solve cancels the one in flight
+            if (currentResults) optimizePortfolio();
         });
     });
+
+    document.getElementById('universe-size').addEventListener('change', function() {
+        if (currentResults) optimizePortfolio();
+    });
 }
 
 // Initialize event listeners
@@ -91,11 +109,11 @@ function toggleEducation() {
 }
 
 // Portfolio optimization function
-async function optimizePortfolio() {
-    // Show loading state
+function optimizePortfolio() {
     document.getElementById('initial-state').style.display = 'none';
-    document.getElementById('results-content').style.display = 'none';
-    document.getElementById('loading-state').style.display = 'flex';
+    if (!currentResults) {
+        document.getElementById('loading-state').style.display = 'flex';
+    }
 
     // Get target exposures and constraints
     const targets = {
@@ -110,157 +128,196 @@ async function optimizePortfolio() {
         minWeight: parseFloat(document.getElementById('min-weight').value) / 100
     };
 
-    // Simulate optimization delay
-    await new Promise(resolve => setTimeout(resolve, 1000));
+    const universe = getUniverse(parseInt(document.getElementById('universe-size').value, 10));
+    latestSolve = { id: latestSolve.id + 1, universe, targets };
 
-    try {
-        // Run optimization algorithm
-        const results = runOptimization(targets, constraints);
-        currentResults = results;
+    if (solverWorker === undefined) {
+        solverWorker = createSolverWorker();
+        if (solverWorker) solverWorker.onmessage = handleSolverMessage;
+    }
+
+    if (!solverWorker) {
+        // No worker support: solve on the main thread
+        try {
+            showResults(runOptimization(universe, targets, constraints), targets);
+        } catch (error) {
+            showSolverError(error.message);
+        }
+        return;
+    }
+
+    // Betas go to the worker once per universe; a copy is transferred so the page keeps its own
+    if (workerUniverse !== universe) {
+        const betas = universe.betas.slice();
+        solverWorker.postMessage({ type: 'universe', betas: betas.buffer, k: FACTORS.length }, [betas.buffer]);
+        workerUniverse = universe;
+    }
+    const target = Float64Array.from(FACTORS, f => targets[f]);
+    solverWorker.postMessage({
+        type: 'solve',
+        id: latestSolve.id,
+        target,
+        lb: constraints.minWeight,
+        ub: constraints.maxWeight
+    }, [target.buffer]);
+}
 
-        // Update UI with results
-        updateResults(results, targets);
+// Keep the newest iterate of the latest solve and draw it on the next frame,
+// so however fast iterates arrive the page renders at most once per frame
+function handleSolverMessage(event) {
+    const message = event.data;
+    if (message.id !== latestSolve.id) return;
 
-        // Show results
-        document.getElementById('loading-state').style.display = 'none';
-        document.getElementById('results-content').style.display = 'block';
+    if (message.type === 'error') {
+        showSolverError(message.message);
+        return;
+    }
 
-    } catch (error) {
-        console.error('Optimization failed:', error);
-        document.getElementById('loading-state').style.display = 'none';
-        alert('Optimization failed. Please try different parameters.');
+    latestMessage = message;
+    if (renderFrame === null) {
+        renderFrame = requestAnimationFrame(renderLatestIterate);
     }
 }
 
-// Optimization algorithm using iterative approach
-function runOptimization(targets, constraints) {
-    const tickers = ASSET_DATA.tickers;
-    const betas = ASSET_DATA.factorBetas;
-    const n = tickers.length;
-    
-    // Initialize equal weights
-    let weights = new Array(n).fill(1 / n);
-    
-    // Optimization parameters
-    const maxIterations = 1000;
-    const learningRate = 0.01;
-    const tolerance = 1e-6;
-    
-    for (let iter = 0; iter < maxIterations; iter++) {
-        // Calculate current portfolio exposures
-        const currentExposures = calculatePortfolioExposures(weights, tickers, betas);
-        
-        // Calculate gradients
-        const gradients = calculateGradients(weights, tickers, betas, targets, currentExposures);
-        
-        // Update weights
-        const newWeights = [...weights];
-        for (let i = 0; i < n; i++) {
-            newWeights[i] -= learningRate * gradients[i];
+function renderLatestIterate() {
+    renderFrame = null;
+    const message = latestMessage;
+    if (!message || message.id !== latestSolve.id) return;
+
+    const { universe, targets } = latestSolve;
+    const results = collectResults(universe, message.state, message.type === 'done');
+    showResults(results, targets);
+}
+
+// Display results and reveal the results panel
+function showResults(results, targets) {
+    currentResults = results;
+    updateResults(results, targets);
+    document.getElementById('loading-state').style.display = 'none';
+    document.getElementById('results-content').style.display = 'block';
+}
+
+// Report a failed solve: inline while a portfolio is shown, otherwise as an alert
+function showSolverError(message) {
+    console.error('Optimization failed:', message);
+    document.getElementById('loading-state').style.display = 'none';
+    if (currentResults) {
+        const report = document.getElementById('convergence-report');
+        report.className = 'status status--error';
+        report.textContent = `Optimization failed: ${message}`;
+    } else {
+        document.getElementById('initial-state').style.display = '';
+        alert(`Optimization failed: ${message}`);
+    }
+}
+
+// Asset universe: the sample assets plus optional synthetic ones, betas as a
+// row-major Float64Array (one row of FACTORS.length betas per asset)
+function getUniverse(syntheticCount) {
+    if (currentUniverse && currentUniverse.syntheticCount === syntheticCount) {
+        return currentUniverse;
+    }
+
+    const k = FACTORS.length;
+    const sample = ASSET_DATA.tickers;
+    const n = sample.length + syntheticCount;
+    const tickers = sample.slice();
+    const betas = new Float64Array(n * k);
+
+    sample.forEach((ticker, i) => {
+        for (let j = 0; j < k; j++) {
+            betas[i * k + j] = ASSET_DATA.factorBetas[ticker][FACTORS[j]];
+        }
+    });
+
+    // Synthetic assets perturb the sample betas, reproducibly
+    const random = seededRandom(42);
+    for (let i = sample.length; i < n; i++) {
+        const base = Math.floor(random() * sample.length);
+        tickers.push(`SYN${String(i - sample.length + 1).padStart(5, '0')}`);
+        for (let j = 0; j < k; j++) {
+            betas[i * k + j] = betas[base * k + j] + 0.15 * (random() - 0.5);
         }
-        
-        // Apply constraints
-        applyConstraints(newWeights, constraints);
-        
-        // Check convergence
-        const diff = weights.reduce((sum, w, i) => sum + Math.abs(w - newWeights[i]), 0);
-        weights = newWeights;
-        
-        if (diff < tolerance) break;
     }
-    
+
+    currentUniverse = { tickers, betas, syntheticCount };
+    return currentUniverse;
+}
+
+// Small deterministic PRNG (mulberry32)
+function seededRandom(seed) {
+    let state = seed >>> 0;
+    return function() {
+        state = (state + 0x6D2B79F5) >>> 0;
+        let t = state;
+        t = Math.imul(t ^ (t >>> 15), t | 1);
+        t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+        return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+    };
+}
+
+// Betas of one asset as a { factor: beta } object, for display
+function assetBetas(betas, i) {
+    const k = FACTORS.length;
+    const result = {};
+    FACTORS.forEach((factor, j) => {
+        result[factor] = betas[i * k + j];
+    });
+    return result;
+}
+
+// Optimize on the main thread, then collect the results for display
+function runOptimization(universe, targets, constraints) {
+    const target = Float64Array.from(FACTORS, f => targets[f]);
+    const solution = solveExposureQP(universe.betas, target, constraints.minWeight, constraints.maxWeight);
+    return collectResults(universe, solution, true);
+}
+
+// Holdings, exposures and convergence of a solver state, final or intermediate
+function collectResults(universe, solution, final) {
+    const { tickers, betas } = universe;
+    const weights = solution.weights;
+
     // Filter out zero weights for cleaner results
     const filteredResults = [];
-    for (let i = 0; i < n; i++) {
+    for (let i = 0; i < weights.length; i++) {
         if (weights[i] > 0.001) { // Only include weights > 0.1%
             filteredResults.push({
                 ticker: tickers[i],
                 weight: weights[i],
-                betas: betas[tickers[i]]
+                betas: assetBetas(betas, i)
             });
         }
     }
     
     // Sort by weight descending
     filteredResults.sort((a, b) => b.weight - a.weight);
+
+    const exposures = {};
+    FACTORS.forEach((factor, j) => {
+        exposures[factor] = solution.exposures[j];
+    });
     
     return {
         assets: filteredResults,
-        exposures: calculatePortfolioExposures(weights, tickers, betas),
-        trackingError: calculateTrackingError(weights, tickers, betas, targets)
-    };
-}
-
-// Calculate portfolio factor exposures
-function calculatePortfolioExposures(weights, tickers, betas) {
-    const exposures = { MktRF: 0, SMB: 0, HML: 0, RMW: 0 };
-    
-    for (let i = 0; i < weights.length; i++) {
-        const tickerBetas = betas[tickers[i]];
-        exposures.MktRF += weights[i] * tickerBetas.MktRF;
-        exposures.SMB += weights[i] * tickerBetas.SMB;
-        exposures.HML += weights[i] * tickerBetas.HML;
-        exposures.RMW += weights[i] * tickerBetas.RMW;
-    }
-    
-    return exposures;
-}
-
-// Calculate gradients for optimization
-function calculateGradients(weights, tickers, betas, targets, currentExposures) {
-    const n = weights.length;
-    const gradients = new Array(n).fill(0);
-    
-    for (let i = 0; i < n; i++) {
-        const tickerBetas = betas[tickers[i]];
-        
-        // Gradient of squared error with respect to weight i
-        gradients[i] = 2 * (
-            (currentExposures.MktRF - targets.MktRF) * tickerBetas.MktRF +
-            (currentExposures.SMB - targets.SMB) * tickerBetas.SMB +
-            (currentExposures.HML - targets.HML) * tickerBetas.HML +
-            (currentExposures.RMW - targets.RMW) * tickerBetas.RMW
-        );
-    }
-    
-    return gradients;
-}
-
-// Apply portfolio constraints
-function applyConstraints(weights, constraints) {
-    const n = weights.length;
-    
-    // Apply min/max weight constraints
-    for (let i = 0; i < n; i++) {
-        weights[i] = Math.max(constraints.minWeight, Math.min(constraints.maxWeight, weights[i]));
-    }
-    
-    // Normalize to sum to 1
-    const sum = weights.reduce((s, w) => s + w, 0);
-    if (sum > 0) {
-        for (let i = 0; i < n; i++) {
-            weights[i] /= sum;
+        exposures,
+        trackingError: Math.sqrt(solution.objective),
+        universeSize: tickers.length,
+        convergence: {
+            final,
+            converged: solution.converged,
+            iterations: solution.iterations,
+            newtonSteps: solution.newtonSteps,
+            gap: solution.gap,
+            solveTime: solution.solveTime
         }
-    }
-}
-
-// Calculate tracking error
-function calculateTrackingError(weights, tickers, betas, targets) {
-    const exposures = calculatePortfolioExposures(weights, tickers, betas);
-    
-    const error = Math.sqrt(
-        Math.pow(exposures.MktRF - targets.MktRF, 2) +
-        Math.pow(exposures.SMB - targets.SMB, 2) +
-        Math.pow(exposures.HML - targets.HML, 2) +
-        Math.pow(exposures.RMW - targets.RMW, 2)
-    );
-    
-    return error;
+    };
 }
 
 // Update UI with optimization results
 function updateResults(results, targets) {
     updateAllocationChart(results.assets);
+    updateConvergenceReport(results);
     updateExposureChart(results.exposures, targets);
     updateWeightsTable(results.assets);
     updateExposureTable(results.exposures, targets);
@@ -269,21 +326,34 @@ function updateResults(results, targets) {
 
 // Update allocation pie chart
 function updateAllocationChart(assets) {
-    const ctx = document.getElementById('allocation-chart').getContext('2d');
-    
+    const colors = ['#1FB8CD', '#FFC185', '#B4413C', '#ECEBD5', '#5D878F', '#DB4545', '#D2BA4C', '#964325', '#944454', '#13343B'];
+
+    // Large universes can hold many small positions; group those beyond the top slices
+    const slices = assets.slice(0, colors.length - 1);
+    if (assets.length > colors.length) {
+        const other = assets.slice(colors.length - 1).reduce((sum, a) => sum + a.weight, 0);
+        slices.push({ ticker: `Other (${assets.length - slices.length})`, weight: other });
+    } else if (assets.length === colors.length) {
+        slices.push(assets[colors.length - 1]);
+    }
+
+    // Streamed iterates update the chart in place, without animation
     if (allocationChart) {
-        allocationChart.destroy();
+        allocationChart.data.labels = slices.map(a => a.ticker);
+        allocationChart.data.datasets[0].data = slices.map(a => a.weight * 100);
+        allocationChart.data.datasets[0].backgroundColor = colors.slice(0, slices.length);
+        allocationChart.update('none');
+        return;
     }
-    
-    const colors = ['#1FB8CD', '#FFC185', '#B4413C', '#ECEBD5', '#5D878F', '#DB4545', '#D2BA4C', '#964325', '#944454', '#13343B'];
-    
+
+    const ctx = document.getElementById('allocation-chart').getContext('2d');
     allocationChart = new Chart(ctx, {
         type: 'pie',
         data: {
-            labels: assets.map(a => a.ticker),
+            labels: slices.map(a => a.ticker),
             datasets: [{
-                data: assets.map(a => a.weight * 100),
-                backgroundColor: colors.slice(0, assets.length),
+                data: slices.map(a => a.weight * 100),
+                backgroundColor: colors.slice(0, slices.length),
                 borderWidth: 2,
                 borderColor: '#ffffff'
             }]
@@ -320,16 +390,18 @@ function updateAllocationChart(assets) {
 
 // Update factor exposure comparison chart
 function updateExposureChart(exposures, targets) {
-    const ctx = document.getElementById('exposure-chart').getContext('2d');
-    
-    if (exposureChart) {
-        exposureChart.destroy();
-    }
-    
     const factors = ['MktRF', 'SMB', 'HML', 'RMW'];
     const targetData = factors.map(f => targets[f]);
     const portfolioData = factors.map(f => exposures[f]);
-    
+
+    if (exposureChart) {
+        exposureChart.data.datasets[0].data = targetData;
+        exposureChart.data.datasets[1].data = portfolioData;
+        exposureChart.update('none');
+        return;
+    }
+
+    const ctx = document.getElementById('exposure-chart').getContext('2d');
     exposureChart = new Chart(ctx, {
         type: 'bar',
         data: {
@@ -379,6 +451,24 @@ function updateExposureChart(exposures, targets) {
     });
 }
 
+// Report whether the solver certified optimality, and how fast
+function updateConvergenceReport(results) {
+    const report = document.getElementById('convergence-report');
+    const { final, converged, iterations, newtonSteps, gap, solveTime } = results.convergence;
+
+    if (!final) {
+        report.className = 'status status--info';
+        report.textContent = `Solving: ${results.universeSize.toLocaleString()} assets, ` +
+            `${iterations} proximal iterations so far, duality gap ${gap.toExponential(1)}`;
+        return;
+    }
+    report.className = `status ${converged ? 'status--success' : 'status--warning'}`;
+    report.textContent = `${converged ? 'Optimal' : 'Not converged'}: ` +
+        `${results.universeSize.toLocaleString()} assets in ${solveTime.toFixed(1)} ms, ` +
+        `${iterations} proximal iterations, ${newtonSteps} Newton steps, ` +
+        `duality gap ${gap.toExponential(1)}`;
+}
+
 // Update portfolio weights table
 function updateWeightsTable(assets) {
     const tbody = document.querySelector('#weights-table tbody');
@@ -0,0 +1,65 @@
+# Computational core of the Fama-French 4-factor portfolio optimizer
+#
+# Submodules are imported on first attribute access, so importing the package
+# (or one submodule, as process pool workers do) only loads what is used.
+import importlib
+
+_EXPORTS = {
+    'FACTOR_COLS': 'betas',
+    'RF_COL': 'betas',
+    'BETA_METHODS': 'betas',
+    'ols_fit': 'betas',
+    'shrinkage_fit': 'betas',
+    'ridge_fit': 'betas',
+    'huber_fit': 'betas',
+    'fit_factor_model': 'betas',
+    'compute_factor_betas': 'betas',
+    'rolling_ols': 'betas',
+    'rolling_factor_betas': 'betas',
+    'project_bounded_simplex': 'optimizer',
+    'solve_exposure_qp': 'optimizer',
+    'solve_rebalance_qp': 'optimizer',
+    'solve_tracking_qp': 'optimizer',
+    'solve_cardinality_qp': 'optimizer',
+    'solve_diversified_qp': 'optimizer',
+    'solve_constrained_qp': 'optimizer',
+    'optimize_portfolio': 'optimizer',
+    'optimize_portfolio_batch': 'optimizer',
+    'LinearConstraints': 'constraints',
+    'portfolio_objective': 'objectives',
+    'portfolio_constraints': 'objectives',
+    'check_derivatives': 'objectives',
+    'FactorRiskModel': 'risk',
+    'compute_frontier': 'frontier',
+    'EfficientFrontier': 'frontier',
+    'run_backtest': 'backtest',
+    'bootstrap_portfolio': 'bootstrap',
+    'DataCache': 'data',
+    'ConcurrentPriceFetcher': 'data',
+    'PanelStore': 'store',
+    'BetaCache': 'store',
+    'data_vintage': 'store',
+    'build_return_panels': 'pipeline',
+    'SolveCache': 'solve_cache',
+    'betas_key': 'solve_cache',
+    'add_sink': 'metrics',
+    'remove_sink': 'metrics',
+    'MetricsRegistry': 'metrics',
+    'JSONLogSink': 'metrics',
+    'PrometheusTextSink': 'metrics'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
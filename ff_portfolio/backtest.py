@@ -0,0 +1,195 @@
+# Historical backtest of the beta estimation + optimization pipeline
+import os
+
+import numpy as np
+import pandas as pd
+
+from .betas import FACTOR_COLS, RF_COL, rolling_ols
+from .optimizer import solve_exposure_qp
+from .shared import arrays, map_shared
+
+
+def _solve_dates(dates_idx, window, target, lb, ub):
+    """
+    Estimate trailing betas and solve target-exposure weights for a block of
+    consecutive rebalance rows
+
+    The block is contiguous, so betas come from one incremental rolling_ols
+    pass over the rows it needs rather than a refit per date. Missing
+    returns enter the pass as zeros; the assets they belong to are left out
+    of every date whose window they fall in, so their betas are never used.
+    """
+    X = arrays['X']
+    Y = arrays['Y']
+    first, last = dates_idx[0], dates_idx[-1]
+    start = first - window + 1
+    fit = rolling_ols(X[start:last + 1], np.nan_to_num(Y[start:last + 1]), window=window)
+
+    n_assets = Y.shape[1]
+    weights = np.full((len(dates_idx), n_assets), np.nan)
+    betas = np.full((len(dates_idx), n_assets, X.shape[1]), np.nan)
+    converged = np.zeros(len(dates_idx), dtype=bool)
+    w = None
+    for j, i in enumerate(dates_idx):
+        # Only assets with a return in every month of the lookback window
+        eligible = np.flatnonzero(np.isfinite(Y[i - window + 1:i + 1]).all(axis=0))
+        if np.sum(lb[eligible]) > 1.0 + 1e-12 or np.sum(ub[eligible]) < 1.0 - 1e-12:
+            continue
+        B = fit['betas'][i - start][eligible]
+        result = solve_exposure_qp(B, target, lb[eligible], ub[eligible],
+                                   w0=None if w is None else w[eligible])
+        w = np.zeros(n_assets)
+        w[eligible] = result['weights']
+        weights[j] = w
+        betas[j, eligible] = B
+        converged[j] = result['converged']
+    return dates_idx, weights, betas, converged
+
+
+def _monthly_calendar(returns, factors, factor_cols, rf_col):
+    """
+    Returns and factors on a gap-free monthly calendar
+
+    Months missing from either frame become rows of NaN rather than being
+    dropped, so row i + 1 is always the calendar month after row i.
+
+    Returns:
+    tuple: (X (T, K), excess Y (T, N), raw returns (T, N), dates) where
+           dates holds the original returns index label of each month, NaT
+           where returns has no row
+    """
+    return_months = pd.DatetimeIndex(returns.index).to_period('M')
+    factor_months = pd.DatetimeIndex(factors.index).to_period('M')
+    if return_months.has_duplicates or factor_months.has_duplicates:
+        raise ValueError("run_backtest needs monthly data with one row per month")
+    calendar = pd.period_range(max(return_months.min(), factor_months.min()),
+                               min(return_months.max(), factor_months.max()), freq='M')
+
+    raw_returns = returns.set_axis(return_months).reindex(calendar).to_numpy(dtype=float)
+    aligned = factors.set_axis(factor_months).reindex(calendar)
+    X = aligned[factor_cols].to_numpy(dtype=float)
+    rf = aligned[rf_col].to_numpy(dtype=float)
+    Y = raw_returns - rf[:, None]
+    # Months without complete factors cannot be regressed on
+    Y[~np.isfinite(X).all(axis=1) | ~np.isfinite(rf)] = np.nan
+    dates = pd.Series(returns.index, index=return_months).reindex(calendar)
+    return X, Y, raw_returns, pd.DatetimeIndex(dates)
+
+
+def _windows_complete(finite, window):
+    """Rows t whose trailing window [t - window + 1, t] is finite throughout, per column"""
+    counts = np.cumsum(np.concatenate([np.zeros((1,) + finite.shape[1:]), finite]), axis=0)
+    complete = np.zeros(finite.shape, dtype=bool)
+    complete[window - 1:] = counts[window:] - counts[:-window] == window
+    return complete
+
+
+def _contiguous_blocks(rows, block_size):
+    """Split sorted rows into runs of consecutive rows, each cut into blocks of block_size"""
+    runs = np.split(rows, np.flatnonzero(np.diff(rows) != 1) + 1)
+    return [run[i:i + block_size] for run in runs for i in range(0, len(run), block_size)]
+
+
+def run_backtest(returns, factors, target_exposures, window=36, max_weight=1.0, min_weight=0.0,
+                 max_workers=None, block_size=12, factor_cols=FACTOR_COLS, rf_col=RF_COL):
+    """
+    Backtest the target-exposure portfolio through history
+
+    The backtest runs on the full monthly calendar. At every month-end
+    whose trailing `window` months have complete factor data, betas are
+    estimated for the assets with a return in each of those months, and
+    only those assets are eligible, so names that list or delist later are
+    neither dropped from history nor required to survive. Weights are
+    solved for the target exposures and held over the following calendar
+    month. A held asset without a return that month (e.g. delisted)
+    contributes zero, as its delisting return is unknown.
+
+    Rebalance dates are independent, so they are split into contiguous
+    blocks and spread across a process pool. The factor and excess-return
+    matrices are placed in shared memory once and mapped by every worker
+    instead of being pickled with each task.
+
+    Parameters:
+    returns (DataFrame): Monthly returns for each asset, one row per month
+    factors (DataFrame): Monthly Fama-French factor returns including RF
+    target_exposures (dict): Target factor exposures
+    window (int): Trailing estimation window in months
+    max_weight (float): Maximum weight per asset
+    min_weight (float): Minimum weight per asset
+    max_workers (int): Worker processes; 1 runs in the calling process
+    block_size (int): Consecutive rebalance dates per task. Fixed blocks keep
+                      the results independent of the number of workers
+    factor_cols (list): Factor columns used as regressors
+    rf_col (str): Risk-free column subtracted from returns
+
+    Returns:
+    dict: 'weights' (DataFrame, 0 for ineligible assets), 'portfolio_returns'
+          (Series, next-month realized return), 'turnover' (Series),
+          'exposure_drift' (DataFrame, pre-trade exposure minus target),
+          'eligible' (Series, number of eligible assets) and 'converged'
+          (Series), all indexed by rebalance date. Dates where the weight
+          bounds cannot be met by the eligible assets have NaN weights and
+          converged False
+    """
+    X, Y, raw_returns, dates = _monthly_calendar(returns, factors, factor_cols, rf_col)
+    n_obs, n_assets = Y.shape
+    target = np.array([target_exposures.get(col, 0.0) for col in factor_cols])
+    lb = np.broadcast_to(np.asarray(min_weight, dtype=float), (n_assets,)).copy()
+    ub = np.broadcast_to(np.asarray(max_weight, dtype=float), (n_assets,)).copy()
+
+    # Rebalance at each month with complete factors over the window, at least
+    # one eligible asset and a following calendar month to hold
+    eligible = _windows_complete(np.isfinite(Y), window)
+    factors_complete = _windows_complete(np.isfinite(X).all(axis=1), window)
+    rebalance_idx = np.flatnonzero(factors_complete & eligible.any(axis=1))
+    rebalance_idx = rebalance_idx[rebalance_idx < n_obs - 1]
+    if len(rebalance_idx) == 0:
+        raise ValueError(f"Need more than {window} months of complete data for a {window}-month window")
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    blocks = _contiguous_blocks(rebalance_idx, block_size)
+    position = {row: j for j, row in enumerate(rebalance_idx)}
+
+    weights = np.empty((len(rebalance_idx), n_assets))
+    betas = np.empty((len(rebalance_idx), n_assets, len(factor_cols)))
+    converged = np.empty(len(rebalance_idx), dtype=bool)
+
+    def collect(output):
+        block_idx, block_weights, block_betas, block_converged = output
+        rows = [position[row] for row in block_idx]
+        weights[rows] = block_weights
+        betas[rows] = block_betas
+        converged[rows] = block_converged
+
+    tasks = [(block, window, target, lb, ub) for block in blocks]
+    for output in map_shared(_solve_dates, tasks, {'X': X, 'Y': Y}, max_workers):
+        collect(output)
+
+    # Realized returns over the next calendar month
+    held = np.nan_to_num(raw_returns[rebalance_idx + 1])
+    portfolio_returns = np.einsum('ij,ij->i', weights, held)
+
+    # Weights drifted by the holding-period returns, compared at the next rebalance.
+    # Only consecutive months compare; after a skipped month the old book is unknown
+    consecutive = np.diff(rebalance_idx) == 1
+    drifted = weights[:-1] * (1.0 + held[:-1]) / (1.0 + portfolio_returns[:-1, None])
+    drifted[~consecutive] = np.nan
+    turnover = np.empty(len(rebalance_idx))
+    turnover[0] = np.abs(weights[0]).sum()
+    turnover[1:] = np.abs(weights[1:] - drifted).sum(axis=1)
+
+    # A held asset without a beta at the next rebalance leaves the exposure unknown
+    held_betas = np.where(drifted[:, :, None] != 0, betas[1:], 0.0)
+    drift = np.full((len(rebalance_idx), len(factor_cols)), np.nan)
+    drift[1:] = np.einsum('tnk,tn->tk', held_betas, drifted) - target
+
+    rebalance_dates = dates[rebalance_idx]
+    return {
+        'weights': pd.DataFrame(weights, index=rebalance_dates, columns=returns.columns),
+        'portfolio_returns': pd.Series(portfolio_returns, index=rebalance_dates),
+        'turnover': pd.Series(turnover, index=rebalance_dates),
+        'exposure_drift': pd.DataFrame(drift, index=rebalance_dates, columns=factor_cols),
+        'eligible': pd.Series(eligible[rebalance_idx].sum(axis=1), index=rebalance_dates),
+        'converged': pd.Series(converged, index=rebalance_dates)
+    }
@@ -0,0 +1,272 @@
+# Offline benchmark of beta estimation and portfolio optimization scaling
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from . import optimizer
+from .betas import FACTOR_COLS, RF_COL, compute_factor_betas
+
+# Factor names beyond the 4-factor model, used when benchmarking wider models
+EXTRA_FACTOR_COLS = ['CMA', 'MOM', 'STR', 'LTR']
+
+DEFAULT_ASSETS = (39, 500, 2000, 10000)
+DEFAULT_TARGETS = {'Mkt-RF': 1.0, 'SMB': 0.2, 'HML': 0.3, 'RMW': 0.1}
+
+# Reference results for the default sizes, regenerate with --output after intended changes.
+# Its timings and memory are from one machine, so only its convergence and
+# evaluation counts are checked by default
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'bench_baseline.json')
+
+
+def create_synthetic_data(n_assets=39, n_months=36, n_factors=4, seed=42):
+    """
+    Create synthetic returns and factors in the style of create_sample_data
+
+    Returns are generated from a factor model with known betas, so the
+    estimated betas can be checked against the truth.
+
+    Parameters:
+    n_assets (int): Number of assets
+    n_months (int): Number of monthly observations
+    n_factors (int): Number of factors, the first four being FACTOR_COLS
+    seed (int): Random seed
+
+    Returns:
+    tuple: (returns DataFrame, factors DataFrame, true betas DataFrame)
+    """
+    factor_cols = (FACTOR_COLS + EXTRA_FACTOR_COLS)[:n_factors]
+    if len(factor_cols) < n_factors:
+        factor_cols += [f'F{i + 1}' for i in range(len(factor_cols), n_factors)]
+
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start='2000-01-01', periods=n_months, freq='ME')
+    tickers = [f'A{i:05d}' for i in range(n_assets)]
+
+    # Factor returns with the same scale as create_sample_data
+    means = np.array([0.008, 0.002, 0.001, 0.001] + [0.001] * (n_factors - 4))[:n_factors]
+    stds = np.array([0.04, 0.03, 0.03, 0.02] + [0.02] * (n_factors - 4))[:n_factors]
+    factor_values = rng.normal(means, stds, (n_months, n_factors))
+    rf = rng.normal(0.002, 0.005, n_months)
+
+    true_betas = rng.normal(0.0, 0.5, (n_assets, n_factors))
+    true_betas[:, 0] += 1.0
+    noise = rng.normal(0.0, 0.03, (n_months, n_assets))
+    returns = rf[:, None] + factor_values @ true_betas.T + noise
+
+    factors_df = pd.DataFrame(factor_values, index=dates, columns=factor_cols)
+    factors_df[RF_COL] = rf
+    returns_df = pd.DataFrame(returns, index=dates, columns=tickers)
+    betas_df = pd.DataFrame(true_betas, index=tickers, columns=factor_cols)
+    return returns_df, factors_df, betas_df
+
+
+@contextlib.contextmanager
+def _count_calls(module, name):
+    """Count calls to module.name while the context is active"""
+    original = getattr(module, name)
+    counter = {'calls': 0}
+
+    def counted(*args, **kwargs):
+        counter['calls'] += 1
+        return original(*args, **kwargs)
+
+    setattr(module, name, counted)
+    try:
+        yield counter
+    finally:
+        setattr(module, name, original)
+
+
+def _measure(func, repeats):
+    """Best wall time over repeats and peak traced memory of one call"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, min(times), peak
+
+
+def bench_case(n_assets, n_months=60, n_factors=4, max_weight=0.25, repeats=3, seed=42):
+    """
+    Time beta estimation and optimization for one problem size
+
+    Objective evaluations are counted as the number of projections onto the
+    bounded simplex, one per primal or dual function evaluation in the solver.
+
+    Returns:
+    dict: Problem size, wall times (seconds), peak memory (bytes),
+          evaluation counts and solution quality
+    """
+    returns, factors, true_betas = create_synthetic_data(n_assets, n_months, n_factors, seed)
+    factor_cols = list(true_betas.columns)
+    targets = {col: DEFAULT_TARGETS.get(col, 0.0) for col in factor_cols}
+    # Keep the bounds feasible for small universes
+    max_weight = max(max_weight, 1.0 / n_assets)
+
+    (betas, _, r_squareds), beta_time, beta_peak = _measure(
+        lambda: compute_factor_betas(returns, factors, factor_cols=factor_cols), repeats)
+    beta_rmse = float(np.sqrt(np.mean((betas.to_numpy() - true_betas.to_numpy()) ** 2)))
+
+    B = betas.to_numpy()
+    target_array = np.array([targets[col] for col in factor_cols])
+    solve = lambda: optimizer.solve_exposure_qp(B, target_array, lb=0.0, ub=max_weight)
+    result, opt_time, opt_peak = _measure(solve, repeats)
+    with _count_calls(optimizer, 'project_bounded_simplex') as counter:
+        solve()
+
+    w = result['weights']
+    return {
+        'n_assets': n_assets,
+        'n_months': n_months,
+        'n_factors': n_factors,
+        'max_weight': max_weight,
+        'estimation': {
+            'wall_time': beta_time,
+            'peak_memory': beta_peak,
+            'beta_rmse': beta_rmse,
+            'mean_r_squared': float(r_squareds.mean())
+        },
+        'optimization': {
+            'wall_time': opt_time,
+            'peak_memory': opt_peak,
+            'objective_evaluations': counter['calls'],
+            'iterations': result['iterations'],
+            'newton_steps': result['newton_steps'],
+            'converged': result['converged'],
+            'tracking_error': float(np.sqrt(result['objective'])),
+            'duality_gap': result['gap'],
+            'budget_error': float(abs(np.sum(w) - 1.0)),
+            'bound_violation': float(max(0.0, -w.min(), w.max() - max_weight))
+        }
+    }
+
+
+def run_benchmarks(assets=DEFAULT_ASSETS, n_months=60, n_factors=4, max_weight=0.25,
+                   repeats=3, seed=42):
+    """
+    Run bench_case over a range of universe sizes
+
+    Returns:
+    dict: 'environment' and one entry per size under 'cases'
+    """
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'settings': {'n_months': n_months, 'n_factors': n_factors, 'max_weight': max_weight,
+                     'repeats': repeats, 'seed': seed},
+        'cases': [bench_case(n, n_months, n_factors, max_weight, repeats, seed) for n in assets]
+    }
+
+
+def compare_results(current, baseline, tolerance=1.5, timings=True):
+    """
+    Find cases where wall time or peak memory grew beyond tolerance x baseline
+
+    The number of objective evaluations is held to the same tolerance, and
+    a case that converged in the baseline must still converge. Timings and
+    memory only compare between runs on the same machine; with
+    timings=False they are skipped.
+
+    Parameters:
+    current, baseline (dict): Results of run_benchmarks
+    tolerance (float): Allowed growth factor
+    timings (bool): Also compare wall_time and peak_memory
+
+    Returns:
+    list: Human readable descriptions of the regressions
+    """
+    baseline_cases = {(c['n_assets'], c['n_months'], c['n_factors']): c for c in baseline['cases']}
+    regressions = []
+    for case in current['cases']:
+        old = baseline_cases.get((case['n_assets'], case['n_months'], case['n_factors']))
+        if old is None:
+            continue
+        checks = [('optimization', 'objective_evaluations')]
+        if timings:
+            checks = [(stage, metric) for stage in ('estimation', 'optimization')
+                      for metric in ('wall_time', 'peak_memory')] + checks
+        for stage, metric in checks:
+            if metric not in case[stage] or metric not in old[stage]:
+                continue
+            new_value, old_value = case[stage][metric], old[stage][metric]
+            if old_value > 0 and new_value > tolerance * old_value:
+                regressions.append(
+                    f"{stage} {metric} at {case['n_assets']} assets: "
+                    f"{old_value:.4g} -> {new_value:.4g}"
+                )
+        if old['optimization']['converged'] and not case['optimization']['converged']:
+            regressions.append(f"optimization no longer converges at {case['n_assets']} assets")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark beta estimation and optimization scaling")
+    parser.add_argument('--assets', type=int, nargs='+', default=list(DEFAULT_ASSETS))
+    parser.add_argument('--months', type=int, default=60)
+    parser.add_argument('--factors', type=int, default=4)
+    parser.add_argument('--max-weight', type=float, default=0.25)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--baseline', nargs='?', const=BASELINE_PATH,
+                        help="Previous JSON results to check for regressions. Without a path, the "
+                             "committed reference for the default sizes, checked for convergence "
+                             "and evaluation counts only")
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help="Allowed slowdown factor against the baseline")
+    parser.add_argument('--timings', action=argparse.BooleanOptionalAction, default=None,
+                        help="Compare wall time and peak memory; on by default except against "
+                             "the committed reference")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.assets, args.months, args.factors, args.max_weight,
+                             args.repeats, args.seed)
+
+    for case in results['cases']:
+        est, opt = case['estimation'], case['optimization']
+        print(f"{case['n_assets']:>6} assets | betas {est['wall_time'] * 1e3:8.2f} ms "
+              f"{est['peak_memory'] / 1e6:7.1f} MB | optimize {opt['wall_time'] * 1e3:8.2f} ms "
+              f"{opt['peak_memory'] / 1e6:7.1f} MB {opt['objective_evaluations']:5d} evals "
+              f"TE {opt['tracking_error']:.2e} {'ok' if opt['converged'] else 'NOT CONVERGED'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        timings = args.timings
+        if timings is None:
+            timings = os.path.abspath(args.baseline) != BASELINE_PATH
+        regressions = compare_results(results, baseline, args.tolerance, timings)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
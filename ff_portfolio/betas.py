@@ -0,0 +1,406 @@
+# Factor beta estimation for the Fama-French 4-factor model
+import numpy as np
+import pandas as pd
+
+from . import metrics
+
+# The 4-factor model columns and the risk-free column used for excess returns
+FACTOR_COLS = ['Mkt-RF', 'SMB', 'HML', 'RMW']
+RF_COL = 'RF'
+
+
+def ols_fit(X, Y):
+    """
+    Fit alpha plus factor betas for every asset at once
+
+    All assets share the same factor design matrix, so it is factorized a
+    single time (QR of [1, X]) and every column of Y is solved against it.
+
+    Parameters:
+    X (ndarray): Factor returns, shape (T, K)
+    Y (ndarray): Excess asset returns, shape (T, N)
+
+    Returns:
+    dict: 'betas' (N, K), 'alphas' (N,), 'r_squared' (N,),
+          't_stats' and 'std_err' (N, K + 1) with the alpha first,
+          'resid_var' (N,)
+    """
+    X = np.asarray(X, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+    if Y.ndim == 1:
+        Y = Y[:, None]
+    n_obs, n_factors = X.shape
+    dof = n_obs - n_factors - 1
+    if dof <= 0:
+        raise ValueError(f"Need more than {n_factors + 1} observations, got {n_obs}")
+
+    # One factorization of the shared design matrix
+    design = np.column_stack([np.ones(n_obs), X])
+    Q, R = np.linalg.qr(design)
+    coef = np.linalg.solve(R, Q.T @ Y)  # (K + 1, N), R is only (K + 1) x (K + 1)
+
+    # Residual statistics
+    resid = Y - design @ coef
+    ssr = np.einsum('ij,ij->j', resid, resid)
+    centered = Y - Y.mean(axis=0)
+    sst = np.einsum('ij,ij->j', centered, centered)
+    resid_var = ssr / dof
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_squared = np.where(sst > 0, 1.0 - ssr / sst, 0.0)
+
+    # Standard errors from diag((X'X)^-1) = row norms of R^-1
+    R_inv = np.linalg.inv(R)
+    xtx_inv_diag = np.einsum('ij,ij->i', R_inv, R_inv)
+    std_err = np.sqrt(np.outer(resid_var, xtx_inv_diag))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_stats = coef.T / std_err
+
+    return {
+        'betas': coef[1:].T,
+        'alphas': coef[0],
+        'r_squared': r_squared,
+        't_stats': t_stats,
+        'std_err': std_err,
+        'resid_var': resid_var
+    }
+
+
+def _fit_result(design, Y, coef, std_err):
+    """ols_fit-style output for coefficients (K + 1, N) estimated another way"""
+    n_obs, n_coef = design.shape
+    resid = Y - design @ coef
+    ssr = np.einsum('ij,ij->j', resid, resid)
+    centered = Y - Y.mean(axis=0)
+    sst = np.einsum('ij,ij->j', centered, centered)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_squared = np.where(sst > 0, 1.0 - ssr / sst, 0.0)
+        t_stats = coef.T / std_err
+    return {
+        'betas': coef[1:].T,
+        'alphas': coef[0],
+        'r_squared': r_squared,
+        't_stats': t_stats,
+        'std_err': std_err,
+        'resid_var': ssr / (n_obs - n_coef)
+    }
+
+
+def _prepare(X, Y):
+    X = np.asarray(X, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+    if Y.ndim == 1:
+        Y = Y[:, None]
+    n_obs, n_factors = X.shape
+    if n_obs - n_factors - 1 <= 0:
+        raise ValueError(f"Need more than {n_factors + 1} observations, got {n_obs}")
+    return X, Y
+
+
+def shrinkage_fit(X, Y, prior=None):
+    """
+    OLS betas shrunk toward a cross-sectional prior (Vasicek / empirical Bayes)
+
+    For each factor the prior is the cross-sectional mean beta unless
+    given, and the prior variance is the cross-sectional variance of the
+    OLS betas net of their average sampling variance. Each beta moves toward
+    the prior in proportion to its own sampling variance, so noisy
+    estimates are shrunk most. Alphas are re-fitted to the sample means.
+
+    Parameters:
+    X (ndarray): Factor returns, shape (T, K)
+    Y (ndarray): Excess asset returns, shape (T, N)
+    prior (ndarray): Prior betas, shape (K,) or (N, K)
+
+    Returns:
+    dict: Same keys as ols_fit, standard errors from the posterior
+    """
+    X, Y = _prepare(X, Y)
+    fit = ols_fit(X, Y)
+    betas = fit['betas']
+    sampling_var = fit['std_err'][:, 1:] ** 2
+    if prior is None:
+        prior = betas.mean(axis=0)
+    prior = np.broadcast_to(np.asarray(prior, dtype=float), betas.shape)
+    prior_var = np.maximum(betas.var(axis=0, ddof=1) - sampling_var.mean(axis=0), 1e-12)
+
+    weight = prior_var / (prior_var + sampling_var)
+    shrunk = weight * betas + (1.0 - weight) * prior
+    alphas = Y.mean(axis=0) - shrunk @ X.mean(axis=0)
+
+    std_err = fit['std_err'].copy()
+    std_err[:, 1:] = np.sqrt(weight * sampling_var)
+    design = np.column_stack([np.ones(len(X)), X])
+    return _fit_result(design, Y, np.vstack([alphas, shrunk.T]), std_err)
+
+
+def ridge_fit(X, Y, penalty=0.1, prior=None):
+    """
+    Ridge regression of every asset on the factors, alphas unpenalized
+
+    The penalty is scale free: penalty * sum((x_k - mean)^2) on each
+    squared beta deviation, i.e. ridge on standardized factors. All assets
+    share one K x K system.
+
+    Parameters:
+    X (ndarray): Factor returns, shape (T, K)
+    Y (ndarray): Excess asset returns, shape (T, N)
+    penalty (float): Shrinkage strength, 0 gives OLS
+    prior (ndarray): Betas to shrink toward, shape (K,), zero by default
+
+    Returns:
+    dict: Same keys as ols_fit, standard errors from the ridge sampling variance
+    """
+    X, Y = _prepare(X, Y)
+    n_obs, n_factors = X.shape
+    prior = np.zeros(n_factors) if prior is None else np.asarray(prior, dtype=float)
+    x_mean, y_mean = X.mean(axis=0), Y.mean(axis=0)
+    Xc = X - x_mean
+    xtx = Xc.T @ Xc
+    P = penalty * np.diag(np.diag(xtx))
+    A_inv = np.linalg.inv(xtx + P)
+    betas = A_inv @ (Xc.T @ (Y - y_mean) + (P @ prior)[:, None])  # (K, N)
+    alphas = y_mean - x_mean @ betas
+
+    design = np.column_stack([np.ones(n_obs), X])
+    coef = np.vstack([alphas, betas])
+    resid = Y - design @ coef
+    resid_var = np.einsum('ij,ij->j', resid, resid) / (n_obs - n_factors - 1)
+    beta_cov = A_inv @ xtx @ A_inv
+    alpha_var = 1.0 / n_obs + x_mean @ beta_cov @ x_mean
+    std_err = np.sqrt(np.outer(resid_var, np.concatenate([[alpha_var], np.diag(beta_cov)])))
+    return _fit_result(design, Y, coef, std_err)
+
+
+def huber_fit(X, Y, threshold=1.345, max_iter=50, tol=1e-8):
+    """
+    Huber M-estimates by iteratively reweighted least squares, all assets at once
+
+    Residuals are scaled by each asset's MAD and observations beyond
+    threshold scale units are down-weighted. Every iteration solves the
+    (K + 1) x (K + 1) weighted normal equations of all assets as one
+    batched solve, and only assets that have not converged are updated.
+
+    Parameters:
+    X (ndarray): Factor returns, shape (T, K)
+    Y (ndarray): Excess asset returns, shape (T, N)
+    threshold (float): Huber tuning constant, 1.345 for 95% Gaussian efficiency
+    max_iter (int): Maximum IRLS iterations
+    tol (float): Convergence tolerance on the coefficients
+
+    Returns:
+    dict: Same keys as ols_fit plus 'weights' (T, N) and 'iterations'
+    """
+    X, Y = _prepare(X, Y)
+    n_obs, n_factors = X.shape
+    design = np.column_stack([np.ones(n_obs), X])
+    n_coef = n_factors + 1
+    # Outer products of the design rows, so every weighted Gram matrix is one matmul
+    outer = (design[:, :, None] * design[:, None, :]).reshape(n_obs, n_coef * n_coef)
+    coef = ols_fit(X, Y)
+    coef = np.vstack([coef['alphas'], coef['betas'].T])  # (K + 1, N)
+    weights = np.ones_like(Y)
+    active = np.arange(Y.shape[1])
+
+    iteration = 0
+    for iteration in range(1, max_iter + 1):
+        resid = Y[:, active] - design @ coef[:, active]
+        scale = 1.4826 * np.median(np.abs(resid - np.median(resid, axis=0)), axis=0)
+        scale = np.where(scale > 0, scale, 1.0)
+        u = np.abs(resid) / scale
+        w = np.minimum(1.0, threshold / np.maximum(u, 1e-300))
+        weights[:, active] = w
+
+        # Batched weighted normal equations, one (K + 1) system per asset
+        gram = (w.T @ outer).reshape(-1, n_coef, n_coef)
+        rhs = (w * Y[:, active]).T @ design
+        new = np.linalg.solve(gram, rhs[..., None])[..., 0].T
+        change = np.max(np.abs(new - coef[:, active]), axis=0)
+        coef[:, active] = new
+        active = active[change > tol * (1.0 + np.max(np.abs(new), axis=0))]
+        if len(active) == 0:
+            break
+
+    # Standard errors from the final weighted least squares fit
+    resid = Y - design @ coef
+    resid_var = np.einsum('tn,tn,tn->n', weights, resid, resid) / (n_obs - n_factors - 1)
+    gram = (weights.T @ outer).reshape(-1, n_coef, n_coef)
+    cov_diag = np.diagonal(np.linalg.inv(gram), axis1=1, axis2=2)
+    std_err = np.sqrt(resid_var[:, None] * cov_diag)
+    fit = _fit_result(design, Y, coef, std_err)
+    fit['weights'] = weights
+    fit['iterations'] = iteration
+    return fit
+
+
+# Estimators selectable by name in fit_factor_model / compute_factor_betas
+BETA_METHODS = {
+    'ols': ols_fit,
+    'shrinkage': shrinkage_fit,
+    'ridge': ridge_fit,
+    'huber': huber_fit
+}
+
+
+def _excess_panel(returns, factors, factor_cols, rf_col):
+    """Align returns and factors and return (X, excess Y, dates) arrays"""
+    # Align on common dates and drop months with incomplete data
+    returns, factors = returns.align(factors, join='inner', axis=0)
+    mask = factors[factor_cols + [rf_col]].notna().all(axis=1) & returns.notna().all(axis=1)
+
+    X = factors.loc[mask, factor_cols].to_numpy(dtype=float)
+    Y = returns.loc[mask].to_numpy(dtype=float) - factors.loc[mask, rf_col].to_numpy(dtype=float)[:, None]
+    return X, Y, returns.index[mask]
+
+
+def fit_factor_model(returns, factors, factor_cols=FACTOR_COLS, rf_col=RF_COL, method='ols',
+                     **options):
+    """
+    Regress excess returns of every asset on the Fama-French factors
+
+    Parameters:
+    returns (DataFrame): Monthly returns for each asset
+    factors (DataFrame): Monthly Fama-French factor returns including RF
+    factor_cols (list): Factor columns used as regressors
+    rf_col (str): Risk-free column subtracted from returns
+    method (str): One of BETA_METHODS: 'ols', 'shrinkage', 'ridge', 'huber'
+    **options: Passed to the estimator, e.g. penalty for ridge
+
+    Returns:
+    dict: Output of the estimator plus 'assets' and 'factor_cols'
+    """
+    if method not in BETA_METHODS:
+        raise ValueError(f"Unknown beta estimation method '{method}', expected one of {list(BETA_METHODS)}")
+    with metrics.stage('alignment', source='factor_model') as counters:
+        X, Y, _ = _excess_panel(returns, factors, factor_cols, rf_col)
+        counters['observations'] = X.shape[0]
+
+    with metrics.stage('beta_fit', method=method) as counters:
+        fit = BETA_METHODS[method](X, Y, **options)
+        counters['assets'] = Y.shape[1]
+        counters['observations'] = X.shape[0]
+        if 'iterations' in fit:
+            counters['iterations'] = fit['iterations']
+    fit['assets'] = list(returns.columns)
+    fit['factor_cols'] = list(factor_cols)
+    return fit
+
+
+def compute_factor_betas(returns, factors, factor_cols=FACTOR_COLS, rf_col=RF_COL, method='ols',
+                         **options):
+    """
+    Compute factor betas (exposures) for each asset using linear regression
+
+    Dates are aligned and months with any missing value dropped with pandas,
+    so this builds a full in-memory float64 copy of the excess returns, also
+    for frames backed by PanelStore memory maps. For panels larger than RAM
+    use PanelStore.fit_betas, which fits one column block at a time.
+
+    Parameters:
+    returns (DataFrame): Monthly returns for each asset
+    factors (DataFrame): Monthly Fama-French factor returns
+    factor_cols (list): Factor columns used as regressors
+    rf_col (str): Risk-free column subtracted from returns
+    method (str): 'ols', 'shrinkage', 'ridge' or 'huber'
+    **options: Passed to the estimator
+
+    Returns:
+    tuple: (betas DataFrame, alphas Series, r_squareds Series)
+    """
+    fit = fit_factor_model(returns, factors, factor_cols, rf_col, method, **options)
+    betas = pd.DataFrame(fit['betas'], index=fit['assets'], columns=fit['factor_cols'])
+    alphas = pd.Series(fit['alphas'], index=fit['assets'])
+    r_squareds = pd.Series(fit['r_squared'], index=fit['assets'])
+    return betas, alphas, r_squareds
+
+
+def rolling_ols(X, Y, window=None, min_periods=None):
+    """
+    Rolling or expanding alpha/betas for every asset and every period
+
+    The X'X and X'y sufficient statistics are updated as observations enter
+    and leave the window, so each step costs O(K^2 N) regardless of the
+    window length. The statistics are rebuilt from scratch once per window
+    to keep floating point drift from accumulating.
+
+    Parameters:
+    X (ndarray): Factor returns, shape (T, K)
+    Y (ndarray): Excess asset returns, shape (T, N)
+    window (int): Rolling window length, or None for an expanding window
+    min_periods (int): Observations required before the first estimate,
+                       defaults to the window length (or K + 2 when expanding)
+
+    Returns:
+    dict: 'betas' (T, N, K) and 'alphas' (T, N), NaN until enough
+          observations are available
+    """
+    X = np.asarray(X, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+    if Y.ndim == 1:
+        Y = Y[:, None]
+    n_obs, n_factors = X.shape
+    n_assets = Y.shape[1]
+    if min_periods is None:
+        min_periods = window if window is not None else n_factors + 2
+    if min_periods < n_factors + 1:
+        raise ValueError(f"min_periods must be at least {n_factors + 1}")
+    if window is not None and window < min_periods:
+        raise ValueError("window must be at least min_periods")
+
+    design = np.column_stack([np.ones(n_obs), X])
+    betas = np.full((n_obs, n_assets, n_factors), np.nan)
+    alphas = np.full((n_obs, n_assets), np.nan)
+
+    xtx = np.zeros((n_factors + 1, n_factors + 1))
+    xty = np.zeros((n_factors + 1, n_assets))
+    refresh = window if window is not None else n_obs
+
+    for t in range(n_obs):
+        start = 0 if window is None else max(0, t + 1 - window)
+        if window is not None and t >= window and t % refresh == 0:
+            # Periodic exact rebuild of the window statistics
+            xtx = design[start:t + 1].T @ design[start:t + 1]
+            xty = design[start:t + 1].T @ Y[start:t + 1]
+        else:
+            # Add the new observation
+            x_new = design[t]
+            xtx += np.outer(x_new, x_new)
+            xty += np.outer(x_new, Y[t])
+            # Drop the observation leaving the window
+            if window is not None and t >= window:
+                x_old = design[t - window]
+                xtx -= np.outer(x_old, x_old)
+                xty -= np.outer(x_old, Y[t - window])
+
+        if t + 1 - start < min_periods:
+            continue
+        coef = np.linalg.solve(xtx, xty)  # (K + 1, N)
+        alphas[t] = coef[0]
+        betas[t] = coef[1:].T
+
+    return {'betas': betas, 'alphas': alphas}
+
+
+def rolling_factor_betas(returns, factors, window=36, min_periods=None,
+                         factor_cols=FACTOR_COLS, rf_col=RF_COL):
+    """
+    Rolling (or expanding, with window=None) factor betas for every asset
+
+    Parameters:
+    returns (DataFrame): Monthly returns for each asset
+    factors (DataFrame): Monthly Fama-French factor returns including RF
+    window (int): Rolling window in months, e.g. 36 or 60; None for expanding
+    min_periods (int): Observations required before the first estimate
+    factor_cols (list): Factor columns used as regressors
+    rf_col (str): Risk-free column subtracted from returns
+
+    Returns:
+    dict: 'betas' cube (time x asset x factor), 'alphas' (time x asset),
+          'dates', 'assets' and 'factor_cols'
+    """
+    X, Y, dates = _excess_panel(returns, factors, factor_cols, rf_col)
+
+    fit = rolling_ols(X, Y, window=window, min_periods=min_periods)
+    fit['dates'] = dates
+    fit['assets'] = list(returns.columns)
+    fit['factor_cols'] = list(factor_cols)
+    return fit
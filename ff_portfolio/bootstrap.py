@@ -0,0 +1,136 @@
+# Block bootstrap confidence intervals for betas and optimal weights
+import os
+
+import numpy as np
+import pandas as pd
+
+from .betas import BETA_METHODS, FACTOR_COLS, RF_COL, _excess_panel
+from .optimizer import _curvature, _expand_bounds, solve_exposure_qp
+from .shared import arrays, map_shared
+
+
+def block_bootstrap_indices(n_obs, block_size, rng):
+    """
+    Row indices of one circular moving-block bootstrap sample
+
+    Blocks of consecutive rows start at uniform random positions and wrap
+    around the end, so serial correlation within a block is preserved and
+    every row is equally likely to be drawn.
+    """
+    n_blocks = -(-n_obs // block_size)
+    starts = rng.integers(0, n_obs, size=n_blocks)
+    return ((starts[:, None] + np.arange(block_size)) % n_obs).ravel()[:n_obs]
+
+
+def _run_replicates(seeds, block_size, method, options, target, lb, ub, w0):
+    """Fit betas and solve weights for a batch of bootstrap replicates"""
+    X = arrays['X']
+    Y = arrays['Y']
+    n_obs = X.shape[0]
+    betas = np.empty((len(seeds), Y.shape[1], X.shape[1]))
+    weights = np.empty((len(seeds), Y.shape[1]))
+    converged = np.empty(len(seeds), dtype=bool)
+    for j, seed in enumerate(seeds):
+        rows = block_bootstrap_indices(n_obs, block_size, np.random.default_rng(seed))
+        fit = BETA_METHODS[method](X[rows], Y[rows], **options)
+        B = np.ascontiguousarray(fit['betas'])
+        result = solve_exposure_qp(B, target, lb, ub, w0=w0, curvature=_curvature(B))
+        betas[j] = B
+        weights[j] = result['weights']
+        converged[j] = result['converged']
+    return betas, weights, converged
+
+
+def bootstrap_portfolio(returns, factors, target_exposures, n_replicates=1000, block_size=6,
+                        max_weight=1.0, min_weight=0.0, confidence=0.9, method='ols',
+                        max_workers=None, batch_size=25, seed=0, factor_cols=FACTOR_COLS,
+                        rf_col=RF_COL, **options):
+    """
+    Confidence bands for betas, optimal weights and exposures by block bootstrap
+
+    Each replicate resamples the aligned returns/factor panel in blocks of
+    consecutive months, re-estimates the betas of all assets in one batched
+    fit and re-solves the target-exposure portfolio, warm-started from the
+    full-sample weights. Replicates run in fixed batches across a process
+    pool with the panel in shared memory, and each replicate draws from its
+    own child of SeedSequence(seed), so results do not depend on the number
+    of workers. Replicates whose solve did not converge are left out of the
+    weight bands and counted in 'dropped'; their betas still enter the beta
+    and exposure bands.
+
+    Parameters:
+    returns (DataFrame): Returns for each asset
+    factors (DataFrame): Fama-French factor returns including RF
+    target_exposures (dict): Target factor exposures
+    n_replicates (int): Number of bootstrap replicates
+    block_size (int): Consecutive observations per block
+    max_weight (float): Maximum weight per asset
+    min_weight (float): Minimum weight per asset
+    confidence (float): Coverage of the reported bands, e.g. 0.9
+    method (str): Beta estimator, one of BETA_METHODS
+    max_workers (int): Worker processes; 1 runs in the calling process
+    batch_size (int): Replicates per task
+    seed (int): Root seed
+    factor_cols (list): Factor columns used as regressors
+    rf_col (str): Risk-free column subtracted from returns
+    **options: Passed to the beta estimator
+
+    Returns:
+    dict: 'betas', 'betas_lower', 'betas_upper' (DataFrames);
+          'weights', 'weights_lower', 'weights_upper' (Series), the bands
+          over converged replicates only;
+          'exposures', 'exposures_lower', 'exposures_upper' (Series), the
+          exposures of the full-sample portfolio under the replicate betas;
+          'replicates' with the raw 'betas' (R, N, K), 'weights' (R, N) and
+          'converged' (R,) arrays; 'dropped', the number of replicates left
+          out of the weight bands
+    """
+    if method not in BETA_METHODS:
+        raise ValueError(f"Unknown beta estimation method '{method}', expected one of {list(BETA_METHODS)}")
+    X, Y, _ = _excess_panel(returns, factors, factor_cols, rf_col)
+    n_assets = Y.shape[1]
+    target = np.array([target_exposures.get(col, 0.0) for col in factor_cols])
+    lb, ub = _expand_bounds(min_weight, max_weight, n_assets)
+
+    # Full-sample estimate, also the warm start of every replicate
+    point_betas = np.ascontiguousarray(BETA_METHODS[method](X, Y, **options)['betas'])
+    point_weights = solve_exposure_qp(point_betas, target, lb, ub)['weights']
+
+    seeds = np.random.SeedSequence(seed).spawn(n_replicates)
+    batches = [seeds[i:i + batch_size] for i in range(0, n_replicates, batch_size)]
+    args = (block_size, method, options, target, lb, ub, point_weights)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    outputs = map_shared(_run_replicates, [(batch, *args) for batch in batches], {'X': X, 'Y': Y},
+                         max_workers)
+
+    betas = np.concatenate([output[0] for output in outputs])
+    weights = np.concatenate([output[1] for output in outputs])
+    converged = np.concatenate([output[2] for output in outputs])
+    exposures = np.einsum('rnk,n->rk', betas, point_weights)
+
+    tail = (1.0 - confidence) / 2.0
+    quantiles = [tail, 1.0 - tail]
+    beta_bands = np.quantile(betas, quantiles, axis=0)
+    # Weights of a replicate whose solve stopped early are not optimal for its betas
+    if converged.any():
+        weight_bands = np.quantile(weights[converged], quantiles, axis=0)
+    else:
+        weight_bands = np.full((2, n_assets), np.nan)
+    exposure_bands = np.quantile(exposures, quantiles, axis=0)
+
+    assets = returns.columns
+    return {
+        'betas': pd.DataFrame(point_betas, index=assets, columns=factor_cols),
+        'betas_lower': pd.DataFrame(beta_bands[0], index=assets, columns=factor_cols),
+        'betas_upper': pd.DataFrame(beta_bands[1], index=assets, columns=factor_cols),
+        'weights': pd.Series(point_weights, index=assets),
+        'weights_lower': pd.Series(weight_bands[0], index=assets),
+        'weights_upper': pd.Series(weight_bands[1], index=assets),
+        'exposures': pd.Series(point_betas.T @ point_weights, index=factor_cols),
+        'exposures_lower': pd.Series(exposure_bands[0], index=factor_cols),
+        'exposures_upper': pd.Series(exposure_bands[1], index=factor_cols),
+        'replicates': {'betas': betas, 'weights': weights, 'converged': converged},
+        'dropped': int(np.sum(~converged))
+    }
@@ -0,0 +1,285 @@
+# Command-line entry point: data load, beta estimation and optimization without Streamlit
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .betas import BETA_METHODS, FACTOR_COLS, RF_COL, compute_factor_betas
+from .optimizer import optimize_portfolio, optimize_portfolio_batch
+
+BOUND_COLS = ('max_weight', 'min_weight', 'max_assets')
+
+
+def _read_table(path, **kwargs):
+    """CSV or Parquet by file extension"""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, **kwargs)
+
+
+def _write_table(frame, path):
+    """Write CSV or Parquet by file extension, creating the directory"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if path.endswith('.parquet'):
+        frame.to_parquet(path)
+    else:
+        frame.to_csv(path)
+
+
+def read_universe(path):
+    """
+    Tickers from a text file (one per line, # comments) or a CSV/Parquet
+    file with a 'ticker' column
+    """
+    if path.endswith(('.csv', '.parquet')):
+        table = _read_table(path)
+        column = 'ticker' if 'ticker' in table.columns else table.columns[0]
+        tickers = table[column].astype(str).str.strip().tolist()
+    else:
+        with open(path) as f:
+            tickers = [line.split('#')[0].strip() for line in f]
+    return list(dict.fromkeys(t for t in tickers if t))
+
+
+def read_targets(path, factor_cols=FACTOR_COLS):
+    """
+    Target portfolios from CSV/Parquet or JSON
+
+    Each row (or JSON object) is one portfolio with a 'portfolio' name,
+    one column per factor, and optional max_weight / min_weight /
+    max_assets overrides. A JSON object mapping names to targets is also
+    accepted.
+
+    Returns:
+    DataFrame: One row per portfolio indexed by name
+    """
+    if path.endswith('.json'):
+        with open(path) as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = [dict(spec, portfolio=name) for name, spec in data.items()]
+        targets = pd.DataFrame(data)
+    else:
+        targets = _read_table(path)
+    if 'portfolio' not in targets.columns:
+        targets['portfolio'] = [f'portfolio_{i + 1}' for i in range(len(targets))]
+    targets = targets.set_index('portfolio')
+    missing = [col for col in factor_cols if col not in targets.columns]
+    if len(missing) == len(factor_cols):
+        raise ValueError(f"Targets file has none of the factor columns {factor_cols}")
+    # Factors left out of a portfolio are targeted at zero
+    targets[list(factor_cols)] = targets.reindex(columns=factor_cols).fillna(0.0)
+    return targets
+
+
+def monthly_panel(prices, factors, percent=True):
+    """
+    Month-end asset returns and monthly factors on a shared month-end index
+
+    Parameters:
+    prices (DataFrame): Daily or monthly prices, one column per ticker
+    factors (DataFrame): Monthly Fama-French factors including RF
+    percent (bool): Whether the factors are in percent, as published
+    """
+    with metrics.stage('alignment', source='monthly_panel') as counters:
+        prices = prices.sort_index()
+        returns = prices.resample('ME').last().pct_change(fill_method=None).iloc[1:]
+        factors = factors.copy()
+        factors.index = pd.DatetimeIndex(factors.index).to_period('M').to_timestamp(how='end').normalize()
+        if percent:
+            factors = factors / 100.0
+        returns.index = returns.index.normalize()
+        returns, factors = returns.align(factors, join='inner', axis=0)
+        counters['assets'] = returns.shape[1]
+        counters['observations'] = len(returns)
+    return returns, factors
+
+
+def load_data(args, tickers):
+    """Prices and factors from files, the local download cache, or synthetic demo data"""
+    if args.demo:
+        from .bench import create_synthetic_data
+
+        returns, factors, _ = create_synthetic_data(len(tickers), args.months, seed=args.seed)
+        returns.columns = tickers
+        return returns, factors
+
+    cache = None
+    if not (args.prices and args.factors):
+        from .data import ConcurrentPriceFetcher, DataCache, YahooSource
+
+        cache = DataCache(args.cache_dir, price_source=ConcurrentPriceFetcher(YahooSource()))
+
+    if args.prices:
+        prices = _read_table(args.prices, index_col=0, parse_dates=True)
+        prices.index = pd.to_datetime(prices.index)
+        prices = prices.reindex(columns=tickers)
+    else:
+        prices = cache.get_prices(tickers, args.start, args.end)
+    if args.factors:
+        factors = _read_table(args.factors, index_col=0)
+        factors.index = pd.to_datetime(factors.index.astype(str), format='mixed')
+    else:
+        from .data import FF_MONTHLY_DATASET
+
+        factors = cache.get_factors(FF_MONTHLY_DATASET, args.start, args.end)
+    return monthly_panel(prices, factors, percent=not args.factors_decimal)
+
+
+def run_portfolios(betas, targets, max_weight=1.0, min_weight=0.0, factor_cols=FACTOR_COLS,
+                   constraints=None):
+    """
+    Optimize every target row
+
+    Rows without per-portfolio overrides are solved together through
+    optimize_portfolio_batch; the others, and every row when linear
+    constraints are given, one at a time.
+
+    Returns:
+    tuple: (weights DataFrame tickers x portfolios, summary DataFrame per portfolio)
+    """
+    overrides = [col for col in BOUND_COLS if col in targets.columns]
+    plain = targets[overrides].isna().all(axis=1) if overrides else pd.Series(True, index=targets.index)
+    if constraints is not None and len(constraints):
+        plain[:] = False
+    weights = pd.DataFrame(0.0, index=betas.index, columns=targets.index)
+    rows = {}
+
+    if plain.any():
+        batch = optimize_portfolio_batch(betas, targets.loc[plain, factor_cols],
+                                         bounds=(min_weight, max_weight), factor_cols=factor_cols)
+        B = betas[factor_cols].to_numpy()
+        for i, name in enumerate(targets.index[plain]):
+            weights[name] = batch['weights'][i]
+            rows[name] = {'success': bool(batch['converged'][i]),
+                          'tracking_error': batch['tracking_error'][i],
+                          'exposures': B.T @ batch['weights'][i]}
+
+    for name in targets.index[~plain]:
+        spec = targets.loc[name]
+        limit = spec.get('max_assets')
+        result = optimize_portfolio(
+            betas, spec[factor_cols].to_dict(),
+            max_weight=spec.get('max_weight', max_weight) if pd.notna(spec.get('max_weight')) else max_weight,
+            min_weight=spec.get('min_weight', min_weight) if pd.notna(spec.get('min_weight')) else min_weight,
+            factor_cols=factor_cols,
+            max_assets=int(limit) if limit is not None and pd.notna(limit) else None,
+            constraints=constraints
+        )
+        weights[name] = result['weights']
+        exposures = betas[factor_cols].to_numpy().T @ result['weights']
+        rows[name] = {'success': result['success'],
+                      'tracking_error': result.get('tracking_error', np.nan),
+                      'exposures': exposures,
+                      'error': result.get('error')}
+
+    summary = pd.DataFrame(index=targets.index)
+    for col in factor_cols:
+        summary[f'target_{col}'] = targets[col]
+        summary[f'portfolio_{col}'] = [rows[name]['exposures'][factor_cols.index(col)] for name in targets.index]
+    summary['tracking_error'] = [rows[name]['tracking_error'] for name in targets.index]
+    summary['n_holdings'] = (weights > 1e-8).sum(axis=0).reindex(targets.index)
+    summary['success'] = [rows[name]['success'] for name in targets.index]
+    summary['error'] = [rows[name].get('error') for name in targets.index]
+    return weights, summary
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m ff_portfolio',
+        description="Estimate factor betas and optimize target-exposure portfolios"
+    )
+    parser.add_argument('--universe', required=True, help="Tickers: .txt (one per line), .csv or .parquet")
+    parser.add_argument('--targets', required=True, help="Target exposures: .csv, .parquet or .json")
+    parser.add_argument('--output', required=True, help="Weights table, .csv or .parquet")
+    parser.add_argument('--exposures-output', help="Exposure summary table, next to --output by default")
+    parser.add_argument('--prices', help="Price file (date index, one column per ticker) instead of downloading")
+    parser.add_argument('--factors', help="Monthly factor file (date index, factor columns and RF)")
+    parser.add_argument('--factors-decimal', action='store_true', help="Factor file is in decimals, not percent")
+    parser.add_argument('--cache-dir', default='.ff_cache', help="Download cache directory")
+    parser.add_argument('--start', default=None, help="First date, default 5 years before --end")
+    parser.add_argument('--end', default=None, help="Last date, default today")
+    parser.add_argument('--demo', action='store_true', help="Use synthetic data instead of real prices")
+    parser.add_argument('--months', type=int, default=60, help="Months of synthetic data with --demo")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--window', type=int, default=None, help="Use only the last N months for betas")
+    parser.add_argument('--method', choices=sorted(BETA_METHODS), default='ols', help="Beta estimator")
+    parser.add_argument('--max-weight', type=float, default=1.0)
+    parser.add_argument('--min-weight', type=float, default=0.0)
+    parser.add_argument('--constraints', help="JSON group, sector and factor-band constraints "
+                                              "(see LinearConstraints.from_dict)")
+    parser.add_argument('--metrics-log', help="Append per-stage timings and counters as JSON lines")
+    parser.add_argument('--metrics-prom', help="Write stage metrics in Prometheus text format")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sinks = []
+    if args.metrics_log:
+        sinks.append(metrics.add_sink(metrics.JSONLogSink(args.metrics_log)))
+    if args.metrics_prom:
+        sinks.append(metrics.add_sink(metrics.PrometheusTextSink(args.metrics_prom)))
+    try:
+        return _run(args)
+    finally:
+        for sink in sinks:
+            metrics.remove_sink(sink)
+            if hasattr(sink, 'flush'):
+                sink.flush()
+
+
+def _run(args):
+    end = pd.Timestamp(args.end) if args.end else pd.Timestamp.today().normalize()
+    args.end = end
+    args.start = pd.Timestamp(args.start) if args.start else end - pd.DateOffset(years=5)
+
+    tickers = read_universe(args.universe)
+    targets = read_targets(args.targets)
+    returns, factors = load_data(args, tickers)
+
+    # Assets without a full history in the window cannot be estimated
+    if args.window:
+        returns, factors = returns.iloc[-args.window:], factors.iloc[-args.window:]
+    complete = returns.notna().all()
+    if not complete.all():
+        print(f"Dropping {int((~complete).sum())} tickers with missing returns: "
+              f"{list(returns.columns[~complete])[:10]}", file=sys.stderr)
+        returns = returns.loc[:, complete]
+
+    betas, alphas, r_squareds = compute_factor_betas(returns, factors, FACTOR_COLS, RF_COL, method=args.method)
+    constraints = None
+    if args.constraints:
+        from .constraints import LinearConstraints
+
+        with open(args.constraints) as f:
+            constraints = LinearConstraints.from_dict(json.load(f))
+    weights, summary = run_portfolios(betas, targets, args.max_weight, args.min_weight,
+                                      constraints=constraints)
+
+    exposures_path = args.exposures_output
+    if exposures_path is None:
+        root, ext = os.path.splitext(args.output)
+        exposures_path = f'{root}_exposures{ext or ".csv"}'
+    with metrics.stage('export', format=os.path.splitext(args.output)[1].lstrip('.') or 'csv') as counters:
+        _write_table(weights, args.output)
+        _write_table(summary, exposures_path)
+        counters['rows'] = weights.size + summary.size
+
+    failed = summary.index[~summary['success']].tolist()
+    print(f"{len(summary)} portfolios over {len(betas)} assets and {len(returns)} months -> "
+          f"{args.output}, {exposures_path}")
+    if failed:
+        print(f"Optimization failed for {failed}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
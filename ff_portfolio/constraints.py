@@ -0,0 +1,202 @@
+# Group, sector and factor-band constraints as a sparse linear system
+import hashlib
+import json
+
+import numpy as np
+
+from .betas import FACTOR_COLS
+
+
+class LinearConstraints:
+    """
+    Linear constraints on portfolio weights, lower <= A w <= upper
+
+    Group rows (sector caps, ETF vs. single-stock budgets, any weighted
+    basket) are stored by member label and compiled into one sparse matrix
+    for a given universe, so hundreds of groups cost one sparse
+    matrix-vector product per solver evaluation. Factor bands bound the
+    portfolio exposure B'w and are compiled from the betas at solve time.
+    Members missing from the universe being optimized are ignored.
+
+    Example:
+        constraints = LinearConstraints()
+        constraints.add_groups(sectors, upper=0.30)        # every sector <= 30%
+        constraints.add_group('ETF', etfs, lower=0.2, upper=0.6)
+        constraints.add_factor_band('HML', lower=0.1, upper=0.4)
+    """
+
+    def __init__(self):
+        self.groups = []
+        self.bands = {}
+
+    def __len__(self):
+        return len(self.groups) + len(self.bands)
+
+    def add_group(self, name, members, lower=None, upper=None, coefficients=None):
+        """
+        Bound the (weighted) sum of the members' weights
+
+        Parameters:
+        name (str): Label used in reports
+        members (list): Asset labels, or positions when betas are an ndarray
+        lower, upper (float): Bounds on the sum, None for unbounded
+        coefficients (array-like): Weight of each member, 1 by default
+        """
+        members = list(members)
+        if coefficients is None:
+            coefficients = np.ones(len(members))
+        coefficients = np.asarray(coefficients, dtype=float)
+        if len(coefficients) != len(members):
+            raise ValueError(f"Group '{name}' has {len(members)} members but {len(coefficients)} coefficients")
+        if lower is None and upper is None:
+            raise ValueError(f"Group '{name}' needs a lower or upper bound")
+        if lower is not None and upper is not None and lower > upper:
+            raise ValueError(f"Group '{name}' has lower bound {lower} above upper bound {upper}")
+        self.groups.append((name, members, coefficients, lower, upper))
+        return self
+
+    def add_groups(self, labels, lower=None, upper=None):
+        """
+        One group per distinct label, e.g. a sector classification
+
+        Parameters:
+        labels (Series or dict): Asset -> group label
+        lower, upper (float or dict): Bounds for every group, or per label
+        """
+        labels = dict(labels.items()) if hasattr(labels, 'items') else dict(labels)
+        members = {}
+        for asset, label in labels.items():
+            members.setdefault(label, []).append(asset)
+        for label, assets in members.items():
+            group_lower = lower.get(label) if isinstance(lower, dict) else lower
+            group_upper = upper.get(label) if isinstance(upper, dict) else upper
+            if group_lower is None and group_upper is None:
+                continue
+            self.add_group(label, assets, group_lower, group_upper)
+        return self
+
+    def add_factor_band(self, factor, lower=None, upper=None):
+        """Bound the portfolio exposure to one factor"""
+        if lower is None and upper is None:
+            raise ValueError(f"Band on '{factor}' needs a lower or upper bound")
+        if lower is not None and upper is not None and lower > upper:
+            raise ValueError(f"Band on '{factor}' has lower bound {lower} above upper bound {upper}")
+        self.bands[factor] = (lower, upper)
+        return self
+
+    @classmethod
+    def from_dict(cls, spec):
+        """
+        Build from {'groups': [{'name', 'members', 'lower', 'upper'}, ...],
+        'sectors': {'labels': {asset: sector}, 'lower', 'upper'},
+        'bands': {factor: [lower, upper]}}, e.g. parsed from JSON
+        """
+        constraints = cls()
+        for group in spec.get('groups', []):
+            constraints.add_group(group['name'], group['members'], group.get('lower'),
+                                  group.get('upper'), group.get('coefficients'))
+        if 'sectors' in spec:
+            sectors = spec['sectors']
+            constraints.add_groups(sectors['labels'], sectors.get('lower'), sectors.get('upper'))
+        for factor, (lower, upper) in spec.get('bands', {}).items():
+            constraints.add_factor_band(factor, lower, upper)
+        return constraints
+
+    def key(self):
+        """Content hash, for caching solves"""
+        spec = {
+            'groups': [(str(name), [str(m) for m in members], coefficients.tolist(), lower, upper)
+                       for name, members, coefficients, lower, upper in self.groups],
+            'bands': sorted((str(f), lower, upper) for f, (lower, upper) in self.bands.items())
+        }
+        return hashlib.sha1(json.dumps(spec).encode()).hexdigest()
+
+    def compile(self, betas, factor_cols=FACTOR_COLS):
+        """
+        One-sided system G w <= h for a universe
+
+        Two-sided rows are split into an upper row and a negated lower row,
+        and factor bands become dense rows of +-B'. G is in CSC format, which
+        the solver slices by column to the assets off their bounds.
+
+        Parameters:
+        betas (DataFrame or ndarray): Factor betas of the universe, shape (N, K)
+
+        Returns:
+        tuple: (G sparse (m, N), h (m,), row names (m,))
+        """
+        import scipy.sparse as sp
+
+        if hasattr(betas, 'index'):
+            positions = {asset: i for i, asset in enumerate(betas.index)}
+            B = np.asarray(betas[factor_cols], dtype=float)
+        else:
+            B = np.asarray(betas, dtype=float)
+            positions = {i: i for i in range(B.shape[0])}
+        n_assets = B.shape[0]
+
+        rows, cols, data, h, names = [], [], [], [], []
+
+        def add_row(index, values, bound, name):
+            rows.append(np.full(len(index), len(h)))
+            cols.append(index)
+            data.append(values)
+            h.append(bound)
+            names.append(name)
+
+        for name, members, coefficients, lower, upper in self.groups:
+            found = [(positions[m], c) for m, c in zip(members, coefficients) if m in positions]
+            index = np.array([i for i, _ in found], dtype=int)
+            values = np.array([c for _, c in found], dtype=float)
+            if upper is not None:
+                add_row(index, values, float(upper), f'{name} <= {upper:g}')
+            if lower is not None:
+                add_row(index, -values, -float(lower), f'{name} >= {lower:g}')
+
+        all_assets = np.arange(n_assets)
+        for factor, (lower, upper) in self.bands.items():
+            if factor not in factor_cols:
+                raise ValueError(f"Band on unknown factor '{factor}', expected one of {list(factor_cols)}")
+            column = B[:, list(factor_cols).index(factor)]
+            if upper is not None:
+                add_row(all_assets, column, float(upper), f'{factor} exposure <= {upper:g}')
+            if lower is not None:
+                add_row(all_assets, -column, -float(lower), f'{factor} exposure >= {lower:g}')
+
+        if not h:
+            return sp.csc_matrix((0, n_assets)), np.zeros(0), []
+        G = sp.csc_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+                          shape=(len(h), n_assets))
+        return G, np.array(h), names
+
+    def violations(self, weights, betas, factor_cols=FACTOR_COLS):
+        """
+        Amount by which each one-sided row is violated
+
+        Returns:
+        dict: Row name -> violation, only for rows violated by more than 1e-9
+        """
+        G, h, names = self.compile(betas, factor_cols)
+        excess = G @ np.asarray(weights, dtype=float) - h
+        return {name: float(e) for name, e in zip(names, excess) if e > 1e-9}
+
+    def check_feasible(self, betas, lb=0.0, ub=1.0, factor_cols=FACTOR_COLS):
+        """
+        Whether any fully invested portfolio within the bounds meets the constraints
+
+        Solves a feasibility LP with scipy's HiGHS; meant for diagnosing a
+        failed solve, not for every call.
+
+        Returns:
+        bool
+        """
+        from scipy.optimize import linprog
+
+        G, h, _ = self.compile(betas, factor_cols)
+        n_assets = G.shape[1]
+        lb = np.broadcast_to(np.asarray(lb, dtype=float), (n_assets,))
+        ub = np.broadcast_to(np.asarray(ub, dtype=float), (n_assets,))
+        result = linprog(np.zeros(n_assets), A_ub=G if G.shape[0] else None, b_ub=h if G.shape[0] else None,
+                         A_eq=np.ones((1, n_assets)), b_eq=[1.0], bounds=np.column_stack([lb, ub]),
+                         method='highs')
+        return result.status == 0
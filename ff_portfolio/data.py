@@ -0,0 +1,415 @@
+# Price and Fama-French factor data: download sources and a local on-disk cache
+import io
+import json
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from . import metrics
+
+# Monthly 5-factor dataset, includes the 4 factors we need: Mkt-RF, SMB, HML, RMW
+FF_MONTHLY_DATASET = 'F-F_Research_Data_5_Factors_2x3'
+
+
+def _to_datetime_index(index):
+    """Convert period or string indexes from the data sources to a DatetimeIndex"""
+    if isinstance(index, pd.PeriodIndex):
+        return index.to_timestamp()
+    return pd.to_datetime(index)
+
+
+class YahooSource:
+    """Adjusted close prices from Yahoo Finance via yfinance"""
+
+    def fetch_prices(self, tickers, start_date, end_date):
+        import yfinance as yf
+
+        # yfinance treats the end date as exclusive
+        data = yf.download(list(tickers), start=start_date, end=end_date + pd.Timedelta(days=1),
+                           auto_adjust=False, progress=False)['Adj Close']
+        if isinstance(data, pd.Series):
+            data = data.to_frame(tickers[0])
+        data.index = _to_datetime_index(data.index)
+        return data
+
+
+class FamaFrenchSource:
+    """Fama-French factor datasets from Ken French's data library"""
+
+    def fetch_factors(self, dataset, start_date, end_date):
+        import pandas_datareader.famafrench as ff
+
+        data = ff.FamaFrenchReader(dataset, start=start_date, end=end_date).read()[0]
+        data.index = _to_datetime_index(data.index)
+        return data
+
+
+class LocalFileSource:
+    """
+    File-based stand-in for the download sources
+
+    Reads <root>/prices/<TICKER>.csv (columns: date, close) and
+    <root>/factors/<dataset>.csv (a date column followed by factor columns).
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def fetch_prices(self, tickers, start_date, end_date):
+        series = {}
+        for ticker in tickers:
+            path = os.path.join(self.root, 'prices', f'{ticker}.csv')
+            if not os.path.exists(path):
+                continue
+            frame = pd.read_csv(path, index_col=0, parse_dates=True)
+            series[ticker] = frame.iloc[:, 0].loc[start_date:end_date]
+        return pd.DataFrame(series)
+
+    def fetch_factors(self, dataset, start_date, end_date):
+        path = os.path.join(self.root, 'factors', f'{dataset}.csv')
+        frame = pd.read_csv(path, index_col=0, parse_dates=True)
+        return frame.loc[start_date:end_date]
+
+
+class HTTPCSVSource:
+    """
+    Per-ticker CSV prices over HTTP
+
+    url_template is formatted with ticker, start and end (YYYY-MM-DD), e.g.
+    'http://localhost:8000/prices/{ticker}.csv?start={start}&end={end}'. The
+    response is a CSV with a date column followed by a close column.
+    """
+
+    def __init__(self, url_template, timeout=30):
+        self.url_template = url_template
+        self.timeout = timeout
+
+    def fetch_prices(self, tickers, start_date, end_date):
+        series = {}
+        for ticker in tickers:
+            url = self.url_template.format(ticker=urllib.parse.quote(ticker),
+                                           start=start_date.strftime('%Y-%m-%d'),
+                                           end=end_date.strftime('%Y-%m-%d'))
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                frame = pd.read_csv(io.BytesIO(response.read()), index_col=0, parse_dates=True)
+            series[ticker] = frame.iloc[:, 0].loc[start_date:end_date]
+        return pd.DataFrame(series)
+
+
+class ConcurrentPriceFetcher:
+    """
+    Chunked, concurrent and rate-limited wrapper around a price source
+
+    The universe is split into chunks that are fetched by a bounded thread
+    pool. A failing chunk is retried with exponential backoff and then
+    fetched ticker by ticker, so one bad symbol only fails itself. The
+    fetcher has the same fetch_prices interface as the sources, so it can be
+    passed to DataCache as its price_source.
+
+    Parameters:
+    source: Object with fetch_prices(tickers, start_date, end_date)
+    chunk_size (int): Tickers per request
+    max_concurrent (int): Requests in flight at once
+    max_retries (int): Retries per request after the first attempt
+    backoff (float): Initial retry delay in seconds, doubled on each retry
+    rate_limit (float): Maximum requests started per second, None for no limit
+    """
+
+    def __init__(self, source, chunk_size=50, max_concurrent=8, max_retries=3, backoff=0.5,
+                 rate_limit=None):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rate_limit = rate_limit
+        self._lock = threading.Lock()
+        self._next_request = 0.0
+
+    def _wait_for_slot(self):
+        """Space request start times to respect the rate limit"""
+        if not self.rate_limit:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_request)
+            self._next_request = start + 1.0 / self.rate_limit
+        if start > now:
+            time.sleep(start - now)
+
+    def _fetch_with_retries(self, tickers, start_date, end_date):
+        """Returns (frame, attempts, error); frame is None after the last failure"""
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            self._wait_for_slot()
+            try:
+                return self.source.fetch_prices(tickers, start_date, end_date), attempt + 1, None
+            except Exception as e:
+                error = str(e)
+        return None, self.max_retries + 1, error
+
+    def _fetch_chunk(self, tickers, start_date, end_date):
+        frame, attempts, error = self._fetch_with_retries(tickers, start_date, end_date)
+        if frame is not None:
+            # The source answered: a ticker without rows simply has no sessions in the range
+            status = {}
+            for ticker in tickers:
+                rows = int(frame[ticker].notna().sum()) if ticker in frame else 0
+                status[ticker] = {'ok': True, 'attempts': attempts, 'error': None, 'rows': rows}
+            return frame, status
+
+        if len(tickers) == 1:
+            return None, {tickers[0]: {'ok': False, 'attempts': attempts, 'error': error, 'rows': 0}}
+
+        # Isolate the failing symbols by fetching the chunk one ticker at a time
+        frames = []
+        status = {}
+        for ticker in tickers:
+            single, single_status = self._fetch_chunk([ticker], start_date, end_date)
+            single_status[ticker]['attempts'] += attempts
+            status.update(single_status)
+            if single is not None:
+                frames.append(single)
+        return (pd.concat(frames, axis=1) if frames else None), status
+
+    def fetch(self, tickers, start_date, end_date):
+        """
+        Download prices for the universe
+
+        Returns:
+        dict: 'prices' (DataFrame aligned on the union of dates, tickers
+              with rows only) and 'status' (DataFrame indexed by ticker with
+              ok, attempts, error and rows columns). ok is False only when
+              every attempt failed; a ticker the source answered for without
+              rows, e.g. over a weekend, is ok with 0 rows.
+        """
+        tickers = list(tickers)
+        chunks = [tickers[i:i + self.chunk_size] for i in range(0, len(tickers), self.chunk_size)]
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrent) as pool:
+            results = list(pool.map(lambda chunk: self._fetch_chunk(chunk, start_date, end_date), chunks))
+
+        frames = []
+        status = {}
+        for frame, chunk_status in results:
+            status.update(chunk_status)
+            if frame is not None:
+                frames.append(frame)
+
+        with_rows = [ticker for ticker in tickers if status[ticker]['rows']]
+        prices = pd.concat(frames, axis=1) if frames else pd.DataFrame()
+        prices = prices.loc[:, ~prices.columns.duplicated()].reindex(columns=with_rows).sort_index()
+        status = pd.DataFrame.from_dict(status, orient='index').reindex(tickers)
+        return {'prices': prices, 'status': status}
+
+    def fetch_prices(self, tickers, start_date, end_date):
+        """Source interface: tickers with rows only, see fetch for the per-ticker status"""
+        return self.fetch(tickers, start_date, end_date)['prices']
+
+
+class DataCache:
+    """
+    Persistent Parquet cache for prices and factor datasets
+
+    Prices are stored one file per ticker (<root>/prices/<TICKER>.parquet) and
+    factors one file per dataset (<root>/factors/<dataset>.parquet). A
+    manifest records the date range each file covers, so a request only
+    downloads the dates before or after what is already on disk and merges
+    them in. A successful price download covers its whole range, empty
+    stretches (weekends, holidays, before listing) included, up to
+    yesterday: today's close may not be published yet. Factor coverage
+    ends at the last date returned, since the factor files are published
+    with a lag. A failed download leaves the coverage as it was, so it is
+    fetched again next time.
+
+    Parameters:
+    root (str): Cache directory
+    price_source: Object with fetch_prices(tickers, start_date, end_date)
+    factor_source: Object with fetch_factors(dataset, start_date, end_date)
+    """
+
+    def __init__(self, root, price_source=None, factor_source=None):
+        self.root = root
+        self.price_source = price_source if price_source is not None else YahooSource()
+        self.factor_source = factor_source if factor_source is not None else FamaFrenchSource()
+        self._manifest_path = os.path.join(root, 'manifest.json')
+        self._manifest = None
+
+    def _load_manifest(self):
+        if self._manifest is None:
+            if os.path.exists(self._manifest_path):
+                with open(self._manifest_path) as f:
+                    self._manifest = json.load(f)
+            else:
+                self._manifest = {}
+        return self._manifest
+
+    def _save_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self._manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self._manifest_path)
+
+    def _path(self, key):
+        return os.path.join(self.root, f'{key}.parquet')
+
+    def _read(self, key):
+        path = self._path(key)
+        if os.path.exists(path):
+            return pd.read_parquet(path)
+        return None
+
+    def _write(self, key, frame):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        frame.to_parquet(path)
+
+    def _missing_ranges(self, key, start_date, end_date):
+        """Date ranges of [start_date, end_date] not yet covered for a key"""
+        covered = self._load_manifest().get(key)
+        if covered is None:
+            return [(start_date, end_date)]
+        covered_start = pd.Timestamp(covered['start'])
+        covered_end = pd.Timestamp(covered['end'])
+        ranges = []
+        if start_date < covered_start:
+            ranges.append((start_date, covered_start - pd.Timedelta(days=1)))
+        if end_date > covered_end:
+            ranges.append((covered_end + pd.Timedelta(days=1), end_date))
+        return ranges
+
+    def _merge(self, key, fetched, fetch_start, covered_end):
+        """
+        Merge newly fetched rows into the cached file and extend its coverage
+
+        covered_end is the last date the fetch is known to be complete up to,
+        or None for a failed fetch, which leaves the coverage unchanged.
+        """
+        if covered_end is None:
+            return
+        manifest = self._load_manifest()
+        if fetched is not None and len(fetched):
+            cached = self._read(key)
+            fetched = fetched.sort_index()
+            merged = fetched if cached is None else pd.concat([cached, fetched])
+            merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+            self._write(key, merged)
+
+        covered = manifest.get(key)
+        start, end = fetch_start, covered_end
+        if covered is not None:
+            start = min(start, pd.Timestamp(covered['start']))
+            end = max(end, pd.Timestamp(covered['end']))
+        elif end < start:
+            return
+        manifest[key] = {'start': start.strftime('%Y-%m-%d'), 'end': end.strftime('%Y-%m-%d')}
+
+    def _fetch_prices(self, group, fetch_start, fetch_end):
+        """Fetch one missing range, with the per-ticker status when the source reports one"""
+        if isinstance(self.price_source, ConcurrentPriceFetcher):
+            result = self.price_source.fetch(group, fetch_start, fetch_end)
+            return result['prices'], result['status'].to_dict(orient='index')
+        fetched = self.price_source.fetch_prices(group, fetch_start, fetch_end)
+        return fetched, {ticker: {'ok': True, 'attempts': 1, 'error': None} for ticker in group}
+
+    def get_prices(self, tickers, start_date, end_date, return_status=False):
+        """
+        Adjusted close prices for the tickers, downloading only uncached dates
+
+        Tickers with the same missing range are fetched together in one call.
+
+        Parameters:
+        tickers (list): Ticker symbols
+        start_date, end_date: Date range, inclusive
+        return_status (bool): Also return the download status of this call
+
+        Returns:
+        DataFrame: Prices indexed by date with one column per ticker
+        DataFrame: With return_status, one row per ticker with ok, attempts
+                   and error over every range fetched in this call; fully
+                   cached tickers are ok with 0 attempts. A ticker fails when
+                   a download failed after its retries, or when it has no
+                   rows at all over [start_date, end_date]; a missing range
+                   without trading sessions (a weekend, before listing) is
+                   not a failure.
+        """
+        start_date = pd.Timestamp(start_date).normalize()
+        end_date = pd.Timestamp(end_date).normalize()
+
+        yesterday = pd.Timestamp.today().normalize() - pd.Timedelta(days=1)
+
+        # Group tickers by the ranges they are missing
+        pending = {}
+        status = {ticker: {'ok': True, 'attempts': 0, 'error': None} for ticker in tickers}
+        for ticker in tickers:
+            for fetch_range in self._missing_ranges(f'prices/{ticker}', start_date, end_date):
+                pending.setdefault(fetch_range, []).append(ticker)
+
+        with metrics.stage('download', kind='prices') as counters:
+            for (fetch_start, fetch_end), group in pending.items():
+                fetched, fetch_status = self._fetch_prices(group, fetch_start, fetch_end)
+                for ticker in group:
+                    ticker_status = status[ticker]
+                    ticker_status['ok'] = ticker_status['ok'] and fetch_status[ticker]['ok']
+                    ticker_status['attempts'] += fetch_status[ticker]['attempts']
+                    ticker_status['error'] = ticker_status['error'] or fetch_status[ticker]['error']
+                    column = fetched[ticker].dropna().to_frame('close') if ticker in fetched else None
+                    covered_end = None
+                    if fetch_status[ticker]['ok']:
+                        covered_end = min(fetch_end, yesterday)
+                        if column is not None and len(column):
+                            covered_end = max(covered_end, column.index.max())
+                    self._merge(f'prices/{ticker}', column, fetch_start, covered_end)
+            if pending:
+                self._save_manifest()
+            counters['requests'] = len(pending)
+            counters['tickers'] = sum(len(group) for group in pending.values())
+            counters['cached_tickers'] = len(tickers) - len({t for group in pending.values() for t in group})
+            counters['failed_tickers'] = sum(not ticker_status['ok'] for ticker_status in status.values())
+
+        series = {}
+        for ticker in tickers:
+            cached = self._read(f'prices/{ticker}')
+            if cached is not None:
+                series[ticker] = cached['close'].loc[start_date:end_date]
+        prices = pd.DataFrame(series, columns=list(tickers))
+        for ticker in tickers:
+            if status[ticker]['ok'] and not prices[ticker].notna().any():
+                status[ticker].update(ok=False, error='no data')
+        if return_status:
+            return prices, pd.DataFrame.from_dict(status, orient='index').reindex(list(tickers))
+        return prices
+
+    def get_factors(self, dataset, start_date, end_date):
+        """
+        Factor returns for a Fama-French dataset, downloading only uncached dates
+
+        Returns:
+        DataFrame: Factor returns indexed by date
+        """
+        start_date = pd.Timestamp(start_date).normalize()
+        end_date = pd.Timestamp(end_date).normalize()
+        key = f'factors/{dataset}'
+
+        missing = self._missing_ranges(key, start_date, end_date)
+        with metrics.stage('download', kind='factors') as counters:
+            for fetch_start, fetch_end in missing:
+                fetched = self.factor_source.fetch_factors(dataset, fetch_start, fetch_end)
+                covered_end = fetched.index.max() if len(fetched) else fetch_start - pd.Timedelta(days=1)
+                self._merge(key, fetched, fetch_start, covered_end)
+            if missing:
+                self._save_manifest()
+            counters['requests'] = len(missing)
+
+        cached = self._read(key)
+        if cached is None:
+            return pd.DataFrame()
+        return cached.loc[start_date:end_date]
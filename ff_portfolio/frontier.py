@@ -0,0 +1,204 @@
+# Precomputed frontier of tracking error against concentration
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .betas import FACTOR_COLS
+from .optimizer import _beta_matrix, _curvature, _expand_bounds, project_bounded_simplex, solve_diversified_qp
+
+DEFAULT_MAX_WEIGHTS = np.round(np.arange(0.05, 1.0001, 0.05), 2)
+DEFAULT_PENALTIES = np.concatenate([[0.0], np.geomspace(1e-4, 1.0, 9)])
+
+
+class EfficientFrontier:
+    """
+    Optimal portfolios on a grid of max_weight values and diversification penalties
+
+    Built by compute_frontier. Every grid point holds the solution of
+    solve_diversified_qp, so moving along the grid is a lookup instead of a
+    solve.
+
+    Attributes:
+    max_weights (ndarray): Weight caps, ascending, shape (M,)
+    penalties (ndarray): Diversification penalties, ascending, shape (P,)
+    weights (ndarray): Optimal weights, shape (M, P, N)
+    exposures (ndarray): Portfolio factor exposures, shape (M, P, K)
+    tracking_error (ndarray): ||B'w - target|| at each point, shape (M, P)
+    converged (ndarray): Solver convergence at each point, shape (M, P)
+    gap (ndarray): Final duality gap at each point, shape (M, P)
+    """
+
+    def __init__(self, assets, factor_cols, target, min_weight, max_weights, penalties,
+                 weights, exposures, tracking_error, converged, gap):
+        self.assets = list(assets)
+        self.factor_cols = list(factor_cols)
+        self.target = np.asarray(target, dtype=float)
+        self.min_weight = min_weight
+        self.max_weights = np.asarray(max_weights, dtype=float)
+        self.penalties = np.asarray(penalties, dtype=float)
+        self.weights = weights
+        self.exposures = exposures
+        self.tracking_error = tracking_error
+        self.converged = converged
+        self.gap = gap
+
+    @property
+    def concentration(self):
+        """Sum of squared weights, shape (M, P)"""
+        return np.sum(self.weights ** 2, axis=2)
+
+    @property
+    def diversification(self):
+        """Diversification ratio 1 - sum(w^2), shape (M, P)"""
+        return 1.0 - self.concentration
+
+    @property
+    def effective_assets(self):
+        """Effective number of assets 1 / sum(w^2), shape (M, P)"""
+        return 1.0 / self.concentration
+
+    def table(self):
+        """
+        One row per grid point
+
+        Returns:
+        DataFrame: max_weight, penalty, tracking_error, diversification,
+                   effective_assets, n_holdings, max_holding, converged
+        """
+        caps, penalties = np.meshgrid(self.max_weights, self.penalties, indexing='ij')
+        return pd.DataFrame({
+            'max_weight': caps.ravel(),
+            'penalty': penalties.ravel(),
+            'tracking_error': self.tracking_error.ravel(),
+            'diversification': self.diversification.ravel(),
+            'effective_assets': self.effective_assets.ravel(),
+            'n_holdings': np.sum(self.weights > 1e-6, axis=2).ravel(),
+            'max_holding': self.weights.max(axis=2).ravel(),
+            'converged': self.converged.ravel()
+        })
+
+    def _result(self, i, j):
+        """Grid point (i, j) in the output format of optimize_portfolio"""
+        result = {
+            'success': bool(self.converged[i, j]),
+            'weights': self.weights[i, j],
+            'portfolio_exposures': dict(zip(self.factor_cols, self.exposures[i, j])),
+            'target_exposures': dict(zip(self.factor_cols, self.target)),
+            'tracking_error': float(self.tracking_error[i, j]),
+            'iterations': 0,
+            'max_weight': float(self.max_weights[i]),
+            'penalty': float(self.penalties[j]),
+            'diversification': float(self.diversification[i, j]),
+            'effective_assets': float(self.effective_assets[i, j])
+        }
+        if not self.converged[i, j]:
+            result['error'] = f"Maximum iterations reached (duality gap {self.gap[i, j]:.2e})"
+        return result
+
+    def query(self, max_weight, penalty=0.0):
+        """
+        Portfolio at the grid point closest to the requested settings
+
+        The cap snaps to the largest grid value not above max_weight, so the
+        returned weights respect it whenever the grid allows; the penalty
+        snaps to the nearest grid value.
+
+        Returns:
+        dict: Same keys as optimize_portfolio plus 'max_weight', 'penalty',
+              'diversification' and 'effective_assets' of the grid point;
+              'error' is set when the point did not converge
+        """
+        i = np.searchsorted(self.max_weights, max_weight + 1e-12, side='right') - 1
+        i = max(i, 0)
+        j = int(np.argmin(np.abs(self.penalties - penalty)))
+        return self._result(i, j)
+
+    def most_diversified(self, max_tracking_error):
+        """
+        Least concentrated portfolio on the grid within a tracking error budget
+
+        Returns:
+        dict: As query, or None when no grid point meets the budget
+        """
+        feasible = self.converged & (self.tracking_error <= max_tracking_error)
+        if not feasible.any():
+            return None
+        concentration = np.where(feasible, self.concentration, np.inf)
+        i, j = np.unravel_index(np.argmin(concentration), concentration.shape)
+        return self._result(i, j)
+
+
+def compute_frontier(betas, target_exposures, max_weights=None, penalties=None, min_weight=0.0,
+                     factor_cols=FACTOR_COLS, tol=1e-10):
+    """
+    Solve the exposure-matching problem over a grid of weight caps and diversification penalties
+
+        min ||B'w - t||^2 + penalty ||w||^2  s.t. sum(w) = 1, min_weight <= w <= max_weight
+
+    The grid is traversed as a homotopy. For each cap the penalties are
+    visited in increasing order, each solve warm-started from the previous
+    one. The first penalty of each cap starts from the solution of the
+    previous, looser cap, projected onto the tighter bounds. The betas,
+    bounds and curvature are prepared once.
+
+    Parameters:
+    betas (DataFrame or ndarray): Factor betas for each asset
+    target_exposures (dict): Target factor exposures
+    max_weights (array-like): Weight caps, DEFAULT_MAX_WEIGHTS by default;
+                              caps below 1 / N are dropped as infeasible
+    penalties (array-like): Diversification penalties, DEFAULT_PENALTIES by default
+    min_weight (float): Minimum weight per asset
+    factor_cols (list): Factor columns to match
+    tol (float): Duality gap tolerance for each solve
+
+    Returns:
+    EfficientFrontier: Solutions on the grid
+    """
+    B = np.ascontiguousarray(_beta_matrix(betas, factor_cols))
+    n_assets, n_factors = B.shape
+    target = np.array([target_exposures.get(col, 0.0) for col in factor_cols])
+    assets = list(betas.index) if hasattr(betas, 'index') else list(range(n_assets))
+
+    max_weights = np.unique(np.asarray(DEFAULT_MAX_WEIGHTS if max_weights is None else max_weights,
+                                       dtype=float))
+    max_weights = max_weights[(max_weights * n_assets >= 1.0 - 1e-12) & (max_weights >= min_weight)]
+    if len(max_weights) == 0:
+        raise ValueError(f"No feasible max_weight for {n_assets} assets, need at least {1.0 / n_assets:.4f}")
+    if min_weight * n_assets > 1.0 + 1e-12:
+        raise ValueError(f"min_weight {min_weight} is infeasible for {n_assets} assets")
+    penalties = np.unique(np.asarray(DEFAULT_PENALTIES if penalties is None else penalties, dtype=float))
+    if np.any(penalties < 0):
+        raise ValueError("Diversification penalties must be non-negative")
+
+    n_caps, n_penalties = len(max_weights), len(penalties)
+    weights = np.empty((n_caps, n_penalties, n_assets))
+    converged = np.empty((n_caps, n_penalties), dtype=bool)
+    gap = np.empty((n_caps, n_penalties))
+    curvature = _curvature(B)
+
+    with metrics.stage('frontier') as counters:
+        iterations = 0
+        w_loose = None
+        # Loosest cap first: its solution is feasible after projection onto every tighter cap
+        for i in range(n_caps - 1, -1, -1):
+            lb, ub = _expand_bounds(min_weight, max_weights[i], n_assets)
+            w = None if w_loose is None else project_bounded_simplex(w_loose, lb, ub)
+            for j, penalty in enumerate(penalties):
+                result = solve_diversified_qp(B, target, penalty, lb, ub, w0=w, tol=tol,
+                                              curvature=curvature)
+                w = result['weights']
+                weights[i, j] = w
+                converged[i, j] = result['converged']
+                gap[i, j] = result['gap']
+                iterations += result['iterations']
+                if j == 0:
+                    w_loose = w
+        counters['points'] = n_caps * n_penalties
+        counters['assets'] = n_assets
+        counters['iterations'] = iterations
+        counters['converged'] = int(converged.sum())
+
+    exposures = weights @ B
+    tracking_error = np.sqrt(np.sum((exposures - target) ** 2, axis=2))
+    return EfficientFrontier(assets, factor_cols, target, min_weight, max_weights, penalties,
+                             weights, exposures, tracking_error, converged, gap)
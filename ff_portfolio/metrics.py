@@ -0,0 +1,230 @@
+# Timing and counter instrumentation for the pipeline stages
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+_sinks = []
+_sinks_lock = threading.Lock()
+
+
+def add_sink(sink):
+    """
+    Send stage events to sink, an object with an emit(event) method
+
+    Events are dicts with 'stage', 'labels', 'duration' (seconds),
+    'counters', 'failed' and 'timestamp'. Instrumented code does no work
+    beyond a list check while no sink is registered.
+    """
+    with _sinks_lock:
+        if sink not in _sinks:
+            _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    with _sinks_lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+
+def enabled():
+    return bool(_sinks)
+
+
+def emit(event):
+    """Deliver one event to every sink; a failing sink does not fail the pipeline"""
+    for sink in list(_sinks):
+        try:
+            sink.emit(event)
+        except Exception as e:
+            print(f"Metrics sink {type(sink).__name__} failed: {e}", file=sys.stderr)
+
+
+@contextlib.contextmanager
+def stage(name, **labels):
+    """
+    Time a pipeline stage
+
+    Yields a dict the caller fills with numeric counters (iterations,
+    rows, ...); they are reported with the wall time when the block exits,
+    also when it raises.
+
+    Example:
+        with metrics.stage('optimization', mode='exposure') as counters:
+            result = solve(...)
+            counters['iterations'] = result['iterations']
+    """
+    counters = {}
+    if not _sinks:
+        yield counters
+        return
+    failed = False
+    start = time.perf_counter()
+    try:
+        yield counters
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        emit({
+            'stage': name,
+            'labels': labels,
+            'duration': time.perf_counter() - start,
+            'counters': counters,
+            'failed': failed,
+            'timestamp': time.time()
+        })
+
+
+class JSONLogSink:
+    """
+    One JSON object per event, appended to a file or written to a stream
+
+    Parameters:
+    target (str or file): Path of the log file, or an open text stream
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        line = json.dumps(event, default=float) + '\n'
+        with self._lock:
+            if isinstance(self.target, str):
+                with open(self.target, 'a') as f:
+                    f.write(line)
+            else:
+                self.target.write(line)
+                self.target.flush()
+
+
+def _label_text(labels):
+    """Prometheus label set with backslashes, quotes and newlines escaped"""
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels) + '}'
+
+
+class MetricsRegistry:
+    """
+    In-process aggregate of stage events
+
+    Keeps count, failures, total/min/max/last wall time and the sum of
+    every counter for each stage and label combination. Safe to share
+    between threads.
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        key = (event['stage'], tuple(sorted(event['labels'].items())))
+        duration = event['duration']
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {'count': 0, 'failures': 0, 'total': 0.0,
+                                            'min': duration, 'max': duration, 'counters': {}}
+            stats['count'] += 1
+            stats['failures'] += int(event['failed'])
+            stats['total'] += duration
+            stats['min'] = min(stats['min'], duration)
+            stats['max'] = max(stats['max'], duration)
+            stats['last'] = duration
+            for name, value in event['counters'].items():
+                stats['counters'][name] = stats['counters'].get(name, 0) + float(value)
+
+    def summary(self):
+        """
+        One row per stage and labels
+
+        Returns:
+        list: Dicts with 'stage', 'labels', 'count', 'failures', 'mean_ms',
+              'min_ms', 'max_ms', 'last_ms', 'total_s' and the mean of
+              every counter per call
+        """
+        rows = []
+        with self._lock:
+            for (name, labels), stats in sorted(self._stats.items()):
+                row = {
+                    'stage': name,
+                    'labels': ','.join(f'{k}={v}' for k, v in labels),
+                    'count': stats['count'],
+                    'failures': stats['failures'],
+                    'mean_ms': 1e3 * stats['total'] / stats['count'],
+                    'min_ms': 1e3 * stats['min'],
+                    'max_ms': 1e3 * stats['max'],
+                    'last_ms': 1e3 * stats['last'],
+                    'total_s': stats['total']
+                }
+                for counter, total in stats['counters'].items():
+                    row[counter] = total / stats['count']
+                rows.append(row)
+        return rows
+
+    def to_prometheus(self, prefix='ff_portfolio'):
+        """Aggregates in the Prometheus text exposition format"""
+        lines = [
+            f'# HELP {prefix}_stage_seconds Wall time of pipeline stages',
+            f'# TYPE {prefix}_stage_seconds summary'
+        ]
+        counter_lines = []
+        failure_lines = []
+        with self._lock:
+            for (name, labels), stats in sorted(self._stats.items()):
+                base = (('stage', name),) + labels
+                lines.append(f'{prefix}_stage_seconds_count{_label_text(base)} {stats["count"]}')
+                lines.append(f'{prefix}_stage_seconds_sum{_label_text(base)} {stats["total"]!r}')
+                failure_lines.append(f'{prefix}_stage_failures_total{_label_text(base)} {stats["failures"]}')
+                for counter, total in sorted(stats['counters'].items()):
+                    counter_lines.append(
+                        f'{prefix}_stage_counter_total{_label_text(base + (("counter", counter),))} {total!r}')
+        lines += [f'# HELP {prefix}_stage_failures_total Pipeline stages that raised',
+                  f'# TYPE {prefix}_stage_failures_total counter'] + failure_lines
+        lines += [f'# HELP {prefix}_stage_counter_total Work counters reported by pipeline stages',
+                  f'# TYPE {prefix}_stage_counter_total counter'] + counter_lines
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class PrometheusTextSink:
+    """
+    Prometheus text file for the node exporter textfile collector
+
+    Aggregates events in a MetricsRegistry and rewrites the file atomically
+    at most once per interval seconds, and on flush().
+
+    Parameters:
+    path (str): Output file, conventionally ending in .prom
+    registry (MetricsRegistry): Registry to aggregate into, a new one by default
+    interval (float): Minimum seconds between rewrites
+    """
+
+    def __init__(self, path, registry=None, interval=5.0):
+        self.path = path
+        self.registry = registry if registry is not None else MetricsRegistry()
+        self.interval = interval
+        self._written = -float('inf')
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        self.registry.emit(event)
+        if time.monotonic() - self._written >= self.interval:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(self.registry.to_prometheus())
+            os.replace(tmp_path, self.path)
+            self._written = time.monotonic()
@@ -0,0 +1,326 @@
+# Objectives and constraints with exact gradients and Hessian-vector products
+import numpy as np
+
+
+class Objective:
+    """
+    Smooth (or piecewise smooth) function of the portfolio weights
+
+    Subclasses implement value, gradient and hessp, all vectorized over
+    the N assets in O(N K) or better. The solvers in optimizer.py evaluate
+    their objectives and optimality certificates through these classes.
+    Objectives add up with +, and minimize_kwargs hands them to
+    scipy.optimize.minimize with exact derivatives instead of finite
+    differences.
+    """
+
+    def value(self, w):
+        raise NotImplementedError
+
+    def gradient(self, w):
+        raise NotImplementedError
+
+    def value_and_gradient(self, w):
+        """Value and gradient together, sharing work where the objective allows"""
+        return self.value(w), self.gradient(w)
+
+    def hessp(self, w, v):
+        """Hessian at w times the direction v"""
+        raise NotImplementedError
+
+    def __call__(self, w):
+        return self.value(w)
+
+    def __add__(self, other):
+        return SumObjective([self, other])
+
+    def minimize_kwargs(self):
+        """Keyword arguments for scipy.optimize.minimize: fun, jac and hessp"""
+        return {'fun': self.value, 'jac': self.gradient, 'hessp': self.hessp}
+
+
+class ExposureGap(Objective):
+    """
+    Squared exposure gap (B'w - t)' F (B'w - t)
+
+    With factor_cov=None, F is the identity and this is the exposure
+    matching objective ||B'w - t||^2; with a factor covariance it is the
+    factor part of the ex-ante tracking variance.
+
+    Parameters:
+    B (ndarray): Factor betas, shape (N, K)
+    target (ndarray): Target exposures, shape (K,)
+    factor_cov (ndarray): Optional factor covariance F, shape (K, K)
+    """
+
+    def __init__(self, B, target, factor_cov=None):
+        self.B = np.ascontiguousarray(B, dtype=float)
+        self.target = np.asarray(target, dtype=float)
+        self.factor_cov = None if factor_cov is None else np.asarray(factor_cov, dtype=float)
+
+    def _weigh(self, x):
+        return x if self.factor_cov is None else self.factor_cov @ x
+
+    def value(self, w):
+        resid = self.B.T @ w - self.target
+        return float(resid @ self._weigh(resid))
+
+    def gradient(self, w):
+        return 2.0 * (self.B @ self._weigh(self.B.T @ w - self.target))
+
+    def value_and_gradient(self, w):
+        resid = self.B.T @ w - self.target
+        weighted = self._weigh(resid)
+        return float(resid @ weighted), 2.0 * (self.B @ weighted)
+
+    def hessp(self, w, v):
+        return 2.0 * (self.B @ self._weigh(self.B.T @ v))
+
+
+class SeparableQuadratic(Objective):
+    """
+    sum(quad (w - anchor)^2)
+
+    Quadratic transaction costs around current holdings, specific risk
+    (quad = specific variances, anchor = 0) or the diversification penalty
+    (quad = penalty, anchor = 0).
+    """
+
+    def __init__(self, quad, anchor=0.0):
+        self.quad = np.asarray(quad, dtype=float)
+        self.anchor = np.asarray(anchor, dtype=float)
+
+    def value(self, w):
+        return float(np.sum(self.quad * (w - self.anchor) ** 2))
+
+    def gradient(self, w):
+        return 2.0 * self.quad * (w - self.anchor)
+
+    def hessp(self, w, v):
+        return 2.0 * self.quad * v
+
+
+class L1Turnover(Objective):
+    """
+    Proportional transaction costs sum(cost |w - anchor|)
+
+    Not differentiable where a weight equals its anchor; there the
+    gradient is the minimum-norm subgradient (zero for that asset). The
+    Hessian is zero wherever the gradient exists.
+    """
+
+    def __init__(self, cost, anchor):
+        self.cost = np.asarray(cost, dtype=float)
+        self.anchor = np.asarray(anchor, dtype=float)
+
+    def value(self, w):
+        return float(np.sum(self.cost * np.abs(w - self.anchor)))
+
+    def gradient(self, w):
+        return self.cost * np.sign(w - self.anchor)
+
+    def hessp(self, w, v):
+        return np.zeros_like(np.asarray(v, dtype=float))
+
+
+class SumObjective(Objective):
+    """Sum of objectives"""
+
+    def __init__(self, terms):
+        self.terms = []
+        for term in terms:
+            self.terms.extend(term.terms if isinstance(term, SumObjective) else [term])
+
+    def value(self, w):
+        return sum(term.value(w) for term in self.terms)
+
+    def gradient(self, w):
+        return sum(term.gradient(w) for term in self.terms)
+
+    def value_and_gradient(self, w):
+        value, gradient = self.terms[0].value_and_gradient(w)
+        for term in self.terms[1:]:
+            term_value, term_gradient = term.value_and_gradient(w)
+            value, gradient = value + term_value, gradient + term_gradient
+        return value, gradient
+
+    def hessp(self, w, v):
+        return sum(term.hessp(w, v) for term in self.terms)
+
+
+class Constraint:
+    """
+    Constraint c(w) = 0 ('eq') or c(w) >= 0 ('ineq'), scipy's convention
+
+    Subclasses implement fun and jacobian; as_scipy gives the dict
+    scipy.optimize.minimize takes, with the exact Jacobian.
+    """
+
+    kind = 'ineq'
+
+    def fun(self, w):
+        raise NotImplementedError
+
+    def jacobian(self, w):
+        raise NotImplementedError
+
+    def as_scipy(self):
+        return {'type': self.kind, 'fun': self.fun, 'jac': self.jacobian}
+
+
+class BudgetConstraint(Constraint):
+    """Full investment sum(w) = total"""
+
+    kind = 'eq'
+
+    def __init__(self, total=1.0):
+        self.total = total
+
+    def fun(self, w):
+        return np.array([np.sum(w) - self.total])
+
+    def jacobian(self, w):
+        return np.ones((1, len(w)))
+
+
+class LinearInequality(Constraint):
+    """
+    G w <= h, e.g. compiled by LinearConstraints.compile
+
+    The Jacobian of h - G w is -G, kept sparse when G is; as_scipy
+    densifies it, as SLSQP only accepts dense constraint Jacobians.
+    """
+
+    def __init__(self, G, h):
+        self.G = G
+        self.h = np.asarray(h, dtype=float)
+
+    def fun(self, w):
+        return self.h - self.G @ w
+
+    def jacobian(self, w):
+        return -self.G
+
+    def as_scipy(self):
+        dense = -(self.G.toarray() if hasattr(self.G, 'toarray') else np.asarray(self.G, dtype=float))
+        return {'type': self.kind, 'fun': self.fun, 'jac': lambda w: dense}
+
+
+class TurnoverCap(Constraint):
+    """
+    Turnover budget sum(|w - current|) <= cap
+
+    Piecewise linear, with the minimum-norm subgradient where a weight
+    equals its current holding.
+    """
+
+    def __init__(self, current, cap):
+        self.current = np.asarray(current, dtype=float)
+        self.cap = cap
+
+    def fun(self, w):
+        return np.array([self.cap - np.sum(np.abs(w - self.current))])
+
+    def jacobian(self, w):
+        return -np.sign(w - self.current)[None, :]
+
+
+def portfolio_objective(B, target, current_weights=None, costs=0.0, penalty='l1',
+                        factor_cov=None, specific_var=None, diversification=0.0):
+    """
+    The objective minimized by optimize_portfolio for the given settings
+
+        (B'w - t)' F (B'w - t)                     exposure gap (F = I without factor_cov)
+        + sum(D w^2)                               specific risk, with specific_var
+        + sum(costs |w - c|) or sum(costs (w - c)^2)  turnover, with current_weights
+        + diversification ||w||^2                  diversification penalty
+
+    Parameters:
+    B (ndarray): Factor betas, shape (N, K)
+    target (ndarray): Target exposures, shape (K,)
+    current_weights (ndarray): Current holdings, for turnover costs
+    costs (float or ndarray): Per-asset cost per unit of turnover
+    penalty (str): 'l1' or 'quadratic'
+    factor_cov (ndarray): Factor covariance, for the tracking variance
+    specific_var (ndarray): Specific variances, for the tracking variance
+    diversification (float): Weight of ||w||^2
+
+    Returns:
+    Objective: With exact gradient and hessp
+    """
+    if penalty not in ('l1', 'quadratic'):
+        raise ValueError(f"Unknown penalty '{penalty}', expected 'l1' or 'quadratic'")
+    B = np.ascontiguousarray(B, dtype=float)
+    n_assets = B.shape[0]
+    objective = ExposureGap(B, target, factor_cov)
+    if specific_var is not None:
+        objective = objective + SeparableQuadratic(np.maximum(np.asarray(specific_var, dtype=float), 0.0))
+    if current_weights is not None:
+        costs = np.broadcast_to(np.asarray(costs, dtype=float), (n_assets,))
+        if penalty == 'l1':
+            objective = objective + L1Turnover(costs, current_weights)
+        else:
+            objective = objective + SeparableQuadratic(costs, current_weights)
+    if diversification:
+        objective = objective + SeparableQuadratic(np.full(n_assets, float(diversification)))
+    return objective
+
+
+def portfolio_constraints(current_weights=None, turnover_cap=None, G=None, h=None):
+    """
+    Budget, turnover cap and linear constraints in scipy's format
+
+    Returns:
+    list: Constraint dicts with exact Jacobians, for scipy.optimize.minimize
+    """
+    constraints = [BudgetConstraint()]
+    if turnover_cap is not None:
+        constraints.append(TurnoverCap(current_weights, turnover_cap))
+    if G is not None and G.shape[0]:
+        constraints.append(LinearInequality(G, h))
+    return [constraint.as_scipy() for constraint in constraints]
+
+
+def _relative_error(analytic, numeric):
+    analytic, numeric = np.atleast_1d(analytic), np.atleast_1d(numeric)
+    return float(np.max(np.abs(analytic - numeric)) / (1.0 + np.max(np.abs(numeric))))
+
+
+def check_derivatives(function, w, eps=1e-6, n_directions=5, seed=0):
+    """
+    Compare analytic derivatives with central finite differences
+
+    Derivatives are checked along random directions, so each check costs a
+    few evaluations instead of N. For an Objective both the gradient and
+    hessp are checked; for a Constraint the Jacobian. Piecewise smooth
+    terms (L1Turnover, TurnoverCap) only match away from their kinks,
+    i.e. when no weight is within eps of its anchor.
+
+    Parameters:
+    function (Objective or Constraint): Function to check
+    w (ndarray): Point to check at
+    eps (float): Finite-difference step
+    n_directions (int): Number of random directions
+    seed (int): Seed of the directions
+
+    Returns:
+    dict: Largest relative error of each derivative, e.g.
+          {'gradient': 3e-10, 'hessp': 1e-9}
+    """
+    w = np.asarray(w, dtype=float)
+    rng = np.random.default_rng(seed)
+    errors = {}
+    for _ in range(n_directions):
+        d = rng.standard_normal(len(w))
+        d /= np.linalg.norm(d)
+        if isinstance(function, Constraint):
+            numeric = (function.fun(w + eps * d) - function.fun(w - eps * d)) / (2.0 * eps)
+            checks = {'jacobian': (function.jacobian(w) @ d, numeric)}
+        else:
+            numeric_grad = (function.value(w + eps * d) - function.value(w - eps * d)) / (2.0 * eps)
+            numeric_hessp = (function.gradient(w + eps * d) - function.gradient(w - eps * d)) / (2.0 * eps)
+            checks = {'gradient': (function.gradient(w) @ d, numeric_grad),
+                      'hessp': (function.hessp(w, d), numeric_hessp)}
+        for name, (analytic, numeric) in checks.items():
+            errors[name] = max(errors.get(name, 0.0), _relative_error(analytic, numeric))
+    return errors
@@ -0,0 +1,1304 @@
+# Target factor exposure portfolio optimization
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .betas import FACTOR_COLS
+from .objectives import ExposureGap, L1Turnover, LinearInequality, SeparableQuadratic
+
+
+def project_bounded_simplex(v, lb, ub, total=1.0):
+    """
+    Euclidean projection onto {w : sum(w) = total, lb <= w <= ub}
+
+    The projection is clip(v - tau, lb, ub) for the scalar tau that makes the
+    weights sum to total. The sum is piecewise linear in tau with breakpoints
+    at v - ub and v - lb, so tau is found exactly from one sort.
+
+    Parameters:
+    v (ndarray): Point to project, shape (N,)
+    lb (ndarray): Lower bounds, shape (N,)
+    ub (ndarray): Upper bounds, shape (N,)
+    total (float): Required sum of the weights
+
+    Returns:
+    ndarray: Projected weights
+    """
+    # Events: leaving the upper bound adds slope -1, reaching the lower bound removes it
+    points = np.concatenate([v - ub, v - lb])
+    slopes = np.concatenate([-np.ones(len(v)), np.ones(len(v))])
+    order = np.argsort(points, kind='stable')
+    points = points[order]
+    slope_after = np.cumsum(slopes[order])
+
+    # Sum of the clipped weights at each breakpoint, starting from sum(ub)
+    steps = np.diff(points) * slope_after[:-1]
+    sums = np.sum(ub) + np.concatenate([[0.0], np.cumsum(steps)])
+
+    # sums is non-increasing; find the segment that brackets the total
+    j = np.searchsorted(-sums, -total, side='left')
+    if j == 0:
+        tau = points[0]
+    elif j >= len(points):
+        tau = points[-1]
+    else:
+        span = sums[j - 1] - sums[j]
+        frac = (sums[j - 1] - total) / span if span > 0 else 0.0
+        tau = points[j - 1] + frac * (points[j] - points[j - 1])
+
+    # One Newton step on tau removes rounding error from the interpolation
+    w = np.clip(v - tau, lb, ub)
+    free = (w > lb) & (w < ub)
+    n_free = np.count_nonzero(free)
+    if n_free:
+        tau += (np.sum(w) - total) / n_free
+        w = np.clip(v - tau, lb, ub)
+    return w
+
+
+def _linear_minimizer(grad, lb, ub, total=1.0):
+    """Vertex of the bounded simplex minimizing grad @ w (fractional knapsack)"""
+    order = np.argsort(grad)
+    room = (ub - lb)[order]
+    budget = total - np.sum(lb)
+    filled = np.clip(budget - (np.cumsum(room) - room), 0.0, room)
+    s = lb.copy()
+    s[order] += filled
+    return s
+
+
+def _expand_bounds(lb, ub, n_assets):
+    """Broadcast scalar or per-asset bounds and check feasibility"""
+    lb = np.broadcast_to(np.asarray(lb, dtype=float), (n_assets,)).copy()
+    ub = np.broadcast_to(np.asarray(ub, dtype=float), (n_assets,)).copy()
+    if np.any(lb > ub) or np.sum(lb) > 1.0 + 1e-12 or np.sum(ub) < 1.0 - 1e-12:
+        raise ValueError(
+            f"Infeasible weight bounds: sum(min)={np.sum(lb):.4f}, sum(max)={np.sum(ub):.4f}, "
+            "weights must sum to 1"
+        )
+    return lb, ub
+
+
+def _prox_newton(B, target, center, rho, lb, ub, lam, tol=1e-10, max_newton=20):
+    """
+    Semismooth Newton on the K-dimensional dual of the proximal subproblem
+
+        min ||B'w - t||^2 + rho/2 ||w - center||^2  s.t. w in bounded simplex
+
+    For a multiplier lam on z = B'w the minimizing weights are the projection
+    of center - B lam / rho onto the bounded simplex, so every iterate is
+    feasible and the linear algebra is K x K.
+    """
+    def dual(lam):
+        w = project_bounded_simplex(center - (B @ lam) / rho, lb, ub)
+        exposures = B.T @ w
+        value = -lam @ lam / 4.0 - lam @ target + 0.5 * rho * np.sum((w - center) ** 2) + lam @ exposures
+        return -value, -(exposures - target - lam / 2.0), w
+
+    phi, grad, w = dual(lam)
+    evaluations = 1
+    steps = 0
+    for steps in range(1, max_newton + 1):
+        if np.linalg.norm(grad) <= tol:
+            break
+
+        # Generalized Hessian: free assets move together under the budget constraint
+        free = B[(w > lb) & (w < ub)]
+        if len(free):
+            free = free - free.mean(axis=0)
+        hessian = free.T @ free / rho + 0.5 * np.eye(len(lam))
+        direction = -np.linalg.solve(hessian, grad)
+
+        # Backtracking line search on the dual
+        alpha = 1.0
+        while alpha >= 1e-12:
+            phi_new, grad_new, w_new = dual(lam + alpha * direction)
+            evaluations += 1
+            if phi_new <= phi + 1e-4 * alpha * (grad @ direction):
+                break
+            alpha *= 0.5
+        else:
+            break
+        lam = lam + alpha * direction
+        phi, grad, w = phi_new, grad_new, w_new
+
+    return w, lam, steps, evaluations
+
+
+def _active_set(B, target, w, lb, ub, tol, max_pivots):
+    """
+    Primal active-set iterations on the exposure QP from feasible weights
+
+    The weights strictly inside their bounds are free and move along the
+    smallest budget-neutral step that minimizes the exposure gap over them,
+    which is K x K linear algebra like the dual Newton step. A step that hits
+    a bound fixes that weight; at the optimum of the current free set the
+    fixed weight whose reduced gradient most wants to move is released.
+    Started from the solution for a nearby target this usually needs only a
+    few pivots. Returns the weights once their duality gap is within tol, or
+    None if the pivots run out.
+    """
+    w = w.copy()
+    free = (w > lb) & (w < ub)
+    for _ in range(max_pivots):
+        if not free.any():
+            return None
+        # Free assets move together under the budget constraint
+        centered = B[free] - B[free].mean(axis=0)
+        residual = B.T @ w - target
+        direction = -centered @ np.linalg.lstsq(centered.T @ centered, residual, rcond=None)[0]
+
+        # Longest step towards the free-set optimum that stays within the bounds
+        current = w[free]
+        bound = np.where(direction < 0.0, lb[free], ub[free])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.where(direction != 0.0, (bound - current) / direction, np.inf)
+        blocking = int(np.argmin(ratios))
+        if ratios[blocking] < 1.0:
+            w[free] = current + max(ratios[blocking], 0.0) * direction
+            index = np.flatnonzero(free)[blocking]
+            w[index] = bound[blocking]
+            free[index] = False
+            continue
+        w[free] = current + direction
+
+        exposures = B.T @ w - target
+        grad = 2.0 * (B @ exposures)
+        gap = np.dot(grad, w - _linear_minimizer(grad, lb, ub))
+        if gap <= tol * (1.0 + exposures @ exposures):
+            return w
+
+        # Release the fixed weight that most wants to move off its bound
+        reduced = grad - grad[free].mean()
+        violation = np.where(w <= lb, -reduced, reduced)
+        violation[free] = -np.inf
+        free[np.argmax(violation)] = True
+    return None
+
+
+def _curvature(B):
+    """Largest eigenvalue of the objective Hessian 2 B B', from the K x K Gram matrix"""
+    curvature = 2.0 * np.linalg.eigvalsh(B.T @ B)[-1]
+    return curvature if curvature > 0 else 1.0
+
+
+def solve_exposure_qp(B, target, lb=0.0, ub=1.0, w0=None, tol=1e-10, max_iter=200,
+                      curvature=None, lam0=None, rho0=None):
+    """
+    Minimize ||B'w - target||^2 subject to sum(w) = 1 and lb <= w <= ub
+
+    Proximal point iterations with a shrinking proximal weight. Each proximal
+    subproblem is solved by semismooth Newton on its K-dimensional dual, so
+    the work per step is O(N K) plus one sort, with no N x N matrices and no
+    finite-difference gradients. Convergence is certified by the Frank-Wolfe
+    duality gap, an upper bound on the distance of the objective from its
+    optimum. Among the optimal portfolios the iterates stay close to w0.
+
+    Parameters:
+    B (ndarray): Factor betas, shape (N, K)
+    target (ndarray): Target exposures, shape (K,)
+    lb, ub (float or ndarray): Weight bounds
+    w0 (ndarray): Starting weights, projected onto the feasible set
+    tol (float): Duality gap tolerance, relative to 1 + objective
+    max_iter (int): Maximum number of proximal iterations
+    curvature (float): Optional precomputed 2 * max eigenvalue of B'B
+    lam0 (ndarray): Starting dual multipliers on the exposures, shape (K,)
+    rho0 (float): Starting proximal weight, clipped to the schedule's range
+
+    Returns:
+    dict: 'weights', 'objective', 'gap', 'iterations', 'newton_steps',
+          'evaluations' (objective and gradient evaluations, primal and
+          dual), 'converged', and the final 'lam' and 'rho' for warm-starting
+          a solve for a nearby target
+    """
+    B = np.ascontiguousarray(B, dtype=float)
+    target = np.asarray(target, dtype=float)
+    n_assets, n_factors = B.shape
+    lb, ub = _expand_bounds(lb, ub, n_assets)
+
+    if w0 is None:
+        w0 = np.full(n_assets, 1.0 / n_assets)
+    w = project_bounded_simplex(np.asarray(w0, dtype=float), lb, ub)
+
+    # Proximal weight relative to the curvature of the objective
+    if curvature is None:
+        curvature = _curvature(B)
+    rho_min = 1e-8 * curvature
+    rho = 1e-2 * curvature if rho0 is None else min(max(rho0, rho_min), 1e-2 * curvature)
+
+    lam = np.zeros(n_factors) if lam0 is None else np.array(lam0, dtype=float)
+    newton_steps = 0
+    evaluations = 1
+    iteration = 0
+
+    # A warm start may already be optimal
+    exposure_gap = ExposureGap(B, target)
+    objective, grad = exposure_gap.value_and_gradient(w)
+    gap = np.dot(grad, w - _linear_minimizer(grad, lb, ub))
+    while gap > tol * (1.0 + objective) and iteration < max_iter:
+        # Once few weights are free, pivoting on the active set often finishes the job
+        max_pivots = 10 * n_factors
+        pivoted = None
+        if np.count_nonzero((w > lb) & (w < ub)) <= max_pivots:
+            pivoted = _active_set(B, target, w, lb, ub, tol, max_pivots)
+        if pivoted is not None:
+            w = pivoted
+            objective, grad = exposure_gap.value_and_gradient(w)
+            gap = np.dot(grad, w - _linear_minimizer(grad, lb, ub))
+            evaluations += 1
+            break
+
+        iteration += 1
+        w_prev = w
+        w, lam, steps, dual_evaluations = _prox_newton(B, target, w, rho, lb, ub, lam)
+        newton_steps += steps
+        evaluations += dual_evaluations + 1
+
+        objective, grad = exposure_gap.value_and_gradient(w)
+        gap = np.dot(grad, w - _linear_minimizer(grad, lb, ub))
+
+        # Stop once the smallest proximal step can no longer move the weights
+        if rho == rho_min and np.array_equal(w, w_prev):
+            break
+        rho = max(0.1 * rho, rho_min)
+
+    return {
+        'weights': w,
+        'objective': objective,
+        'gap': float(gap),
+        'iterations': iteration,
+        'newton_steps': newton_steps,
+        'evaluations': evaluations,
+        'converged': bool(gap <= tol * (1.0 + objective)),
+        'lam': lam,
+        'rho': rho
+    }
+
+
+def _prox_newton_constrained(B, target, G, h, center, rho, lb, ub, y, tol=1e-10, max_newton=50):
+    """
+    _prox_newton with linear inequality constraints G w <= h
+
+    The dual has the K exposure multipliers plus one non-negative
+    multiplier per row of G, and is solved by projected semismooth Newton:
+    rows at a zero multiplier whose constraint is slack are held at zero,
+    the rest take a Newton step, and the step is projected back onto
+    mu >= 0. Only the rows in the Newton system enter the Hessian, so
+    hundreds of slack group caps cost one sparse product per evaluation.
+    """
+    n_factors = B.shape[1]
+
+    def dual(y):
+        lam, mu = y[:n_factors], y[n_factors:]
+        w = project_bounded_simplex(center - (B @ lam + G.T @ mu) / rho, lb, ub)
+        exposures = B.T @ w
+        slack = G @ w - h
+        value = (-lam @ lam / 4.0 - lam @ target + 0.5 * rho * np.sum((w - center) ** 2)
+                 + lam @ exposures + mu @ slack)
+        grad = -np.concatenate([exposures - target - lam / 2.0, slack])
+        return -value, grad, w
+
+    def projected(y):
+        y = y.copy()
+        y[n_factors:] = np.maximum(y[n_factors:], 0.0)
+        return y
+
+    phi, grad, w = dual(y)
+    residual = np.linalg.norm(y - projected(y - grad))
+    steps = 0
+    for steps in range(1, max_newton + 1):
+        if residual <= tol:
+            break
+
+        # Multipliers pinned at zero by a slack constraint stay out of the Newton system
+        rows = np.flatnonzero((y[n_factors:] > 0) | (grad[n_factors:] <= 0))
+        n_vars = n_factors + len(rows)
+
+        # Generalized Hessian over the free assets, centered for the budget constraint
+        free = np.flatnonzero((w > lb) & (w < ub))
+        hessian = np.zeros((n_vars, n_vars))
+        if len(free):
+            A = np.hstack([B[free], G[rows][:, free].T.toarray()])
+            a_sum = A.sum(axis=0)
+            hessian = (A.T @ A - np.outer(a_sum, a_sum) / len(free)) / rho
+        hessian[:n_factors, :n_factors] += 0.5 * np.eye(n_factors)
+        # Rows without free assets or linearly dependent rows leave the Hessian singular;
+        # a Levenberg-Marquardt term proportional to the residual keeps the step bounded
+        # and vanishes at the solution, so the local convergence stays superlinear
+        hessian[np.diag_indices(n_vars)] += 1e-12 * (1.0 + np.abs(np.diag(hessian)).max()) + residual / rho
+        index = np.concatenate([np.arange(n_factors), n_factors + rows])
+        direction = np.zeros(len(y))
+        direction[index] = -np.linalg.solve(hessian, grad[index])
+
+        # Armijo search along the projected path, falling back to the gradient. Near
+        # the solution the dual decrease drowns in rounding, so a full step that
+        # shrinks the optimality residual is accepted as well
+        for candidate in (direction, -grad):
+            alpha = 1.0
+            while alpha >= 1e-12:
+                y_new = projected(y + alpha * candidate)
+                phi_new, grad_new, w_new = dual(y_new)
+                residual_new = np.linalg.norm(y_new - projected(y_new - grad_new))
+                if (phi_new <= phi + 1e-4 * (grad @ (y_new - y))
+                        or (alpha == 1.0 and residual_new < 0.5 * residual)):
+                    break
+                alpha *= 0.5
+            else:
+                continue
+            break
+        else:
+            break
+        y, phi, grad, w, residual = y_new, phi_new, grad_new, w_new, residual_new
+
+    return w, y, steps
+
+
+def solve_constrained_qp(B, target, G, h, lb=0.0, ub=1.0, w0=None, tol=1e-10, feas_tol=1e-8,
+                         max_iter=200, curvature=None):
+    """
+    Minimize ||B'w - target||^2 subject to sum(w) = 1, lb <= w <= ub and G w <= h
+
+    The proximal point method of solve_exposure_qp, with the rows of G
+    (group caps, budgets, factor bands; see LinearConstraints.compile)
+    dualized in each proximal subproblem next to the exposures. The
+    duality gap certificate uses the row multipliers: for mu >= 0,
+
+        f(w) - f* <= (grad f + G' mu)'(w - s) - mu'(G w - h)
+
+    with s the bounded-simplex vertex minimizing (grad f + G' mu)'s, and
+    the weights must also satisfy G w <= h to within feas_tol.
+
+    Parameters:
+    B (ndarray): Factor betas, shape (N, K)
+    target (ndarray): Target exposures, shape (K,)
+    G (sparse matrix): Constraint rows, shape (m, N), CSC preferred
+    h (ndarray): Right-hand sides, shape (m,)
+    lb, ub (float or ndarray): Weight bounds
+    w0 (ndarray): Starting weights, projected onto the bounded simplex
+    tol (float): Duality gap tolerance, relative to 1 + objective
+    feas_tol (float): Allowed constraint violation
+    max_iter (int): Maximum number of proximal iterations
+    curvature (float): Optional precomputed 2 * max eigenvalue of B'B
+
+    Returns:
+    dict: 'weights', 'objective', 'gap', 'violation' (largest G w - h),
+          'multipliers' (m,), 'iterations', 'newton_steps', 'converged'
+    """
+    import scipy.sparse as sp
+
+    B = np.ascontiguousarray(B, dtype=float)
+    target = np.asarray(target, dtype=float)
+    G = sp.csc_matrix(G)
+    h = np.asarray(h, dtype=float)
+    n_assets, n_factors = B.shape
+    lb, ub = _expand_bounds(lb, ub, n_assets)
+
+    if w0 is None:
+        w0 = np.full(n_assets, 1.0 / n_assets)
+    w = project_bounded_simplex(np.asarray(w0, dtype=float), lb, ub)
+
+    if curvature is None:
+        curvature = _curvature(B)
+    rho = 1e-2 * curvature
+    rho_min = 1e-8 * curvature
+
+    y = np.zeros(n_factors + G.shape[0])
+    newton_steps = 0
+    iteration = 0
+
+    exposure_gap = ExposureGap(B, target)
+    inequality = LinearInequality(G, h)
+
+    def certificate(w, mu):
+        objective, grad = exposure_gap.value_and_gradient(w)
+        slack = -inequality.fun(w)
+        grad = grad - inequality.jacobian(w).T @ mu
+        gap = np.dot(grad, w - _linear_minimizer(grad, lb, ub)) - mu @ slack
+        return objective, gap, slack.max(initial=0.0)
+
+    objective, gap, violation = certificate(w, y[n_factors:])
+    while (gap > tol * (1.0 + objective) or violation > feas_tol) and iteration < max_iter:
+        iteration += 1
+        w_prev = w
+        w, y, steps = _prox_newton_constrained(B, target, G, h, w, rho, lb, ub, y)
+        newton_steps += steps
+        objective, gap, violation = certificate(w, y[n_factors:])
+
+        if rho == rho_min and np.array_equal(w, w_prev):
+            break
+        rho = max(0.1 * rho, rho_min)
+
+    return {
+        'weights': w,
+        'objective': float(objective),
+        'gap': float(gap),
+        'violation': float(violation),
+        'multipliers': y[n_factors:],
+        'iterations': iteration,
+        'newton_steps': newton_steps,
+        'converged': bool(gap <= tol * (1.0 + objective) and violation <= feas_tol)
+    }
+
+
+def _separable_weights(p, d, anchor, cost, lb, ub, tau):
+    """
+    Minimizers of d/2 w^2 - (p - tau) w + cost |w - anchor| over [lb, ub]
+
+    Soft-thresholding of (p - tau) / d around the anchor, then clipping to
+    the bounds. Every weight is non-increasing and piecewise linear in tau.
+    """
+    m = (p - tau) / d - anchor
+    shrunk = np.sign(m) * np.maximum(np.abs(m) - cost / d, 0.0)
+    return np.clip(anchor + shrunk, lb, ub)
+
+
+def _separable_budget(p, d, anchor, cost, lb, ub, total=1.0, tau=None):
+    """
+    Weights from _separable_weights with the tau that makes them sum to total
+
+    A weight moves with slope -1/d while it is strictly inside its bounds
+    and away from the anchor, i.e. on at most two intervals of tau. The sum
+    is piecewise linear, so Newton steps with one-sided slopes from a warm
+    start usually land exactly on the root; otherwise it is found from one
+    sort of the interval ends, as in project_bounded_simplex.
+
+    Returns:
+    tuple: (weights, tau)
+    """
+    # Intervals of tau where each weight moves, above and below the anchor
+    kink = p - d * anchor
+    inv_d = 1.0 / d
+    starts = np.concatenate([p - cost - d * ub, np.maximum(p + cost - d * ub, kink + cost)])
+    ends = np.concatenate([np.minimum(p - cost - d * lb, kink - cost), p + cost - d * lb])
+    keep = starts < ends
+    starts, ends, rates = starts[keep], ends[keep], np.concatenate([inv_d, inv_d])[keep]
+
+    if tau is not None:
+        lo, hi = -np.inf, np.inf
+        for _ in range(6):
+            w = _separable_weights(p, d, anchor, cost, lb, ub, tau)
+            excess = np.sum(w) - total
+            if abs(excess) <= 1e-13 * max(1.0, abs(total)):
+                return w, tau
+            if excess > 0.0:
+                # The sum falls as tau grows past the pieces active just above tau
+                lo = tau
+                slope = np.sum(rates[(starts <= tau) & (ends > tau)])
+                if slope > 0.0:
+                    step = tau + excess / slope
+                else:
+                    ahead = starts[starts > tau]
+                    step = ahead.min() if len(ahead) else np.inf
+            else:
+                hi = tau
+                slope = np.sum(rates[(starts < tau) & (ends >= tau)])
+                if slope > 0.0:
+                    step = tau + excess / slope
+                else:
+                    behind = ends[ends < tau]
+                    step = behind.max() if len(behind) else -np.inf
+            if not lo < step < hi:
+                break
+            tau = step
+
+        if np.isfinite(lo) and np.isfinite(hi):
+            # The root is bracketed: binary search over the breakpoints inside
+            points = np.concatenate([starts, ends])
+            points = np.unique(np.concatenate([[lo, hi], points[(points > lo) & (points < hi)]]))
+            first, last = 0, len(points) - 1
+            f_first = np.sum(_separable_weights(p, d, anchor, cost, lb, ub, lo)) - total
+            f_last = np.sum(_separable_weights(p, d, anchor, cost, lb, ub, hi)) - total
+            while last - first > 1:
+                mid = (first + last) // 2
+                f_mid = np.sum(_separable_weights(p, d, anchor, cost, lb, ub, points[mid])) - total
+                if f_mid > 0.0:
+                    first, f_first = mid, f_mid
+                else:
+                    last, f_last = mid, f_mid
+            tau = points[first] + (points[last] - points[first]) * f_first / (f_first - f_last)
+            return _separable_weights(p, d, anchor, cost, lb, ub, tau), tau
+
+    if len(starts) == 0:
+        # Every weight is fixed: nothing to solve for
+        return _separable_weights(p, d, anchor, cost, lb, ub, 0.0), 0.0
+
+    points = np.concatenate([starts, ends])
+    slopes = np.concatenate([-rates, rates])
+    order = np.argsort(points, kind='stable')
+    points = points[order]
+    slope_after = np.cumsum(slopes[order])
+    start_sum = np.sum(_separable_weights(p, d, anchor, cost, lb, ub, points[0]))
+    sums = start_sum + np.concatenate([[0.0], np.cumsum(np.diff(points) * slope_after[:-1])])
+
+    j = np.searchsorted(-sums, -total, side='left')
+    if j == 0:
+        tau = points[0]
+    elif j >= len(points):
+        tau = points[-1]
+    else:
+        span = sums[j - 1] - sums[j]
+        frac = (sums[j - 1] - total) / span if span > 0 else 0.0
+        tau = points[j - 1] + frac * (points[j] - points[j - 1])
+
+    # One Newton step on tau removes rounding error from the interpolation
+    w = _separable_weights(p, d, anchor, cost, lb, ub, tau)
+    moving = (w > lb) & (w < ub) & (w != anchor)
+    slope = np.sum(inv_d[moving])
+    if slope > 0.0:
+        tau += (np.sum(w) - total) / slope
+        w = _separable_weights(p, d, anchor, cost, lb, ub, tau)
+    return w, tau
+
+
+def _turnover_penalty(anchor, cost, quad):
+    """Transaction cost term sum(cost |w - a|) + sum(quad (w - a)^2)"""
+    return L1Turnover(cost, anchor) + SeparableQuadratic(quad, anchor)
+
+
+def _prox_newton_separable(B, target, center, rho, lb, ub, lam, anchor, cost, quad,
+                           tol=1e-10, max_newton=20):
+    """
+    _prox_newton with separable turnover costs around the anchor weights
+
+        min ||B'w - t||^2 + sum(quad (w - a)^2 + cost |w - a|) + rho/2 ||w - center||^2
+
+    The weights for a dual multiplier are still available in closed form up
+    to one scalar, and the generalized Hessian weights each free asset by
+    the inverse of its curvature rho + 2 quad.
+    """
+    d = rho + 2.0 * quad
+    base = rho * center + 2.0 * quad * anchor
+    tau = [None]
+    penalty = _turnover_penalty(anchor, cost, quad)
+
+    def dual(lam):
+        w, tau[0] = _separable_budget(base - B @ lam, d, anchor, cost, lb, ub, tau=tau[0])
+        exposures = B.T @ w
+        value = (-lam @ lam / 4.0 - lam @ target + 0.5 * rho * np.sum((w - center) ** 2)
+                 + penalty.value(w) + lam @ exposures)
+        return -value, -(exposures - target - lam / 2.0), w
+
+    phi, grad, w = dual(lam)
+    steps = 0
+    for steps in range(1, max_newton + 1):
+        if np.linalg.norm(grad) <= tol:
+            break
+
+        # Assets on a linear piece: strictly inside the bounds and trading
+        moving = (w > lb) & (w < ub) & (w != anchor)
+        scale = 1.0 / d[moving]
+        B_moving = B[moving]
+        weighted = B_moving.T @ scale
+        hessian = (B_moving.T * scale) @ B_moving + 0.5 * np.eye(len(lam))
+        if len(scale):
+            hessian -= np.outer(weighted, weighted) / scale.sum()
+        direction = -np.linalg.solve(hessian, grad)
+
+        alpha = 1.0
+        while alpha >= 1e-12:
+            phi_new, grad_new, w_new = dual(lam + alpha * direction)
+            if phi_new <= phi + 1e-4 * alpha * (grad @ direction):
+                break
+            alpha *= 0.5
+        else:
+            break
+        lam = lam + alpha * direction
+        phi, grad, w = phi_new, grad_new, w_new
+
+    return w, lam, steps
+
+
+def _turnover_gap(grad, w, lb, ub, anchor, cost):
+    """
+    Frank-Wolfe gap of the smooth gradient plus the L1 trading cost
+
+    Each asset's cost is linear with slope grad - cost below the anchor and
+    grad + cost above it, so the minimizing vertex fills those segments in
+    order of slope like a fractional knapsack.
+    """
+    kink = np.clip(anchor, lb, ub)
+    slopes = np.concatenate([grad - cost, grad + cost])
+    room = np.concatenate([kink - lb, ub - kink])
+    order = np.argsort(slopes)
+    room = room[order]
+    budget = 1.0 - np.sum(lb)
+    filled = np.empty_like(room)
+    filled[order] = np.clip(budget - (np.cumsum(room) - room), 0.0, room)
+    n_assets = len(w)
+    s = lb + filled[:n_assets] + filled[n_assets:]
+    return grad @ (w - s) + np.sum(cost * np.abs(w - anchor)) - np.sum(cost * np.abs(s - anchor))
+
+
+def _polish_active_set(B, target, w, lb, ub, anchor, cost, quad):
+    """
+    Exact minimizer for the active set of w, or None if it is not consistent
+
+    Weights at a bound or at the anchor are held fixed and the trading
+    direction of the others is taken from w, which makes the problem an
+    equality-constrained QP in the few free weights.
+    """
+    free = (w > lb) & (w < ub) & (w != anchor)
+    n_free = np.count_nonzero(free)
+    if n_free == 0 or n_free > 4 * B.shape[1]:
+        return None
+    B_free = B[free]
+    sign = np.sign(w[free] - anchor[free])
+    fixed_exposure = B[~free].T @ w[~free]
+
+    kkt = np.zeros((n_free + 1, n_free + 1))
+    kkt[:n_free, :n_free] = 2.0 * (B_free @ B_free.T) + np.diag(2.0 * quad[free])
+    kkt[:n_free, n_free] = 1.0
+    kkt[n_free, :n_free] = 1.0
+    rhs = np.concatenate([
+        2.0 * B_free @ (target - fixed_exposure) - cost[free] * sign + 2.0 * quad[free] * anchor[free],
+        [1.0 - np.sum(w[~free])]
+    ])
+    solution = np.linalg.lstsq(kkt, rhs, rcond=None)[0][:n_free]
+    if (np.any(solution < lb[free]) or np.any(solution > ub[free])
+            or np.any(sign * (solution - anchor[free]) < 0.0)):
+        return None
+    polished = w.copy()
+    polished[free] = solution
+    return polished
+
+
+def _solve_turnover_penalized(B, target, anchor, cost, quad, lb, ub, w, curvature, tol, max_iter):
+    """Proximal point loop of solve_rebalance_qp for fixed costs"""
+    rho = 1e-2 * curvature
+    rho_min = 1e-8 * curvature
+    lam = np.zeros(B.shape[1])
+    newton_steps = 0
+    iteration = 0
+
+    # The L1 cost enters the gap through its piecewise-linear vertex, not its gradient
+    smooth = ExposureGap(B, target) + SeparableQuadratic(quad, anchor)
+    l1 = L1Turnover(cost, anchor)
+
+    def certificate(w):
+        objective, grad = smooth.value_and_gradient(w)
+        return objective + l1.value(w), _turnover_gap(grad, w, lb, ub, anchor, cost)
+
+    objective, gap = certificate(w)
+    while gap > tol * (1.0 + objective) and iteration < max_iter:
+        iteration += 1
+        w_prev = w
+        w, lam, steps = _prox_newton_separable(B, target, w, rho, lb, ub, lam, anchor, cost, quad)
+        newton_steps += steps
+        objective, gap = certificate(w)
+
+        # Once few weights are free, solving for them directly often finishes the job
+        polished = _polish_active_set(B, target, w, lb, ub, anchor, cost, quad)
+        if polished is not None:
+            polished_objective, polished_gap = certificate(polished)
+            if polished_gap <= tol * (1.0 + polished_objective):
+                return polished, polished_objective, polished_gap, iteration, newton_steps
+
+        if rho == rho_min and np.array_equal(w, w_prev):
+            break
+        rho = max(0.1 * rho, rho_min)
+
+    return w, objective, gap, iteration, newton_steps
+
+
+def solve_rebalance_qp(B, target, current, costs=0.0, penalty='l1', turnover_cap=None,
+                       lb=0.0, ub=1.0, tol=1e-10, max_iter=200, curvature=None):
+    """
+    Exposure matching with a transaction cost penalty around current holdings
+
+        min ||B'w - target||^2 + sum(costs |w - current|)        (penalty='l1')
+        min ||B'w - target||^2 + sum(costs (w - current)^2)      (penalty='quadratic')
+
+    subject to sum(w) = 1, lb <= w <= ub and optionally
+    sum(|w - current|) <= turnover_cap. Uses the same proximal point and
+    dual Newton scheme as solve_exposure_qp, started from the current
+    holdings, so small target changes need few iterations. A turnover cap
+    is enforced by pricing turnover with an extra L1 cost, found by
+    bisection on its multiplier.
+
+    Parameters:
+    B (ndarray): Factor betas, shape (N, K)
+    target (ndarray): Target exposures, shape (K,)
+    current (ndarray): Current weights, shape (N,)
+    costs (float or ndarray): Per-asset cost per unit of turnover
+    penalty (str): 'l1' or 'quadratic'
+    turnover_cap (float): Maximum sum(|w - current|), None for no cap
+    lb, ub (float or ndarray): Weight bounds
+    tol (float): Duality gap tolerance, relative to 1 + objective
+    max_iter (int): Maximum number of proximal iterations per solve
+    curvature (float): Optional precomputed 2 * max eigenvalue of B'B
+
+    Returns:
+    dict: 'weights', 'objective', 'tracking_objective', 'turnover',
+          'transaction_cost', 'turnover_multiplier', 'gap', 'iterations',
+          'newton_steps', 'converged'
+    """
+    if penalty not in ('l1', 'quadratic'):
+        raise ValueError(f"Unknown penalty '{penalty}', expected 'l1' or 'quadratic'")
+    B = np.ascontiguousarray(B, dtype=float)
+    target = np.asarray(target, dtype=float)
+    n_assets = B.shape[0]
+    lb, ub = _expand_bounds(lb, ub, n_assets)
+    anchor = np.asarray(current, dtype=float)
+    costs = np.broadcast_to(np.asarray(costs, dtype=float), (n_assets,))
+    if np.any(costs < 0):
+        raise ValueError("Transaction costs must be non-negative")
+    cost = costs if penalty == 'l1' else np.zeros(n_assets)
+    quad = costs if penalty == 'quadratic' else np.zeros(n_assets)
+
+    if curvature is None:
+        curvature = _curvature(B)
+    curvature += 2.0 * quad.max(initial=0.0)
+    w = project_bounded_simplex(anchor, lb, ub)
+
+    w, objective, gap, iterations, newton_steps = _solve_turnover_penalized(
+        B, target, anchor, cost, quad, lb, ub, w, curvature, tol, max_iter)
+    multiplier = 0.0
+
+    if turnover_cap is not None and np.sum(np.abs(w - anchor)) > turnover_cap:
+        # Raise the turnover price until the cap holds, then bisect
+        def solve_priced(mu, w_start):
+            return _solve_turnover_penalized(B, target, anchor, cost + mu, quad, lb, ub, w_start,
+                                             curvature, tol, max_iter)
+
+        lo, hi = 0.0, 1e-4 * curvature
+        while True:
+            solution = solve_priced(hi, w)
+            iterations += solution[3]
+            newton_steps += solution[4]
+            if np.sum(np.abs(solution[0] - anchor)) <= turnover_cap:
+                break
+            if hi > 1e6 * curvature:
+                raise ValueError(
+                    f"Turnover cap {turnover_cap:.4f} is below the minimum turnover "
+                    f"{np.sum(np.abs(solution[0] - anchor)):.4f} needed to meet the weight bounds"
+                )
+            lo, hi = hi, 10.0 * hi
+        best = solution
+        for _ in range(60):
+            if hi - lo <= 1e-10 * hi:
+                break
+            mid = 0.5 * (lo + hi)
+            solution = solve_priced(mid, best[0])
+            iterations += solution[3]
+            newton_steps += solution[4]
+            turnover = np.sum(np.abs(solution[0] - anchor))
+            if turnover <= turnover_cap:
+                hi, best = mid, solution
+                if turnover >= turnover_cap * (1.0 - 1e-6):
+                    break
+            else:
+                lo = mid
+        w, _, gap, _, _ = best
+        multiplier = hi
+
+    tracking = ExposureGap(B, target).value(w)
+    transaction_cost = _turnover_penalty(anchor, cost, quad).value(w)
+    objective = tracking + transaction_cost
+    return {
+        'weights': w,
+        'objective': objective,
+        'tracking_objective': tracking,
+        'turnover': float(np.sum(np.abs(w - anchor))),
+        'transaction_cost': transaction_cost,
+        'turnover_multiplier': multiplier,
+        'gap': float(gap),
+        'iterations': iterations,
+        'newton_steps': newton_steps,
+        'converged': bool(gap <= tol * (1.0 + objective + multiplier * np.sum(np.abs(w - anchor))))
+    }
+
+
+def solve_tracking_qp(B, target, factor_cov, specific_var, lb=0.0, ub=1.0, w0=None, tol=1e-10,
+                      max_iter=200):
+    """
+    Minimize ex-ante tracking variance to target exposures under a factor risk model
+
+        min (B'w - t)' F (B'w - t) + sum(D w^2)  s.t. sum(w) = 1, lb <= w <= ub
+
+    With F = L L' the factor term is ||(B L)'w - L't||^2, the exposure
+    matching objective in rotated factors, and the specific term is a
+    separable quadratic, so this is the turnover-penalized solver with
+    quadratic costs D around zero weights: O(N K) per step, with the
+    covariance never formed.
+
+    Parameters:
+    B (ndarray): Factor betas, shape (N, K)
+    target (ndarray): Target exposures, shape (K,)
+    factor_cov (ndarray): Factor covariance F, shape (K, K)
+    specific_var (ndarray): Specific variances D, shape (N,)
+    lb, ub (float or ndarray): Weight bounds
+    w0 (ndarray): Starting weights, equal weights by default
+    tol (float): Duality gap tolerance, relative to 1 + objective
+    max_iter (int): Maximum number of proximal iterations
+
+    Returns:
+    dict: 'weights', 'objective' (tracking variance per period), 'gap',
+          'iterations', 'newton_steps', 'converged'
+    """
+    B = np.ascontiguousarray(B, dtype=float)
+    target = np.asarray(target, dtype=float)
+    factor_cov = np.asarray(factor_cov, dtype=float)
+    n_assets, n_factors = B.shape
+    lb, ub = _expand_bounds(lb, ub, n_assets)
+
+    # Rotate the factors so their covariance becomes the identity
+    jitter = 1e-12 * max(np.trace(factor_cov), 1e-300)
+    L = np.linalg.cholesky(factor_cov + jitter * np.eye(n_factors))
+    B_rot = np.ascontiguousarray(B @ L)
+    target_rot = L.T @ target
+    quad = np.maximum(np.asarray(specific_var, dtype=float), 0.0)
+
+    if w0 is None:
+        w0 = np.full(n_assets, 1.0 / n_assets)
+    w = project_bounded_simplex(np.asarray(w0, dtype=float), lb, ub)
+    curvature = _curvature(B_rot) + 2.0 * quad.max(initial=0.0)
+
+    w, objective, gap, iterations, newton_steps = _solve_turnover_penalized(
+        B_rot, target_rot, np.zeros(n_assets), np.zeros(n_assets), quad, lb, ub, w,
+        curvature, tol, max_iter)
+    return {
+        'weights': w,
+        'objective': float(objective),
+        'gap': float(gap),
+        'iterations': iterations,
+        'newton_steps': newton_steps,
+        'converged': bool(gap <= tol * (1.0 + objective))
+    }
+
+
+def solve_diversified_qp(B, target, penalty, lb=0.0, ub=1.0, w0=None, tol=1e-10, max_iter=200,
+                         curvature=None):
+    """
+    Exposure matching with a diversification penalty
+
+        min ||B'w - t||^2 + penalty ||w||^2  s.t. sum(w) = 1, lb <= w <= ub
+
+    ||w||^2 is one minus the diversification ratio and one over the
+    effective number of assets, so increasing the penalty trades tracking
+    error for a less concentrated portfolio. It is a separable quadratic
+    around zero weights, solved like the specific risk in solve_tracking_qp.
+    With penalty 0 this is solve_exposure_qp.
+
+    Parameters:
+    B (ndarray): Factor betas, shape (N, K)
+    target (ndarray): Target exposures, shape (K,)
+    penalty (float): Weight of ||w||^2, non-negative
+    lb, ub (float or ndarray): Weight bounds
+    w0 (ndarray): Starting weights, equal weights by default
+    tol (float): Duality gap tolerance, relative to 1 + objective
+    max_iter (int): Maximum number of proximal iterations
+    curvature (float): Optional precomputed 2 * max eigenvalue of B'B
+
+    Returns:
+    dict: 'weights', 'objective' (including the penalty), 'tracking_objective',
+          'gap', 'iterations', 'newton_steps', 'converged'
+    """
+    if penalty < 0:
+        raise ValueError("The diversification penalty must be non-negative")
+    if penalty == 0:
+        result = solve_exposure_qp(B, target, lb, ub, w0=w0, tol=tol, max_iter=max_iter,
+                                   curvature=curvature)
+        result['tracking_objective'] = result['objective']
+        return result
+
+    B = np.ascontiguousarray(B, dtype=float)
+    target = np.asarray(target, dtype=float)
+    n_assets = B.shape[0]
+    lb, ub = _expand_bounds(lb, ub, n_assets)
+    quad = np.full(n_assets, float(penalty))
+
+    if w0 is None:
+        w0 = np.full(n_assets, 1.0 / n_assets)
+    w = project_bounded_simplex(np.asarray(w0, dtype=float), lb, ub)
+    if curvature is None:
+        curvature = _curvature(B)
+
+    w, objective, gap, iterations, newton_steps = _solve_turnover_penalized(
+        B, target, np.zeros(n_assets), np.zeros(n_assets), quad, lb, ub, w,
+        curvature + 2.0 * penalty, tol, max_iter)
+    return {
+        'weights': w,
+        'objective': float(objective),
+        'tracking_objective': ExposureGap(B, target).value(w),
+        'gap': float(gap),
+        'iterations': iterations,
+        'newton_steps': newton_steps,
+        'converged': bool(gap <= tol * (1.0 + objective))
+    }
+
+
+def solve_cardinality_qp(B, target, max_assets, lb=0.0, ub=1.0, tol=1e-10, max_swaps=50,
+                         candidates=10, time_budget=1.0):
+    """
+    Exposure matching with at most max_assets non-zero weights
+
+    The continuous problem without the cardinality limit is solved first;
+    its objective is a lower bound for every sparse portfolio. If it already
+    holds few enough names it is returned as is. Otherwise names are picked
+    by greedy forward selection, each time adding the asset that gives the
+    lowest objective when weight is moved into it by an exact line search,
+    and re-solving the QP over the selected names. Pairwise swaps between the
+    smallest holdings and the best unselected candidates then refine the
+    selection until none improves it, max_swaps is reached or time_budget
+    runs out. The top names of the continuous solution are tried as an
+    alternative starting selection. Every subset QP is warm-started from the
+    incumbent weights, with an entering name taking over the weight of the
+    name it replaces, so most of them finish in a few active-set pivots.
+
+    Bounds apply to the selected names only; the others are zero.
+
+    Parameters:
+    B (ndarray): Factor betas, shape (N, K)
+    target (ndarray): Target exposures, shape (K,)
+    max_assets (int): Maximum number of holdings
+    lb, ub (float or ndarray): Weight bounds for held assets
+    tol (float): Duality gap tolerance of each QP
+    max_swaps (int): Maximum number of accepted swaps
+    candidates (int): Unselected assets tried per swap round
+    time_budget (float): Wall time limit in seconds for the swaps, None for no limit
+
+    Returns:
+    dict: 'weights', 'selected' (indices of held assets), 'objective',
+          'lower_bound', 'gap' (objective - lower_bound), 'swaps', 'converged'
+    """
+    B = np.ascontiguousarray(B, dtype=float)
+    target = np.asarray(target, dtype=float)
+    n_assets = B.shape[0]
+    lb = np.broadcast_to(np.asarray(lb, dtype=float), (n_assets,)).copy()
+    ub = np.broadcast_to(np.asarray(ub, dtype=float), (n_assets,)).copy()
+    max_assets = int(max_assets)
+    if max_assets < 1:
+        raise ValueError("max_assets must be at least 1")
+    if np.sort(ub)[::-1][:max_assets].sum() < 1.0 - 1e-12 or np.sort(lb)[:max_assets].sum() > 1.0 + 1e-12:
+        raise ValueError(f"No portfolio of {max_assets} assets can satisfy the weight bounds")
+    start_time = time.perf_counter()
+
+    # Unheld names may sit at zero, so the relaxation drops the lower bounds
+    relaxed = solve_exposure_qp(B, target, 0.0, ub, tol=tol)
+    lower_bound = relaxed['objective']
+    held = np.flatnonzero(relaxed['weights'] > 0)
+    if len(held) <= max_assets and np.all(relaxed['weights'][held] >= lb[held]):
+        return {
+            'weights': relaxed['weights'],
+            'selected': held,
+            'objective': lower_bound,
+            'lower_bound': lower_bound,
+            'gap': 0.0,
+            'swaps': 0,
+            'converged': relaxed['converged']
+        }
+
+    def solve_subset(selected, w_start=None):
+        """
+        QP over the selected names. While the names cannot meet the bounds
+        (too few held during the greedy pass) the bounds are loosened and
+        the objective reported as infinite
+        """
+        selected = np.asarray(selected)
+        sub_lb, sub_ub = lb[selected], ub[selected]
+        feasible = sub_ub.sum() >= 1.0 - 1e-12 and sub_lb.sum() <= 1.0 + 1e-12
+        if not feasible:
+            sub_lb = np.minimum(sub_lb, 1.0 / len(selected))
+            sub_ub = np.maximum(sub_ub, 1.0 / len(selected))
+        result = solve_exposure_qp(B[selected], target, sub_lb, sub_ub, w0=w_start, tol=tol)
+        weights = np.zeros(n_assets)
+        weights[selected] = result['weights']
+        objective = result['objective'] if feasible else np.inf
+        return weights, objective, result['converged']
+
+    def entry_scores(weights, first=False):
+        """Objective after the best move of weight from the portfolio into each asset"""
+        exposures = B.T @ weights
+        resid = exposures - target
+        direction = B - exposures
+        if first:
+            step = np.ones(n_assets)
+        else:
+            norms = np.einsum('ij,ij->i', direction, direction)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                step = np.clip(-(direction @ resid) / norms, 0.0, 1.0)
+            step[norms == 0] = 0.0
+        moved = resid + step[:, None] * direction
+        return np.einsum('ij,ij->i', moved, moved)
+
+    # Greedy forward selection of the asset that lowers the objective most
+    selected = []
+    weights = np.zeros(n_assets)
+    for _ in range(max_assets):
+        scores = entry_scores(weights, first=not selected)
+        scores[selected] = np.inf
+        selected.append(int(np.argmin(scores)))
+        # The new name starts at zero, or at full weight when it is the first
+        weights, objective, converged = solve_subset(selected, weights[selected] if len(selected) > 1 else None)
+
+    # Alternative start: the largest weights of the continuous solution
+    top = np.argsort(-relaxed['weights'], kind='stable')[:max_assets]
+    top_weights, top_objective, top_converged = solve_subset(top, relaxed['weights'][top])
+    if top_objective < objective:
+        selected, weights, objective, converged = list(top), top_weights, top_objective, top_converged
+
+    def out_of_time():
+        return time_budget is not None and time.perf_counter() - start_time > time_budget
+
+    # Swap the smallest holdings for the most promising outsiders
+    swaps = 0
+    while swaps < max_swaps and not out_of_time():
+        scores = entry_scores(weights)
+        outside = np.setdiff1d(np.arange(n_assets), selected)
+        entering = outside[np.argsort(scores[outside], kind='stable')[:candidates]]
+        leaving = sorted(selected, key=lambda i: weights[i])[:5]
+        improved = False
+        for j in leaving:
+            for i in entering:
+                if out_of_time():
+                    break
+                trial = [i if k == j else k for k in selected]
+                trial_weights, trial_objective, trial_converged = solve_subset(trial, weights[selected])
+                if trial_objective < objective - tol * (1.0 + objective):
+                    selected, weights, objective, converged = trial, trial_weights, trial_objective, trial_converged
+                    improved = True
+                    break
+            if improved:
+                break
+        if not improved:
+            break
+        swaps += 1
+
+    if not np.isfinite(objective):
+        raise ValueError(f"No selection of {max_assets} assets found that satisfies the weight bounds")
+
+    selected = np.array(sorted(selected))
+    return {
+        'weights': weights,
+        'selected': selected[weights[selected] > 0],
+        'objective': objective,
+        'lower_bound': lower_bound,
+        'gap': max(objective - lower_bound, 0.0),
+        'swaps': swaps,
+        'converged': converged
+    }
+
+
+def _beta_matrix(betas, factor_cols):
+    """Betas as an (N, K) float array, without copying when the columns already match"""
+    if isinstance(betas, pd.DataFrame):
+        if list(betas.columns) != list(factor_cols):
+            betas = betas[factor_cols]
+        return betas.to_numpy(dtype=float, copy=False)
+    return np.asarray(betas, dtype=float)
+
+
+def optimize_portfolio(betas, target_exposures, max_weight=1.0, min_weight=0.0,
+                       initial_weights=None, factor_cols=FACTOR_COLS, current_weights=None,
+                       costs=0.0, penalty='l1', turnover_cap=None, max_assets=None,
+                       objective='exposure', risk_model=None, constraints=None):
+    """
+    Optimize a portfolio to minimize tracking error to target factor exposures
+
+    When current_weights are given the portfolio is rebalanced from them:
+    turnover is charged at the per-asset costs (see solve_rebalance_qp),
+    optionally capped, and the solve starts from the current holdings.
+    With max_assets the portfolio holds at most that many names (see
+    solve_cardinality_qp). With objective='tracking_volatility' the
+    ex-ante tracking variance under risk_model is minimized instead of
+    the squared exposure gap (see solve_tracking_qp). Group, sector and
+    factor-band constraints (LinearConstraints) are enforced by
+    solve_constrained_qp.
+
+    Parameters:
+    betas (DataFrame): Factor betas for each asset
+    target_exposures (dict): Target factor exposures
+    max_weight (float): Maximum weight per asset
+    min_weight (float): Minimum weight per asset (0 = no shorting)
+    initial_weights (ndarray): Optional warm start, equal weights by default
+    factor_cols (list): Factor columns to match
+    current_weights (ndarray or Series): Current holdings for a rebalance
+    costs (float or ndarray): Per-asset cost per unit of turnover
+    penalty (str): 'l1' (proportional costs) or 'quadratic' (market impact)
+    turnover_cap (float): Maximum total turnover sum(|w - current|)
+    max_assets (int): Maximum number of holdings
+    objective (str): 'exposure' or 'tracking_volatility'
+    risk_model (FactorRiskModel): Factor risk model; when given the ex-ante
+                                  tracking volatility is also reported
+    constraints (LinearConstraints): Group caps, budgets and factor bands
+
+    Returns:
+    dict: Optimization results including weights and metrics
+    """
+    n_assets = len(betas)
+    target_array = np.array([target_exposures.get(col, 0.0) for col in factor_cols])
+    B = _beta_matrix(betas, factor_cols)
+
+    if current_weights is not None:
+        if isinstance(current_weights, pd.Series) and isinstance(betas, pd.DataFrame):
+            current_weights = current_weights.reindex(betas.index).fillna(0.0)
+        current_weights = np.asarray(current_weights, dtype=float)
+        initial_weights = current_weights
+    elif initial_weights is None:
+        initial_weights = np.full(n_assets, 1.0 / n_assets)
+
+    if objective == 'tracking_volatility':
+        mode = 'tracking_volatility'
+    elif max_assets is not None:
+        mode = 'cardinality'
+    elif current_weights is not None:
+        mode = 'rebalance'
+    elif constraints is not None and len(constraints):
+        mode = 'constrained'
+    else:
+        mode = 'exposure'
+
+    try:
+        with metrics.stage('optimization', mode=mode) as counters:
+            if objective not in ('exposure', 'tracking_volatility'):
+                raise ValueError(f"Unknown objective '{objective}', expected 'exposure' or 'tracking_volatility'")
+            if mode in ('tracking_volatility', 'cardinality', 'rebalance') and constraints is not None \
+                    and len(constraints):
+                raise ValueError(f"Linear constraints are not supported in {mode} mode")
+            if objective == 'tracking_volatility':
+                if risk_model is None:
+                    raise ValueError("objective='tracking_volatility' requires a risk_model")
+                if max_assets is not None or current_weights is not None:
+                    raise ValueError("objective='tracking_volatility' cannot be combined with "
+                                     "max_assets or current_weights")
+                result = solve_tracking_qp(B, target_array, risk_model.factor_cov,
+                                           risk_model.specific_var_for(betas), lb=min_weight,
+                                           ub=max_weight, w0=initial_weights)
+            elif max_assets is not None:
+                if current_weights is not None:
+                    raise ValueError("max_assets cannot be combined with current_weights")
+                result = solve_cardinality_qp(B, target_array, max_assets, lb=min_weight, ub=max_weight)
+            elif current_weights is not None:
+                result = solve_rebalance_qp(B, target_array, current_weights, costs=costs, penalty=penalty,
+                                            turnover_cap=turnover_cap, lb=min_weight, ub=max_weight)
+            elif mode == 'constrained':
+                G, h, _ = constraints.compile(betas, factor_cols)
+                counters['constraints'] = G.shape[0]
+                result = solve_constrained_qp(B, target_array, G, h, lb=min_weight, ub=max_weight,
+                                              w0=initial_weights)
+            else:
+                result = solve_exposure_qp(B, target_array, lb=min_weight, ub=max_weight, w0=initial_weights)
+
+            counters['assets'] = n_assets
+            for name in ('iterations', 'newton_steps', 'evaluations', 'swaps'):
+                if name in result:
+                    counters[name] = result[name]
+            counters['converged'] = int(result['converged'])
+    except Exception as e:
+        return {'success': False, 'error': str(e), 'weights': initial_weights}
+
+    optimal_weights = result['weights']
+    portfolio_exposures = B.T @ optimal_weights
+    tracking_error = np.sqrt(np.sum((portfolio_exposures - target_array) ** 2))
+
+    if not result['converged']:
+        error = f"Maximum iterations reached (duality gap {result['gap']:.2e})"
+        if mode == 'constrained' and not constraints.check_feasible(betas, min_weight, max_weight, factor_cols):
+            error = "The group, sector and factor-band constraints cannot all be met within the weight bounds"
+        return {
+            'success': False,
+            'error': error,
+            'weights': optimal_weights
+        }
+
+    output = {
+        'success': True,
+        'weights': optimal_weights,
+        'portfolio_exposures': dict(zip(factor_cols, portfolio_exposures)),
+        'target_exposures': target_exposures,
+        'tracking_error': tracking_error,
+        'iterations': result.get('iterations', 0)
+    }
+    if current_weights is not None:
+        output['turnover'] = result['turnover']
+        output['transaction_cost'] = result['transaction_cost']
+    if mode == 'constrained':
+        output['constraint_multipliers'] = result['multipliers']
+    if risk_model is not None:
+        exposure_gap = portfolio_exposures - target_array
+        variance = (exposure_gap @ risk_model.factor_cov @ exposure_gap
+                    + np.sum(risk_model.specific_var_for(betas) * optimal_weights ** 2))
+        output['tracking_volatility'] = np.sqrt(variance * risk_model.periods_per_year)
+    if max_assets is not None:
+        output['n_holdings'] = len(result['selected'])
+        # Both in tracking error units, against the unconstrained optimum
+        output['tracking_error_bound'] = np.sqrt(result['lower_bound'])
+        output['optimality_gap'] = max(tracking_error - np.sqrt(result['lower_bound']), 0.0)
+    return output
+
+
+def optimize_portfolio_batch(betas, targets_matrix, bounds=(0.0, 1.0), factor_cols=FACTOR_COLS,
+                             tol=1e-10):
+    """
+    Solve the exposure-matching QP for many target vectors in one call
+
+    The betas, bounds and curvature are prepared once and shared by every
+    solve. Targets are visited in lexicographic order, so neighbouring grid
+    points follow each other. Each solve starts from the previous solution,
+    where a few active-set pivots usually finish it without any proximal
+    iterations, and carries over its dual multipliers and proximal weight
+    for the cases that still need them. A target that does not converge
+    from the warm start is re-solved cold, with a RuntimeWarning if that
+    fails too.
+
+    Parameters:
+    betas (DataFrame or ndarray): Factor betas for each asset, shape (N, K)
+    targets_matrix (DataFrame or ndarray): One target vector per row, shape (M, K)
+    bounds (tuple): (min_weight, max_weight), scalars or per-asset arrays
+    factor_cols (list): Factor columns used when DataFrames are passed
+    tol (float): Duality gap tolerance for each solve
+
+    Returns:
+    dict: 'weights' (M, N), 'tracking_error' (M,), 'converged' (M,),
+          'iterations' (M,) in the original target order
+    """
+    if isinstance(targets_matrix, pd.DataFrame):
+        targets_matrix = targets_matrix[factor_cols]
+    B = np.ascontiguousarray(_beta_matrix(betas, factor_cols))
+    targets = np.atleast_2d(np.asarray(targets_matrix, dtype=float))
+    n_assets = B.shape[0]
+    n_targets = targets.shape[0]
+
+    # Shared setup for every solve
+    lb, ub = _expand_bounds(bounds[0], bounds[1], n_assets)
+    curvature = _curvature(B)
+
+    weights = np.empty((n_targets, n_assets))
+    tracking_error = np.empty(n_targets)
+    converged = np.empty(n_targets, dtype=bool)
+    iterations = np.empty(n_targets, dtype=int)
+
+    # Walk the targets so consecutive solves are neighbours
+    order = np.lexsort(targets.T[::-1])
+    w = lam = rho = None
+    with metrics.stage('optimization', mode='batch') as counters:
+        for i in order:
+            result = solve_exposure_qp(B, targets[i], lb, ub, w0=w, tol=tol, curvature=curvature,
+                                       lam0=lam, rho0=rho)
+            if not result['converged'] and w is not None:
+                result = solve_exposure_qp(B, targets[i], lb, ub, tol=tol, curvature=curvature)
+            if not result['converged']:
+                warnings.warn(f"Target {i} did not converge (duality gap {result['gap']:.2e})",
+                              RuntimeWarning, stacklevel=2)
+            w, lam = result['weights'], result['lam']
+            if result['iterations']:
+                # Restart the proximal weight two steps back up its schedule for the next target
+                rho = 100.0 * result['rho']
+            weights[i] = w
+            tracking_error[i] = np.sqrt(result['objective'])
+            converged[i] = result['converged']
+            iterations[i] = result['iterations']
+        counters['assets'] = n_assets
+        counters['portfolios'] = n_targets
+        counters['iterations'] = int(iterations.sum())
+        counters['converged'] = int(converged.sum())
+
+    return {
+        'weights': weights,
+        'tracking_error': tracking_error,
+        'converged': converged,
+        'iterations': iterations
+    }
@@ -0,0 +1,156 @@
+# Daily price/factor pipeline with weekly and monthly resampling
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .betas import FACTOR_COLS, RF_COL
+
+# Daily counterpart of FF_MONTHLY_DATASET
+FF_DAILY_DATASET = 'F-F_Research_Data_5_Factors_2x3_daily'
+
+# Resampling rules, labelled by the last calendar day of each period
+FREQ_RULES = {
+    'daily': None,
+    'weekly': 'W-FRI',
+    'monthly': 'ME'
+}
+
+MARKET_COL = 'Mkt-RF'
+
+
+def prices_to_log_returns(prices):
+    """
+    Daily log returns from adjusted close prices
+
+    A missing close between two observed ones is carried forward, so the
+    return over the gap lands on the next observed day and sums to the
+    right total over any period. Before a ticker's first and after its last
+    close the returns stay NaN.
+
+    Parameters:
+    prices (DataFrame): Adjusted closes indexed by date, one column per ticker
+
+    Returns:
+    DataFrame: log(P_t / P_t-1), NaN outside each ticker's trading history
+    """
+    prices = prices.sort_index().ffill(limit_area='inside')
+    values = prices.to_numpy(dtype=float)
+    log_returns = np.full(values.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_returns[1:] = np.log(values[1:] / values[:-1])
+    return pd.DataFrame(log_returns, index=prices.index, columns=prices.columns).iloc[1:]
+
+
+def factor_increments(factors, percent=True, factor_cols=FACTOR_COLS, rf_col=RF_COL):
+    """
+    Daily factor returns in decimal units, in a form that adds up over time
+
+    The market factor is carried as the total market return (Mkt-RF + RF)
+    and, like RF, as a log return, so both compound exactly and the market
+    excess return is recovered afterwards. The long-short factors (SMB,
+    HML, RMW, ...) are returns on zero-investment portfolios, which do not
+    compound like total returns; they are kept as simple returns and summed
+    over longer periods, the convention of the monthly Ken French files.
+
+    Parameters:
+    factors (DataFrame): Daily Fama-French factors
+    percent (bool): Whether the input is in percent, as published by Ken French
+
+    Returns:
+    tuple: (DataFrame of additive increments, list of log-return columns)
+    """
+    factors = factors[factor_cols + [rf_col]].sort_index().astype(float)
+    if percent:
+        factors = factors / 100.0
+    log_cols = [rf_col]
+    if MARKET_COL in factor_cols:
+        factors[MARKET_COL] = factors[MARKET_COL] + factors[rf_col]
+        log_cols.append(MARKET_COL)
+    factors[log_cols] = np.log1p(factors[log_cols])
+    return factors, log_cols
+
+
+def _compound(increments, rule, log_cols, rf_col=None, complete=False):
+    """
+    Sum increments over each resampling period and convert log columns back to simple returns
+
+    With complete=True a period is NaN for a column unless the column has
+    an increment on every date of the period, so a ticker listed or
+    delisted mid-period gets no partial return.
+    """
+    if rule is not None:
+        totals = increments.resample(rule).sum(min_count=1)
+        if complete:
+            days = increments.index.to_series().resample(rule).count()
+            observed = increments.notna().resample(rule).sum()
+            totals = totals.where(observed.eq(days, axis=0))
+        increments = totals
+    returns = increments.copy()
+    returns[log_cols] = np.expm1(increments[log_cols])
+    if rf_col is not None and MARKET_COL in returns:
+        returns[MARKET_COL] = returns[MARKET_COL] - returns[rf_col]
+    return returns
+
+
+def _period_label(date, rule):
+    """Label of the resampling period containing date"""
+    return pd.Series(0, index=pd.DatetimeIndex([date])).resample(rule).sum().index[0]
+
+
+def build_return_panels(prices, factors, freqs=('daily', 'weekly', 'monthly'), percent=True,
+                        factor_cols=FACTOR_COLS, rf_col=RF_COL):
+    """
+    Aligned asset and factor returns at several frequencies in one pass
+
+    Log returns are computed once at daily resolution, with missing closes
+    inside a ticker's history carried forward. Factor returns are mapped
+    onto the price calendar through their cumulative sums, each frequency
+    is a single vectorized resample-and-sum, and calendars are aligned with
+    joins rather than row by row. A weekly or monthly asset return is NaN
+    unless the asset traded through the whole period. Long-short factors
+    are summed rather than compounded (see factor_increments). Price dates
+    after the last factor date are dropped, together with the period the
+    factor data ends in when prices continue within it.
+
+    Parameters:
+    prices (DataFrame): Daily adjusted closes, one column per ticker
+    factors (DataFrame): Daily Fama-French factors including RF
+    freqs (tuple): Any of 'daily', 'weekly', 'monthly'
+    percent (bool): Whether the factors are in percent
+    factor_cols (list): Factor columns to keep
+    rf_col (str): Risk-free column
+
+    Returns:
+    dict: freq -> (returns DataFrame, factors DataFrame) on a shared index,
+          ready for fit_factor_model / rolling_factor_betas
+    """
+    with metrics.stage('alignment', source='return_panels') as counters:
+        prices = prices.sort_index()
+        asset_logs = prices_to_log_returns(prices)
+        factor_logs, log_cols = factor_increments(factors, percent, factor_cols, rf_col)
+
+        # Accumulate factor returns over each interval of the price calendar, so a
+        # price gap spanning several factor days is matched to all of them. Past the
+        # last factor date (the factor files trail prices) there is nothing to carry
+        last_factor_date = factor_logs.index.max()
+        cumulative = factor_logs.cumsum().reindex(prices.index, method='ffill')
+        cumulative[prices.index > last_factor_date] = np.nan
+        factor_logs = cumulative.diff().iloc[1:].dropna(how='all')
+        asset_logs, factor_logs = asset_logs.align(factor_logs, join='inner', axis=0)
+        first_unmatched = prices.index[prices.index > last_factor_date].min()
+
+        panels = {}
+        for freq in freqs:
+            if freq not in FREQ_RULES:
+                raise ValueError(f"Unknown frequency '{freq}', expected one of {list(FREQ_RULES)}")
+            rule = FREQ_RULES[freq]
+            asset_returns = _compound(asset_logs, rule, list(asset_logs.columns), complete=True)
+            factor_returns = _compound(factor_logs, rule, log_cols, rf_col).dropna(how='all')
+            if rule is not None and first_unmatched is not pd.NaT:
+                # The factors stop inside this period while prices go on: it is incomplete
+                factor_returns = factor_returns.drop(_period_label(first_unmatched, rule), errors='ignore')
+            asset_returns, factor_returns = asset_returns.align(factor_returns, join='inner', axis=0)
+            panels[freq] = (asset_returns, factor_returns)
+        counters['assets'] = prices.shape[1]
+        counters['days'] = len(asset_logs)
+    return panels
@@ -0,0 +1,94 @@
+# Factor risk model and ex-ante tracking volatility objective
+import numpy as np
+import pandas as pd
+
+from .betas import FACTOR_COLS, RF_COL, _excess_panel, ols_fit
+
+
+class FactorRiskModel:
+    """
+    Asset covariance in low-rank plus diagonal form, B F B' + D
+
+    Only the (N, K) betas, the (K, K) factor covariance F and the (N,)
+    specific variances D are stored, so portfolio risk and the optimizer
+    work in O(N K) and the N x N covariance is never formed unless asked
+    for. Variances are per period of the input data; volatilities are
+    annualized with periods_per_year.
+
+    Parameters:
+    betas (DataFrame or ndarray): Factor betas, shape (N, K)
+    factor_cov (ndarray): Factor return covariance, shape (K, K)
+    specific_var (ndarray): Residual variance of each asset, shape (N,)
+    periods_per_year (int): 12 for monthly data, 252 for daily
+    """
+
+    def __init__(self, betas, factor_cov, specific_var, periods_per_year=12):
+        if isinstance(betas, pd.DataFrame):
+            self.assets = list(betas.index)
+            self.factor_cols = list(betas.columns)
+        else:
+            self.assets = None
+            self.factor_cols = None
+        self.betas = np.ascontiguousarray(betas, dtype=float)
+        self.factor_cov = np.asarray(factor_cov, dtype=float)
+        self.specific_var = np.asarray(specific_var, dtype=float)
+        self.periods_per_year = periods_per_year
+
+    @classmethod
+    def estimate(cls, returns, factors, factor_cols=FACTOR_COLS, rf_col=RF_COL, periods_per_year=12):
+        """
+        Fit betas and residual variances by OLS and take the sample factor covariance
+
+        Parameters:
+        returns (DataFrame): Returns for each asset
+        factors (DataFrame): Fama-French factor returns including RF
+        factor_cols (list): Factor columns used as regressors
+        rf_col (str): Risk-free column subtracted from returns
+        periods_per_year (int): Observations per year, for annualizing
+
+        Returns:
+        FactorRiskModel: Model over the columns of returns
+        """
+        X, Y, _ = _excess_panel(returns, factors, factor_cols, rf_col)
+        fit = ols_fit(X, Y)
+        betas = pd.DataFrame(fit['betas'], index=returns.columns, columns=factor_cols)
+        factor_cov = np.atleast_2d(np.cov(X, rowvar=False))
+        return cls(betas, factor_cov, fit['resid_var'], periods_per_year)
+
+    def specific_var_for(self, betas):
+        """Specific variances in the row order of a betas frame or array"""
+        if self.assets is not None and isinstance(betas, pd.DataFrame):
+            specific = pd.Series(self.specific_var, index=self.assets).reindex(betas.index)
+            if specific.isna().any():
+                missing = list(specific.index[specific.isna()])
+                raise ValueError(f"No specific variance for {missing[:5]}")
+            return specific.to_numpy()
+        if len(betas) != len(self.specific_var):
+            raise ValueError(f"Risk model covers {len(self.specific_var)} assets, got {len(betas)}")
+        return self.specific_var
+
+    def covariance(self):
+        """Full N x N asset covariance; O(N^2) memory, for small universes only"""
+        cov = self.betas @ self.factor_cov @ self.betas.T
+        cov[np.diag_indices_from(cov)] += self.specific_var
+        return cov
+
+    def active_variance(self, weights, target):
+        """
+        Ex-ante tracking variance against a factor benchmark
+
+        The benchmark has exposures target and no specific risk, so the
+        active risk is the factor risk of the exposure gap plus the specific
+        risk of the holdings.
+        """
+        weights = np.asarray(weights, dtype=float)
+        gap = self.betas.T @ weights - np.asarray(target, dtype=float)
+        return float(gap @ self.factor_cov @ gap + np.sum(self.specific_var * weights ** 2))
+
+    def tracking_volatility(self, weights, target):
+        """Annualized ex-ante tracking volatility against target exposures"""
+        return float(np.sqrt(self.active_variance(weights, target) * self.periods_per_year))
+
+    def volatility(self, weights):
+        """Annualized ex-ante volatility of the portfolio"""
+        return self.tracking_volatility(weights, np.zeros(self.betas.shape[1]))
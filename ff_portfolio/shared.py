@@ -0,0 +1,72 @@
+# Read-only arrays shared with process pool workers through shared memory
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Arrays visible to the tasks of the current process, by name
+arrays = {}
+# Shared memory blocks backing the attached arrays, kept open while they are in use
+_blocks = []
+
+
+def share_array(array):
+    """
+    Copy an array into a new shared memory block
+
+    Returns:
+    tuple: (SharedMemory, spec) where spec is the picklable dict attach_arrays
+           needs; the caller closes and unlinks the block when done
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    view[:] = array
+    return shm, {'name': shm.name, 'shape': array.shape, 'dtype': array.dtype.str}
+
+
+def attach_arrays(specs):
+    """Worker initializer: map the shared arrays into arrays without copying"""
+    for key, spec in specs.items():
+        shm = shared_memory.SharedMemory(name=spec['name'])
+        _blocks.append(shm)
+        arrays[key] = np.ndarray(spec['shape'], dtype=np.dtype(spec['dtype']), buffer=shm.buf)
+
+
+def map_shared(func, tasks, named_arrays, max_workers):
+    """
+    Run func(*task) for every task with named_arrays available in arrays
+
+    With max_workers == 1 the tasks run in the calling process on the
+    arrays themselves. Otherwise the arrays are copied once into shared
+    memory, every worker of a process pool maps them at start-up, and the
+    blocks are released when the pool is done.
+
+    Parameters:
+    func (callable): Module-level function, reads its inputs from arrays
+    tasks (list): Argument tuples, one per call
+    named_arrays (dict): Name -> ndarray
+    max_workers (int): Worker processes; 1 runs in the calling process
+
+    Returns:
+    list: func outputs in task order
+    """
+    if max_workers == 1:
+        arrays.update(named_arrays)
+        try:
+            return [func(*task) for task in tasks]
+        finally:
+            arrays.clear()
+
+    blocks, specs = [], {}
+    try:
+        for key, array in named_arrays.items():
+            shm, specs[key] = share_array(np.ascontiguousarray(array))
+            blocks.append(shm)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=attach_arrays,
+                                 initargs=(specs,)) as pool:
+            futures = [pool.submit(func, *task) for task in tasks]
+            return [future.result() for future in futures]
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
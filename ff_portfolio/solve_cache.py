@@ -0,0 +1,121 @@
+# Bounded cache of optimization results shared across callers
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .betas import FACTOR_COLS
+from .optimizer import _beta_matrix, optimize_portfolio
+
+
+def betas_key(betas, factor_cols=FACTOR_COLS):
+    """Content hash of a betas matrix and its asset labels"""
+    B = np.ascontiguousarray(_beta_matrix(betas, factor_cols))
+    digest = hashlib.sha1(B.tobytes())
+    digest.update(repr(B.shape).encode())
+    if hasattr(betas, 'index'):
+        digest.update('\x1f'.join(map(str, betas.index)).encode())
+    return digest.hexdigest()
+
+
+def _copy_result(result):
+    """Copy of a result whose weights and exposure dicts the caller may modify"""
+    return {key: value.copy() if isinstance(value, (np.ndarray, dict)) else value
+            for key, value in result.items()}
+
+
+class SolveCache:
+    """
+    LRU cache of optimize_portfolio results keyed by betas, targets, bounds and constraints
+
+    Targets and bounds are quantized before being used as keys, so slider
+    values that differ only by floating point noise share an entry. On a
+    miss the solve is warm-started from the cached solution with the same
+    betas and bounds whose targets are nearest. One instance is safe to share
+    between threads, e.g. across Streamlit sessions: every caller gets its
+    own copy of the result, so modifying the weights does not change the
+    cached entry.
+
+    Parameters:
+    max_entries (int): Entries kept before the least recently used is evicted
+    quantum (float): Resolution of the target and bound quantization
+    factor_cols (list): Factor columns to match
+    """
+
+    def __init__(self, max_entries=512, quantum=1e-6, factor_cols=FACTOR_COLS):
+        self.max_entries = max_entries
+        self.quantum = quantum
+        self.factor_cols = factor_cols
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _quantize(self, values):
+        return tuple(int(round(v / self.quantum)) for v in values)
+
+    def _nearest(self, beta_hash, bounds, targets, constraints_key=None):
+        """Weights of the cached solution with the closest targets, or None"""
+        best, best_dist = None, np.inf
+        for (other_hash, other_targets, other_bounds, other_constraints), result in self._entries.items():
+            if other_hash != beta_hash or other_bounds != bounds or other_constraints != constraints_key:
+                continue
+            dist = sum((a - b) ** 2 for a, b in zip(other_targets, targets))
+            if dist < best_dist:
+                best, best_dist = result['weights'], dist
+        return best
+
+    def optimize(self, betas, target_exposures, max_weight=1.0, min_weight=0.0, beta_hash=None,
+                 constraints=None):
+        """
+        Cached optimize_portfolio
+
+        Parameters:
+        betas (DataFrame): Factor betas for each asset
+        target_exposures (dict): Target factor exposures
+        max_weight (float): Maximum weight per asset
+        min_weight (float): Minimum weight per asset
+        beta_hash (str): Precomputed betas_key, hashed here when omitted
+        constraints (LinearConstraints): Group caps, budgets and factor bands
+
+        Returns:
+        dict: Output of optimize_portfolio
+        """
+        if beta_hash is None:
+            beta_hash = betas_key(betas, self.factor_cols)
+        targets = self._quantize([target_exposures.get(col, 0.0) for col in self.factor_cols])
+        bounds = self._quantize([min_weight, max_weight])
+        constraints_key = constraints.key() if constraints is not None and len(constraints) else None
+        key = (beta_hash, targets, bounds, constraints_key)
+
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _copy_result(result)
+            self.misses += 1
+            warm_start = self._nearest(beta_hash, bounds, targets, constraints_key)
+
+        result = optimize_portfolio(betas, target_exposures, max_weight=max_weight,
+                                    min_weight=min_weight, initial_weights=warm_start,
+                                    factor_cols=self.factor_cols, constraints=constraints)
+
+        # Only successful solves are kept; a failure may succeed from another start
+        if result['success']:
+            with self._lock:
+                self._entries[key] = _copy_result(result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
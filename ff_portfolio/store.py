@@ -0,0 +1,288 @@
+# Memory-mapped storage for return, factor and beta matrices
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from .betas import FACTOR_COLS, RF_COL, fit_factor_model, ols_fit
+
+
+class PanelStore:
+    """
+    Aligned returns, factors and betas kept as memory-mapped .npy files
+
+    Layout under root:
+    index.json     dates, tickers and factor columns
+    returns.npy    (T x N) asset returns
+    factors.npy    (T x K+1) factor returns with the risk-free rate last
+    betas.npy      (N x K) factor betas
+    alphas.npy     (N,) regression intercepts
+    resid_var.npy  (N,) residual variances
+
+    Arrays are opened lazily by the OS, so universes larger than RAM only
+    page in the rows and columns that are touched. Basic slices of the
+    arrays (date ranges, contiguous ticker ranges) are views, and
+    ols_fit / solve_exposure_qp accept them directly without copying.
+    compute_factor_betas on the *_frame DataFrames does copy, as its
+    alignment and missing-data masking go through pandas; fit_betas is the
+    block-wise path that stays within the maps.
+
+    Parameters:
+    root (str): Store directory
+    mode (str): 'r' for read-only or 'r+' to update in place
+    """
+
+    _files = ('returns', 'factors', 'betas', 'alphas', 'resid_var')
+
+    def __init__(self, root, mode='r'):
+        self.root = root
+        self.mode = mode
+        with open(os.path.join(root, 'index.json')) as f:
+            index = json.load(f)
+        self.dates = pd.DatetimeIndex(index['dates'])
+        self.tickers = index['tickers']
+        self.factor_cols = index['factor_cols']
+        self.rf_col = index['rf_col']
+        self._positions = {ticker: i for i, ticker in enumerate(self.tickers)}
+        for name in self._files:
+            setattr(self, name, np.load(os.path.join(root, f'{name}.npy'), mmap_mode=mode))
+
+    @classmethod
+    def create(cls, root, dates, tickers, factor_cols=FACTOR_COLS, rf_col=RF_COL,
+               returns_dtype='float32', betas_dtype='float64'):
+        """
+        Allocate an empty store filled with NaN
+
+        Parameters:
+        root (str): Store directory
+        dates (DatetimeIndex): Row dates shared by returns and factors
+        tickers (list): Asset columns
+        factor_cols (list): Factor columns
+        rf_col (str): Risk-free column
+        returns_dtype (str): float32 halves the size of the largest matrix
+        betas_dtype (str): Betas stay float64 so the optimizer uses them in place
+
+        Returns:
+        PanelStore: The new store opened in 'r+' mode
+        """
+        os.makedirs(root, exist_ok=True)
+        dates = pd.DatetimeIndex(dates)
+        tickers = list(tickers)
+        n_obs, n_assets, n_factors = len(dates), len(tickers), len(factor_cols)
+
+        shapes = {
+            'returns': ((n_obs, n_assets), returns_dtype),
+            'factors': ((n_obs, n_factors + 1), 'float64'),
+            'betas': ((n_assets, n_factors), betas_dtype),
+            'alphas': ((n_assets,), betas_dtype),
+            'resid_var': ((n_assets,), betas_dtype)
+        }
+        for name, (shape, dtype) in shapes.items():
+            array = np.lib.format.open_memmap(os.path.join(root, f'{name}.npy'), mode='w+',
+                                              dtype=dtype, shape=shape)
+            array[:] = np.nan
+            array.flush()
+            del array
+
+        index = {
+            'dates': [d.strftime('%Y-%m-%d') for d in dates],
+            'tickers': tickers,
+            'factor_cols': list(factor_cols),
+            'rf_col': rf_col
+        }
+        with open(os.path.join(root, 'index.json'), 'w') as f:
+            json.dump(index, f)
+        return cls(root, mode='r+')
+
+    def date_slice(self, start=None, end=None):
+        """Row slice covering dates in [start, end]"""
+        first = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side='left')
+        last = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side='right')
+        return slice(first, last)
+
+    def ticker_slice(self, first=None, last=None):
+        """Column slice covering the tickers from first to last inclusive"""
+        start = 0 if first is None else self._positions[first]
+        stop = len(self.tickers) if last is None else self._positions[last] + 1
+        return slice(start, stop)
+
+    def write_returns(self, returns, block_size=256):
+        """Write a returns DataFrame into the store, aligned on dates and tickers"""
+        returns = returns.reindex(columns=self.tickers)
+        rows = self.dates.get_indexer(returns.index)
+        keep = rows >= 0
+        rows, values = rows[keep], returns[keep]
+        for i in range(0, len(rows), block_size):
+            self.returns[rows[i:i + block_size]] = values.iloc[i:i + block_size].to_numpy(dtype=self.returns.dtype)
+        self.returns.flush()
+
+    def write_factors(self, factors):
+        """Write a factor DataFrame (factor columns plus RF) into the store"""
+        factors = factors.reindex(index=self.dates, columns=self.factor_cols + [self.rf_col])
+        self.factors[:] = factors.to_numpy(dtype=float)
+        self.factors.flush()
+
+    def fit_betas(self, start=None, end=None, block_size=2048):
+        """
+        Estimate betas for every asset over [start, end] and store them
+
+        Assets are processed in column blocks, so only one block of returns
+        is converted to float64 at a time. Dates with missing factor data are
+        dropped; assets are expected to have complete returns in the window.
+        """
+        rows = self.date_slice(start, end)
+        factors = self.factors[rows]
+        mask = ~np.isnan(factors).any(axis=1)
+        X = factors[mask, :-1]
+        rf = factors[mask, -1]
+
+        for first in range(0, len(self.tickers), block_size):
+            cols = slice(first, min(first + block_size, len(self.tickers)))
+            Y = self.returns[rows, cols][mask] - rf[:, None]
+            fit = ols_fit(X, Y)
+            self.betas[cols] = fit['betas']
+            self.alphas[cols] = fit['alphas']
+            self.resid_var[cols] = fit['resid_var']
+
+        for name in ('betas', 'alphas', 'resid_var'):
+            getattr(self, name).flush()
+
+    def returns_frame(self, rows=slice(None), cols=slice(None)):
+        """DataFrame over a slice of the returns matrix"""
+        return pd.DataFrame(self.returns[rows, cols], index=self.dates[rows],
+                            columns=self.tickers[cols], copy=False)
+
+    def factors_frame(self, rows=slice(None)):
+        """DataFrame over a slice of the factor matrix"""
+        return pd.DataFrame(self.factors[rows], index=self.dates[rows],
+                            columns=self.factor_cols + [self.rf_col], copy=False)
+
+    def betas_frame(self, cols=slice(None)):
+        """DataFrame over a slice of the betas, usable with optimize_portfolio"""
+        return pd.DataFrame(self.betas[cols], index=self.tickers[cols],
+                            columns=self.factor_cols, copy=False)
+
+
+def data_vintage(returns, factors):
+    """
+    Identifier of the data a beta estimate was computed from
+
+    The last factor date comes first so a new month-end release is visible
+    in the name; the digest covers the labels and values of both frames so
+    revised prices or factors also produce a new vintage. Index labels are
+    hashed by content, so object, string and Period indexes built as
+    separate objects give the same vintage.
+    """
+    digest = hashlib.sha1()
+    for frame in (returns, factors):
+        digest.update('\x1f'.join(map(str, frame.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(frame.index).to_numpy().tobytes())
+        digest.update(np.ascontiguousarray(frame.to_numpy(dtype=float)).tobytes())
+    last = factors.index.max()
+    return f"{last:%Y%m%d}-{digest.hexdigest()[:16]}"
+
+
+class BetaCache:
+    """
+    Beta estimates shared between processes through memory-mapped files
+
+    Each data vintage gets a directory under root holding betas.npy,
+    alphas.npy, r_squared.npy and index.json. The first process to ask for
+    a vintage fits the model and publishes the directory with an atomic
+    rename; every other process, and every later request, maps the files
+    read-only, so all workers share one copy through the OS page cache
+    instead of each holding a pickled DataFrame. When new factor data
+    arrives the vintage changes, the betas are refit once, and older
+    vintages beyond keep_vintages are removed.
+
+    Parameters:
+    root (str): Cache directory
+    keep_vintages (int): Number of most recent vintages kept on disk
+    """
+
+    _files = ('betas', 'alphas', 'r_squared')
+
+    def __init__(self, root, keep_vintages=2):
+        self.root = root
+        self.keep_vintages = keep_vintages
+
+    def _publish(self, vintage, returns, factors, factor_cols, rf_col):
+        """Fit the model into a private directory and rename it into place"""
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = os.path.join(self.root, f'.tmp-{vintage}-{uuid.uuid4().hex}')
+        os.makedirs(tmp_dir)
+        try:
+            fit = fit_factor_model(returns, factors, factor_cols, rf_col)
+            for name in self._files:
+                np.save(os.path.join(tmp_dir, f'{name}.npy'), np.ascontiguousarray(fit[name]))
+            with open(os.path.join(tmp_dir, 'index.json'), 'w') as f:
+                json.dump({'vintage': vintage, 'assets': [str(a) for a in fit['assets']],
+                           'factor_cols': fit['factor_cols']}, f)
+            try:
+                os.rename(tmp_dir, os.path.join(self.root, vintage))
+            except OSError:
+                # Another process published the same vintage first
+                pass
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self._prune(keep=vintage)
+
+    def _prune(self, keep):
+        """Remove all but the most recently published vintages, never the one in keep"""
+        published = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if not name.startswith('.') and name != keep:
+                    published.append((os.path.getmtime(path), path))
+            except OSError:
+                # Removed by another process in the meantime
+                continue
+        for _, path in sorted(published)[:max(len(published) - self.keep_vintages + 1, 0)]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def get(self, returns, factors, vintage=None, factor_cols=FACTOR_COLS, rf_col=RF_COL):
+        """
+        Betas for the given data, fitting them only if no process has yet
+
+        Parameters:
+        returns (DataFrame): Monthly returns for each asset
+        factors (DataFrame): Monthly Fama-French factor returns including RF
+        vintage (str): Identifier of the data, data_vintage by default. That hashes
+                       both frames, so callers that ask repeatedly for the same data
+                       (e.g. on every Streamlit rerun) should compute it once per
+                       data load and pass it in
+        factor_cols (list): Factor columns used as regressors
+        rf_col (str): Risk-free column subtracted from returns
+
+        Returns:
+        tuple: (betas DataFrame, alphas Series, r_squareds Series) backed by
+               read-only memory maps, as returned by compute_factor_betas
+        """
+        if vintage is None:
+            vintage = data_vintage(returns, factors)
+        path = os.path.join(self.root, vintage)
+        for attempt in range(2):
+            if not os.path.exists(os.path.join(path, 'index.json')):
+                self._publish(vintage, returns, factors, list(factor_cols), rf_col)
+            try:
+                return self._load(path)
+            except FileNotFoundError:
+                # Pruned by another process between the check and the load: publish again once
+                if attempt:
+                    raise
+
+    def _load(self, path):
+        """Map a published vintage read-only"""
+        with open(os.path.join(path, 'index.json')) as f:
+            index = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in self._files}
+        assets = pd.Index(index['assets'])
+        betas = pd.DataFrame(arrays['betas'], index=assets, columns=index['factor_cols'], copy=False)
+        alphas = pd.Series(arrays['alphas'], index=assets, copy=False)
+        r_squareds = pd.Series(arrays['r_squared'], index=assets, copy=False)
+        return betas, alphas, r_squareds
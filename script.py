@@ -14,12 +14,9 @@ print("Packages installed successfully.")
 
 import pandas as pd
 import numpy as np
-import yfinance as yf
-from pandas_datareader import data as pdr
-import pandas_datareader.famafrench as ff
 import datetime
-import scipy.optimize as sco
-import matplotlib.pyplot as plt
+
+from ff_portfolio.data import ConcurrentPriceFetcher, DataCache, YahooSource, FF_MONTHLY_DATASET
 
 # Setting up variables for later use
 print("Defining a list of liquid U.S. stocks and ETFs")
@@ -34,16 +31,25 @@ tickers = [
 
 print(f"Selected {len(tickers)} stocks and ETFs for portfolio optimization.")
 
+# Local on-disk cache so history is only downloaded once, fetched in concurrent chunks
+price_fetcher = ConcurrentPriceFetcher(YahooSource(), chunk_size=50, max_concurrent=8)
+data_cache = DataCache('.ff_cache', price_source=price_fetcher)
+
 # Define a function to download historical price data
 def get_stock_data(tickers, start_date, end_date):
     """
     Download adjusted close prices for the specified tickers and date range
     """
-    print(f"Downloading price data for {len(tickers)} assets...")
+    print(f"Loading price data for {len(tickers)} assets...")
     try:
-        yf.pdr_override()
-        data = pdr.get_data_yahoo(tickers, start=start_date, end=end_date)['Adj Close']
-        print(f"Successfully downloaded data with shape: {data.shape}")
+        # Only dates missing from the local cache are downloaded
+        data, status = data_cache.get_prices(tickers, start_date, end_date, return_status=True)
+        print(f"Successfully loaded data with shape: {data.shape}")
+        
+        # Report symbols that failed after retries instead of dropping the whole batch
+        if not status['ok'].all():
+            failed = status.index[~status['ok']].tolist()
+            print(f"Failed to download {len(failed)} tickers: {failed}")
         return data
     except Exception as e:
         print(f"Error downloading data: {e}")
@@ -54,13 +60,11 @@ def get_ff_factors(start_date, end_date):
     """
     Download Fama-French factor data for the specified date range
     """
-    print("Downloading Fama-French factor data...")
+    print("Loading Fama-French factor data...")
     try:
         # Get the FF 5 factors data (includes the 4 factors we need: Mkt-RF, SMB, HML, RMW)
-        ff_data = ff.FamaFrenchReader('F-F_Research_Data_5_Factors_2x3', start=start_date, end=end_date).read()[0]
-        # Convert index to datetime
-        ff_data.index = pd.to_datetime(ff_data.index, format='%Y-%m')
-        print(f"Successfully downloaded FF factor data with shape: {ff_data.shape}")
+        ff_data = data_cache.get_factors(FF_MONTHLY_DATASET, start_date, end_date)
+        print(f"Successfully loaded FF factor data with shape: {ff_data.shape}")
         return ff_data
     except Exception as e:
         print(f"Error downloading FF factor data: {e}")
@@ -69,6 +73,8 @@ def get_ff_factors(start_date, end_date):
 # Check the available FF datasets
 print("Available Fama-French datasets:")
 try:
+    import pandas_datareader.famafrench as ff
+
     available_datasets = ff.get_available_datasets()
     # Print first 10 datasets
     for i, dataset in enumerate(available_datasets[:10]):
@@ -89,23 +95,14 @@ def compute_factor_betas(returns, factors):
     Returns:
     DataFrame: Factor betas for each asset
     """
-    from sklearn.linear_model import LinearRegression
+    from ff_portfolio import ols_fit
     
-    # Initialize a DataFrame to store the betas
-    betas = pd.DataFrame(index=returns.columns, 
-                         columns=factors.columns)
+    # Regress every asset on the factors at once using one shared factorization
+    fit = ols_fit(factors.values, returns.values)
     
-    # For each asset, run a regression against the factors
-    for asset in returns.columns:
-        # Prepare the data
-        y = returns[asset].values.reshape(-1, 1)
-        X = factors.values
-        
-        # Run the regression
-        model = LinearRegression().fit(X, y)
-        
-        # Store the coefficients (betas)
-        betas.loc[asset] = model.coef_[0]
+    # Store the coefficients (betas)
+    betas = pd.DataFrame(fit['betas'], index=returns.columns,
+                         columns=factors.columns)
     
     return betas
 
@@ -118,22 +115,16 @@ def optimize_portfolio(returns, betas, target_exposures, constraints=None):
     returns (DataFrame): Monthly returns for each asset
     betas (DataFrame): Factor betas for each asset
     target_exposures (Series): Target factor exposures
-    constraints (dict): Additional constraints for the optimization
+    constraints (dict): Additional constraints for the optimization: 'max_weight',
+                        'min_weight' and 'linear' (a LinearConstraints with
+                        sector caps, group budgets and factor bands)
     
     Returns:
     array: Optimized portfolio weights
     """
-    n_assets = len(returns.columns)
+    from ff_portfolio import solve_constrained_qp, solve_exposure_qp
     
-    # Define the objective function (minimize squared error between portfolio exposures and targets)
-    def objective(weights):
-        # Calculate portfolio factor exposures
-        portfolio_exposures = betas.T @ weights
-        
-        # Calculate squared error
-        tracking_error = np.sum((portfolio_exposures - target_exposures)**2)
-        
-        return tracking_error
+    n_assets = len(returns.columns)
     
     # Initial weights (equal allocation)
     initial_weights = np.array([1.0/n_assets] * n_assets)
@@ -142,22 +133,23 @@ def optimize_portfolio(returns, betas, target_exposures, constraints=None):
     if constraints is None:
         constraints = {}
     
-    # Default constraints
-    constraints_list = [
-        {'type': 'eq', 'fun': lambda x: np.sum(x) - 1.0},  # Sum of weights = 1
-        {'type': 'ineq', 'fun': lambda x: x}  # All weights >= 0 (no shorting)
-    ]
-    
-    # Add any additional constraints
-    
-    # Run the optimization
-    result = sco.minimize(objective, initial_weights, method='SLSQP',
-                          constraints=constraints_list, bounds=[(0, 1) for _ in range(n_assets)])
+    # Minimize ||betas' w - targets||^2 with sum(w) = 1 and min_weight <= w <= max_weight
+    lb = constraints.get('min_weight', 0.0)
+    ub = constraints.get('max_weight', 1.0)
+    linear = constraints.get('linear')
+    if linear is None:
+        result = solve_exposure_qp(betas.values, target_exposures.values, lb=lb, ub=ub,
+                                   w0=initial_weights)
+    else:
+        # Group and band rows as one sparse matrix, G w <= h, used directly by the solver
+        G, h, _ = linear.compile(betas, list(betas.columns))
+        result = solve_constrained_qp(betas.values, target_exposures.values, G, h, lb=lb, ub=ub,
+                                      w0=initial_weights)
     
-    if result['success']:
-        return result['x']
+    if result['converged']:
+        return result['weights']
     else:
-        print("Optimization failed:", result['message'])
+        print("Optimization failed: duality gap", result['gap'])
         return initial_weights
 
 print("Functions defined successfully.")
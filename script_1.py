@@ -1,12 +1,12 @@
 # Setting up the foundation for our portfolio optimization dashboard
 import pandas as pd
 import numpy as np
-import yfinance as yf
 import datetime
-import scipy.optimize as sco
-from scipy import stats
 import json
 
+from ff_portfolio import compute_factor_betas
+from ff_portfolio import optimize_portfolio as ff_optimize_portfolio
+
 print("Successfully imported core libraries")
 
 # Create sample implementation of key functions
@@ -58,61 +58,6 @@ def create_sample_data():
     
     return returns_df, factors_df
 
-def compute_factor_betas(returns, factors):
-    """
-    Compute factor betas (exposures) for each asset using linear regression
-    
-    Parameters:
-    returns (DataFrame): Monthly returns for each asset
-    factors (DataFrame): Monthly Fama-French factor returns
-    
-    Returns:
-    DataFrame: Factor betas for each asset
-    """
-    
-    # Use only the 4-factor model columns
-    factor_cols = ['Mkt-RF', 'SMB', 'HML', 'RMW']
-    X = factors[factor_cols]
-    
-    # Initialize results
-    betas = pd.DataFrame(index=returns.columns, columns=factor_cols)
-    alphas = pd.Series(index=returns.columns)
-    r_squareds = pd.Series(index=returns.columns)
-    
-    # For each asset, run a regression
-    for asset in returns.columns:
-        try:
-            # Prepare the data - use excess returns
-            y = returns[asset] - factors['RF']  # Excess return
-            
-            # Run the regression using scipy.stats
-            slope, intercept, r_value, p_value, std_err = stats.linregress(
-                X.iloc[:, 0], y  # Simple regression for market factor
-            )
-            
-            # For multivariate regression, we'll use a simple approach
-            # In practice, you'd use statsmodels or sklearn
-            
-            # Store market beta
-            betas.loc[asset, 'Mkt-RF'] = slope
-            
-            # For demo purposes, generate reasonable betas for other factors
-            betas.loc[asset, 'SMB'] = np.random.normal(0.1, 0.3)
-            betas.loc[asset, 'HML'] = np.random.normal(0.0, 0.2)  
-            betas.loc[asset, 'RMW'] = np.random.normal(0.05, 0.15)
-            
-            alphas[asset] = intercept
-            r_squareds[asset] = r_value**2
-            
-        except Exception as e:
-            print(f"Error computing betas for {asset}: {e}")
-            # Set default values
-            betas.loc[asset] = [1.0, 0.0, 0.0, 0.0]
-            alphas[asset] = 0.0
-            r_squareds[asset] = 0.5
-    
-    return betas.astype(float), alphas, r_squareds
-
 def optimize_portfolio(betas, target_exposures, constraints=None):
     """
     Optimize a portfolio to minimize tracking error to target factor exposures
@@ -120,82 +65,23 @@ def optimize_portfolio(betas, target_exposures, constraints=None):
     Parameters:
     betas (DataFrame): Factor betas for each asset
     target_exposures (dict): Target factor exposures
-    constraints (dict): Additional constraints
+    constraints (dict): 'max_weight', 'min_weight' and 'linear' (a
+                        LinearConstraints with sector caps, group budgets
+                        and factor bands)
     
     Returns:
     dict: Optimization results including weights and metrics
     """
-    n_assets = len(betas)
-    
-    # Convert target exposures to array
-    factor_cols = ['Mkt-RF', 'SMB', 'HML', 'RMW']
-    target_array = np.array([target_exposures.get(col, 0.0) for col in factor_cols])
-    
-    # Define the objective function
-    def objective(weights):
-        # Calculate portfolio factor exposures
-        portfolio_exposures = betas[factor_cols].T @ weights
-        
-        # Calculate squared tracking error
-        tracking_error = np.sum((portfolio_exposures - target_array)**2)
-        
-        return tracking_error
-    
-    # Initial weights (equal allocation)
-    initial_weights = np.array([1.0/n_assets] * n_assets)
-    
-    # Constraints
-    constraints_list = [
-        {'type': 'eq', 'fun': lambda x: np.sum(x) - 1.0},  # Sum of weights = 1
-    ]
-    
-    # Bounds (no shorting by default)
-    bounds = [(0, 1) for _ in range(n_assets)]
-    
-    # If constraints provided, add max weight constraint
-    if constraints and 'max_weight' in constraints:
-        max_weight = constraints['max_weight']
-        bounds = [(0, max_weight) for _ in range(n_assets)]
-    
-    # Run optimization
-    try:
-        result = sco.minimize(
-            objective, 
-            initial_weights, 
-            method='SLSQP',
-            constraints=constraints_list, 
-            bounds=bounds,
-            options={'maxiter': 1000}
-        )
-        
-        if result.success:
-            optimal_weights = result.x
-            portfolio_exposures = betas[factor_cols].T @ optimal_weights
-            
-            # Calculate tracking error
-            tracking_error = np.sqrt(np.sum((portfolio_exposures - target_array)**2))
-            
-            return {
-                'success': True,
-                'weights': optimal_weights,
-                'portfolio_exposures': dict(zip(factor_cols, portfolio_exposures)),
-                'target_exposures': target_exposures,
-                'tracking_error': tracking_error,
-                'optimization_result': result
-            }
-        else:
-            return {
-                'success': False,
-                'error': result.message,
-                'weights': initial_weights
-            }
-            
-    except Exception as e:
-        return {
-            'success': False,
-            'error': str(e),
-            'weights': initial_weights
-        }
+    constraints = constraints or {}
+    
+    # Solve the exposure-matching QP with the dedicated solver
+    return ff_optimize_portfolio(
+        betas,
+        target_exposures,
+        max_weight=constraints.get('max_weight', 1.0),
+        min_weight=constraints.get('min_weight', 0.0),
+        constraints=constraints.get('linear')
+    )
 
 # Generate sample data
 print("Creating sample data...")
@@ -0,0 +1,435 @@
+// Exposure-matching solver for the dashboard, run in a Web Worker
+
+// Minimize ||B'w - target||^2 subject to sum(w) = 1 and lb <= w <= ub
+//
+// The engine of ff_portfolio.optimizer.solve_exposure_qp: proximal point
+// iterations with a shrinking proximal weight, each subproblem solved by
+// semismooth Newton on its K-dimensional dual. Every dual evaluation is one
+// exact projection onto the bounded simplex plus O(N K) work, so thousands of
+// assets solve in milliseconds even when the Hessian 2 B B' (rank K) makes
+// plain or accelerated gradient steps crawl. Convergence is certified by the
+// Frank-Wolfe duality gap, an upper bound on the distance of the objective
+// from its optimum.
+//
+// A generator: it yields the state after every proximal iteration, so the
+// worker can stream iterates and drop a superseded solve between iterations,
+// and returns the final state.
+function* exposureQPIterates(betas, target, lb, ub, options = {}) {
+    const tol = options.tol ?? 1e-10;
+    const maxIterations = options.maxIterations ?? 200;
+    const k = target.length;
+    const n = betas.length / k;
+    const started = performance.now();
+
+    if (n * lb > 1 + 1e-12 || n * ub < 1 - 1e-12) {
+        throw new Error(`Weights between ${lb} and ${ub} cannot sum to 1 over ${n} assets`);
+    }
+
+    const work = { sorted: new Float64Array(n), prefix: new Float64Array(n + 1) };
+    const grad = new Float64Array(n);
+    const resid = new Float64Array(k);
+
+    // Proximal weight relative to the curvature of the objective
+    const curvature = 2 * largestGramEigenvalue(betas, k);
+    let rho = 1e-2 * curvature;
+    const rhoMin = 1e-8 * curvature;
+
+    let w = projectBoundedSimplex(new Float64Array(n).fill(1 / n), lb, ub, new Float64Array(n), work);
+    let lam = new Float64Array(k);
+    let objective = gradientAt(betas, target, w, resid, grad);
+    let gap = dualityGap(grad, w, lb, ub, work.sorted);
+    let iterations = 0;
+    let newtonSteps = 0;
+
+    const state = () => ({
+        weights: w,
+        exposures: Float64Array.from(resid, (r, j) => r + target[j]),
+        objective,
+        gap,
+        iterations,
+        newtonSteps,
+        converged: gap <= tol * (1 + objective),
+        solveTime: performance.now() - started
+    });
+
+    while (gap > tol * (1 + objective) && iterations < maxIterations) {
+        iterations++;
+        const previous = w;
+        const subproblem = proxNewton(betas, target, w, rho, lb, ub, lam, work);
+        w = subproblem.w;
+        lam = subproblem.lam;
+        newtonSteps += subproblem.steps;
+
+        objective = gradientAt(betas, target, w, resid, grad);
+        gap = dualityGap(grad, w, lb, ub, work.sorted);
+
+        // Stop once the smallest proximal step can no longer move the weights
+        if (rho === rhoMin && w.every((x, i) => x === previous[i])) break;
+        rho = Math.max(0.1 * rho, rhoMin);
+        yield state();
+    }
+
+    return state();
+}
+
+// Run exposureQPIterates to completion
+function solveExposureQP(betas, target, lb, ub, options = {}) {
+    const iterates = exposureQPIterates(betas, target, lb, ub, options);
+    let step = iterates.next();
+    while (!step.done) {
+        step = iterates.next();
+    }
+    return step.value;
+}
+
+// Semismooth Newton on the dual of
+//     min ||B'w - t||^2 + rho/2 ||w - center||^2  s.t. w in the bounded simplex
+// For a multiplier lam on z = B'w the minimizing weights are the projection of
+// center - B lam / rho, so every iterate is feasible and the linear algebra is K x K.
+function proxNewton(betas, target, center, rho, lb, ub, lam, work, tol = 1e-10, maxNewton = 20) {
+    const k = target.length;
+    const n = center.length;
+
+    const dual = multiplier => {
+        const trial = new Float64Array(n);
+        for (let i = 0; i < n; i++) {
+            let shift = 0;
+            for (let j = 0; j < k; j++) {
+                shift += betas[i * k + j] * multiplier[j];
+            }
+            trial[i] = center[i] - shift / rho;
+        }
+        const w = projectBoundedSimplex(trial, lb, ub, trial, work);
+
+        const exposures = new Float64Array(k);
+        let proximal = 0;
+        for (let i = 0; i < n; i++) {
+            proximal += (w[i] - center[i]) ** 2;
+            if (w[i] === 0) continue;
+            for (let j = 0; j < k; j++) {
+                exposures[j] += w[i] * betas[i * k + j];
+            }
+        }
+        let value = 0.5 * rho * proximal;
+        const grad = new Float64Array(k);
+        for (let j = 0; j < k; j++) {
+            value += multiplier[j] * (exposures[j] - target[j] - multiplier[j] / 4);
+            grad[j] = -(exposures[j] - target[j] - multiplier[j] / 2);
+        }
+        return { phi: -value, grad, w };
+    };
+
+    let current = dual(lam);
+    let steps = 0;
+    for (steps = 1; steps <= maxNewton; steps++) {
+        if (Math.hypot(...current.grad) <= tol) break;
+
+        // Generalized Hessian: free assets move together under the budget constraint
+        const sum = new Float64Array(k);
+        const outer = new Float64Array(k * k);
+        let free = 0;
+        for (let i = 0; i < n; i++) {
+            if (current.w[i] <= lb || current.w[i] >= ub) continue;
+            free++;
+            for (let a = 0; a < k; a++) {
+                sum[a] += betas[i * k + a];
+                for (let b = 0; b < k; b++) {
+                    outer[a * k + b] += betas[i * k + a] * betas[i * k + b];
+                }
+            }
+        }
+        const hessian = new Float64Array(k * k);
+        for (let a = 0; a < k; a++) {
+            for (let b = 0; b < k; b++) {
+                const centered = free ? outer[a * k + b] - sum[a] * sum[b] / free : 0;
+                hessian[a * k + b] = centered / rho + (a === b ? 0.5 : 0);
+            }
+        }
+        const direction = solveLinearSystem(hessian, current.grad.map(g => -g), k);
+        let slope = 0;
+        for (let j = 0; j < k; j++) {
+            slope += current.grad[j] * direction[j];
+        }
+
+        // Backtracking line search on the dual
+        let next = null;
+        let alpha = 1;
+        while (alpha >= 1e-12) {
+            const candidate = lam.map((x, j) => x + alpha * direction[j]);
+            next = dual(candidate);
+            if (next.phi <= current.phi + 1e-4 * alpha * slope) {
+                lam = candidate;
+                break;
+            }
+            alpha *= 0.5;
+        }
+        if (alpha < 1e-12) break;
+        current = next;
+    }
+
+    return { w: current.w, lam, steps };
+}
+
+// Solve the K x K system A x = b by Gaussian elimination with partial pivoting
+function solveLinearSystem(matrix, rhs, k) {
+    const a = Float64Array.from(matrix);
+    const x = Float64Array.from(rhs);
+    for (let col = 0; col < k; col++) {
+        let pivot = col;
+        for (let row = col + 1; row < k; row++) {
+            if (Math.abs(a[row * k + col]) > Math.abs(a[pivot * k + col])) pivot = row;
+        }
+        if (pivot !== col) {
+            for (let j = 0; j < k; j++) {
+                [a[col * k + j], a[pivot * k + j]] = [a[pivot * k + j], a[col * k + j]];
+            }
+            [x[col], x[pivot]] = [x[pivot], x[col]];
+        }
+        for (let row = col + 1; row < k; row++) {
+            const factor = a[row * k + col] / a[col * k + col];
+            for (let j = col; j < k; j++) {
+                a[row * k + j] -= factor * a[col * k + j];
+            }
+            x[row] -= factor * x[col];
+        }
+    }
+    for (let row = k - 1; row >= 0; row--) {
+        let value = x[row];
+        for (let j = row + 1; j < k; j++) {
+            value -= a[row * k + j] * x[j];
+        }
+        x[row] = value / a[row * k + row];
+    }
+    return x;
+}
+
+// Objective ||B'w - target||^2; fills resid = B'w - target and grad = 2 B resid
+function gradientAt(betas, target, w, resid, grad) {
+    const k = target.length;
+    const n = w.length;
+    for (let j = 0; j < k; j++) {
+        resid[j] = -target[j];
+    }
+    for (let i = 0; i < n; i++) {
+        const wi = w[i];
+        if (wi === 0) continue;
+        for (let j = 0; j < k; j++) {
+            resid[j] += wi * betas[i * k + j];
+        }
+    }
+    let objective = 0;
+    for (let j = 0; j < k; j++) {
+        objective += resid[j] * resid[j];
+    }
+    for (let i = 0; i < n; i++) {
+        let g = 0;
+        for (let j = 0; j < k; j++) {
+            g += betas[i * k + j] * resid[j];
+        }
+        grad[i] = 2 * g;
+    }
+    return objective;
+}
+
+// Largest eigenvalue of the K x K Gram matrix B'B, by power iteration
+function largestGramEigenvalue(betas, k) {
+    const n = betas.length / k;
+    const gram = new Float64Array(k * k);
+    for (let i = 0; i < n; i++) {
+        for (let a = 0; a < k; a++) {
+            for (let b = 0; b < k; b++) {
+                gram[a * k + b] += betas[i * k + a] * betas[i * k + b];
+            }
+        }
+    }
+
+    let vector = new Float64Array(k).fill(1 / Math.sqrt(k));
+    let eigenvalue = 0;
+    for (let iter = 0; iter < 100; iter++) {
+        const next = new Float64Array(k);
+        for (let a = 0; a < k; a++) {
+            for (let b = 0; b < k; b++) {
+                next[a] += gram[a * k + b] * vector[b];
+            }
+        }
+        const norm = Math.hypot(...next);
+        if (norm === 0) return 1;
+        vector = next.map(x => x / norm);
+        if (Math.abs(norm - eigenvalue) <= 1e-12 * norm) return norm;
+        eigenvalue = norm;
+    }
+    return eigenvalue;
+}
+
+// Euclidean projection onto {w : sum(w) = 1, lb <= w <= ub}
+//
+// The projection is clip(v - tau, lb, ub) for the scalar tau that makes the
+// weights sum to 1. With v sorted and prefix sums, the clipped sum for any tau
+// takes two binary searches, so tau is bracketed by bisection and then solved
+// exactly on its linear piece. Writes into out and returns it.
+function projectBoundedSimplex(v, lb, ub, out, work) {
+    const n = v.length;
+    const total = 1;
+    const sorted = work.sorted;
+    const prefix = work.prefix;
+    sorted.set(v);
+    sorted.sort();
+    prefix[0] = 0;
+    for (let i = 0; i < n; i++) {
+        prefix[i + 1] = prefix[i] + sorted[i];
+    }
+
+    // Number of values <= x
+    const countAtMost = x => {
+        let lo = 0;
+        let hi = n;
+        while (lo < hi) {
+            const mid = (lo + hi) >>> 1;
+            if (sorted[mid] <= x) lo = mid + 1; else hi = mid;
+        }
+        return lo;
+    };
+    const pieceAt = tau => {
+        const low = countAtMost(tau + lb);
+        const high = Math.max(low, countAtMost(tau + ub));
+        const sum = lb * low + ub * (n - high) + (prefix[high] - prefix[low]) - tau * (high - low);
+        return { low, high, sum };
+    };
+
+    // The clipped sum decreases from n ub to n lb over [min(v) - ub, max(v) - lb]
+    let lo = sorted[0] - ub;
+    let hi = sorted[n - 1] - lb;
+    for (let iter = 0; iter < 200 && hi - lo > 1e-15 * (1 + Math.abs(lo)); iter++) {
+        const mid = 0.5 * (lo + hi);
+        if (pieceAt(mid).sum > total) lo = mid; else hi = mid;
+    }
+
+    let tau = 0.5 * (lo + hi);
+    const { low, high } = pieceAt(tau);
+    if (high > low) {
+        tau = (prefix[high] - prefix[low] + lb * low + ub * (n - high) - total) / (high - low);
+    }
+
+    // One Newton step on tau removes the rounding error of the prefix sums
+    let sum = 0;
+    let free = 0;
+    for (let i = 0; i < n; i++) {
+        const x = v[i] - tau;
+        if (x <= lb) {
+            sum += lb;
+        } else if (x >= ub) {
+            sum += ub;
+        } else {
+            sum += x;
+            free++;
+        }
+    }
+    if (free) tau += (sum - total) / free;
+
+    for (let i = 0; i < n; i++) {
+        out[i] = Math.min(ub, Math.max(lb, v[i] - tau));
+    }
+    return out;
+}
+
+// Frank-Wolfe gap grad'(w - s), with s the bounded-simplex vertex minimizing
+// grad's: every weight at lb, then the budget left filled in order of
+// increasing gradient (fractional knapsack)
+function dualityGap(grad, w, lb, ub, sorted) {
+    const n = w.length;
+    let linear = 0;
+    let gradSum = 0;
+    for (let i = 0; i < n; i++) {
+        linear += grad[i] * w[i];
+        gradSum += grad[i];
+    }
+
+    sorted.set(grad);
+    sorted.sort();
+    let remaining = 1 - n * lb;
+    let vertex = lb * gradSum;
+    for (let i = 0; i < n && remaining > 0; i++) {
+        const fill = Math.min(ub - lb, remaining);
+        vertex += fill * sorted[i];
+        remaining -= fill;
+    }
+    return linear - vertex;
+}
+
+// Body of the solver worker. Messages in:
+//     { type: 'universe', betas: ArrayBuffer (transferred), k }
+//     { type: 'solve', id, target: Float64Array, lb, ub }
+// Messages out, each carrying transferred weights and exposures:
+//     { type: 'progress' | 'done', id, state }   { type: 'error', id, message }
+// A solve yields to the event loop after every proximal iteration, so a newer
+// solve request is seen at once and the older solve stops there.
+function solverWorkerMain() {
+    const PROGRESS_INTERVAL = 50; // ms between streamed iterates
+    let betas = null;
+    let k = 0;
+    let latestId = 0;
+
+    // A MessageChannel round trip yields to the event loop without setTimeout's clamping
+    const channel = new MessageChannel();
+    const waiting = [];
+    channel.port1.onmessage = () => waiting.shift()();
+    const yieldToEvents = () => new Promise(resolve => {
+        waiting.push(resolve);
+        channel.port2.postMessage(null);
+    });
+
+    const post = (type, id, state) => {
+        const weights = Float64Array.from(state.weights);
+        const exposures = Float64Array.from(state.exposures);
+        self.postMessage({ type, id, state: { ...state, weights, exposures } },
+                         [weights.buffer, exposures.buffer]);
+    };
+
+    self.onmessage = async function(event) {
+        const message = event.data;
+        if (message.type === 'universe') {
+            betas = new Float64Array(message.betas);
+            k = message.k;
+            return;
+        }
+
+        const id = message.id;
+        latestId = id;
+        try {
+            const iterates = exposureQPIterates(betas, message.target, message.lb, message.ub);
+            let lastPost = performance.now();
+            for (;;) {
+                const step = iterates.next();
+                if (step.done) {
+                    post('done', id, step.value);
+                    return;
+                }
+                if (performance.now() - lastPost >= PROGRESS_INTERVAL) {
+                    post('progress', id, step.value);
+                    lastPost = performance.now();
+                }
+                await yieldToEvents();
+                if (id !== latestId) return;
+            }
+        } catch (error) {
+            self.postMessage({ type: 'error', id, message: error.message });
+        }
+    };
+}
+
+// Start the solver in a Web Worker. The worker script is assembled from the
+// functions above, so it also runs when the dashboard is opened from disk,
+// where loading a worker file is blocked. Returns null without Worker support.
+function createSolverWorker() {
+    if (typeof Worker === 'undefined' || typeof Blob === 'undefined') return null;
+
+    const functions = [exposureQPIterates, proxNewton, solveLinearSystem, gradientAt,
+                       largestGramEigenvalue, projectBoundedSimplex, dualityGap];
+    const source = functions.map(f => f.toString()).join('\n\n') + `\n\n(${solverWorkerMain.toString()})();\n`;
+    try {
+        return new Worker(URL.createObjectURL(new Blob([source], { type: 'text/javascript' })));
+    } catch (error) {
+        console.warn('Solver worker unavailable, solving on the main thread:', error);
+        return null;
+    }
+}
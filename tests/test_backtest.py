@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ff_portfolio.backtest import run_backtest
+from ff_portfolio.bench import create_synthetic_data
+
+TARGETS = {'Mkt-RF': 1.0, 'SMB': 0.2, 'HML': 0.1, 'RMW': 0.0}
+
+
+@pytest.fixture
+def data():
+    returns, factors, _ = create_synthetic_data(n_assets=12, n_months=60, seed=3)
+    return returns, factors
+
+
+def test_holds_over_next_calendar_month(data):
+    returns, factors = data
+    factors = factors.copy()
+    factors.iloc[40, 0] = np.nan    # one month without factor data
+    result = run_backtest(returns, factors, TARGETS, window=24, max_weight=0.4, max_workers=1)
+
+    months = result['weights'].index.to_period('M')
+    assert not (months == returns.index[40].to_period('M')).any()
+    for date, weights in result['weights'].iterrows():
+        next_month = returns.index[returns.index.get_loc(date) + 1]
+        expected = weights.to_numpy() @ returns.loc[next_month].to_numpy()
+        assert result['portfolio_returns'][date] == pytest.approx(expected)
+
+
+def test_assets_eligible_only_with_full_window(data):
+    returns, factors = data
+    returns = returns.copy()
+    returns.iloc[:30, 0] = np.nan    # listed late
+    returns.iloc[45:, 1] = np.nan    # delisted
+    result = run_backtest(returns, factors, TARGETS, window=24, max_weight=0.4, max_workers=1)
+    weights = result['weights']
+
+    # The universe is not cut down to dates where every asset has data
+    assert weights.index[0] == returns.index[23]
+    listed = returns.index[30 + 23]
+    assert (weights.loc[:listed - pd.Timedelta(days=1), returns.columns[0]] == 0).all()
+    assert (weights.loc[returns.index[45]:, returns.columns[1]] == 0).all()
+    assert result['eligible'].iloc[0] == 11
+    assert result['converged'].all()
+    np.testing.assert_allclose(weights.sum(axis=1), 1.0)
+
+
+def test_workers_match_serial(data):
+    returns, factors = data
+    serial = run_backtest(returns, factors, TARGETS, window=24, max_weight=0.4, max_workers=1, block_size=5)
+    pooled = run_backtest(returns, factors, TARGETS, window=24, max_weight=0.4, max_workers=2, block_size=5)
+    pd.testing.assert_frame_equal(serial['weights'], pooled['weights'])
@@ -0,0 +1,62 @@
+import copy
+import json
+
+from ff_portfolio.bench import BASELINE_PATH, DEFAULT_ASSETS, compare_results, main
+
+
+def _case(n_assets, wall_time, peak_memory, converged=True, evaluations=20):
+    return {
+        'n_assets': n_assets, 'n_months': 60, 'n_factors': 4,
+        'estimation': {'wall_time': wall_time, 'peak_memory': peak_memory},
+        'optimization': {'wall_time': wall_time, 'peak_memory': peak_memory, 'converged': converged,
+                         'objective_evaluations': evaluations},
+    }
+
+
+BASELINE = {'cases': [_case(39, 0.010, 1000), _case(500, 0.020, 2000), _case(2000, 0.040, 4000)]}
+
+
+def test_compare_results_flags_time_memory_and_convergence():
+    current = copy.deepcopy(BASELINE)
+    current['cases'][0]['estimation']['wall_time'] = 0.016
+    current['cases'][1]['optimization']['peak_memory'] = 3100
+    current['cases'][2]['optimization']['converged'] = False
+
+    assert compare_results(current, BASELINE, tolerance=1.5) == [
+        "estimation wall_time at 39 assets: 0.01 -> 0.016",
+        "optimization peak_memory at 500 assets: 2000 -> 3100",
+        "optimization no longer converges at 2000 assets",
+    ]
+
+
+def test_compare_results_tolerates_noise_and_new_sizes():
+    current = copy.deepcopy(BASELINE)
+    current['cases'][0]['estimation']['wall_time'] = 0.014
+    current['cases'][1]['optimization']['peak_memory'] = 2900
+    current['cases'].append(_case(10000, 1.0, 10 ** 9, converged=False))
+    assert compare_results(current, BASELINE, tolerance=1.5) == []
+
+
+def test_committed_baseline_covers_the_default_sizes():
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    assert [case['n_assets'] for case in baseline['cases']] == list(DEFAULT_ASSETS)
+    assert all(case['optimization']['converged'] for case in baseline['cases'])
+
+    # A slower machine passes unless timings are asked for; more evaluations never pass
+    current = copy.deepcopy(baseline)
+    current['cases'][0]['estimation']['wall_time'] *= 10
+    current['cases'][1]['optimization']['peak_memory'] *= 10
+    assert compare_results(current, baseline, timings=False) == []
+    assert len(compare_results(current, baseline)) == 2
+    current['cases'][2]['optimization']['objective_evaluations'] *= 2
+    assert compare_results(current, baseline, timings=False) == [
+        f"optimization objective_evaluations at {DEFAULT_ASSETS[2]} assets: "
+        f"{baseline['cases'][2]['optimization']['objective_evaluations']} -> "
+        f"{current['cases'][2]['optimization']['objective_evaluations']}"
+    ]
+
+
+def test_committed_baseline_passes_on_any_machine(capsys):
+    assert main(['--assets', '39', '500', '--repeats', '1', '--baseline']) == 0
+    assert 'REGRESSION' not in capsys.readouterr().out
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from ff_portfolio.bench import create_synthetic_data
+from ff_portfolio.bootstrap import bootstrap_portfolio
+
+TARGETS = {'Mkt-RF': 1.0, 'SMB': 0.2, 'HML': 0.1, 'RMW': 0.0}
+BANDS = ['betas_lower', 'betas_upper', 'weights_lower', 'weights_upper', 'exposures_lower', 'exposures_upper']
+
+
+def _bootstrap(max_workers, seed=7):
+    returns, factors, _ = create_synthetic_data(n_assets=10, n_months=48, seed=3)
+    return bootstrap_portfolio(returns, factors, TARGETS, n_replicates=40, max_weight=0.3,
+                               max_workers=max_workers, batch_size=7, seed=seed)
+
+
+def _assert_same_bands(first, second):
+    for key in BANDS:
+        if isinstance(first[key], pd.DataFrame):
+            pd.testing.assert_frame_equal(first[key], second[key])
+        else:
+            pd.testing.assert_series_equal(first[key], second[key])
+
+
+def test_bands_are_reproducible_and_independent_of_workers():
+    serial = _bootstrap(1)
+    _assert_same_bands(serial, _bootstrap(1))
+    _assert_same_bands(serial, _bootstrap(3))
+    assert serial['dropped'] == 0
+    assert not serial['weights_lower'].equals(_bootstrap(1, seed=8)['weights_lower'])
+    assert np.all(serial['weights_lower'] <= serial['weights_upper'])
+
+
+def test_non_converged_replicates_are_left_out_of_the_weight_bands(monkeypatch):
+    from ff_portfolio import bootstrap
+
+    solve = bootstrap.solve_exposure_qp
+    calls = []
+
+    def stalled_every_fourth(*args, **kwargs):
+        result = solve(*args, **kwargs)
+        calls.append(None)
+        if len(calls) % 4 == 0:
+            result = dict(result, weights=np.full_like(result['weights'], 5.0), converged=False)
+        return result
+
+    monkeypatch.setattr(bootstrap, 'solve_exposure_qp', stalled_every_fourth)
+    result = _bootstrap(1)
+    converged = result['replicates']['converged']
+    assert result['dropped'] == 10 == np.sum(~converged)
+    assert result['weights_upper'].max() <= 0.3 + 1e-12
+    expected = np.quantile(result['replicates']['weights'][converged], 0.95, axis=0)
+    np.testing.assert_allclose(result['weights_upper'].to_numpy(), expected)
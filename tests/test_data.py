@@ -0,0 +1,260 @@
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ff_portfolio.data import ConcurrentPriceFetcher, DataCache, HTTPCSVSource, LocalFileSource
+
+DATES = pd.bdate_range('2020-01-01', '2020-12-31')
+
+
+class PriceServer(ThreadingHTTPServer):
+    """Serves /prices/<TICKER>.csv, failing FLAKY a few times and BAD always"""
+
+    def __init__(self, flaky_failures=2):
+        super().__init__(('127.0.0.1', 0), PriceHandler)
+        self.flaky_failures = flaky_failures
+        self.requests = []
+        self.lock = threading.Lock()
+
+
+class PriceHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        ticker = url.path.rsplit('/', 1)[-1].removesuffix('.csv')
+        query = urllib.parse.parse_qs(url.query)
+        with self.server.lock:
+            self.server.requests.append((time.monotonic(), ticker))
+            failing = ticker == 'BAD' or (ticker == 'FLAKY' and self.server.flaky_failures > 0)
+            if ticker == 'FLAKY' and failing:
+                self.server.flaky_failures -= 1
+        if failing:
+            self.send_error(503)
+            return
+        dates = DATES[(DATES >= query['start'][0]) & (DATES <= query['end'][0])]
+        body = 'date,close\n' + ''.join(f'{d:%Y-%m-%d},{100.0 + i}\n' for i, d in enumerate(dates))
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv')
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = PriceServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _fetcher(server, **kwargs):
+    source = HTTPCSVSource(f'http://127.0.0.1:{server.server_port}/prices/{{ticker}}.csv'
+                           '?start={start}&end={end}', timeout=5)
+    kwargs = {'chunk_size': 1, 'max_concurrent': 4, 'max_retries': 3, 'backoff': 0.01, **kwargs}
+    return ConcurrentPriceFetcher(source, **kwargs)
+
+
+def test_retries_recover_flaky_tickers_and_isolate_failures(server):
+    fetcher = _fetcher(server, chunk_size=3)
+    result = fetcher.fetch(['AAA', 'FLAKY', 'BAD'], pd.Timestamp('2020-01-01'), pd.Timestamp('2020-03-31'))
+    status = result['status']
+
+    assert list(result['prices'].columns) == ['AAA', 'FLAKY']
+    assert result['prices'].notna().all().all()
+    assert status.loc['AAA', 'ok'] and status.loc['FLAKY', 'ok']
+    assert not status.loc['BAD', 'ok']
+    assert '503' in status.loc['BAD', 'error']
+    # The chunk fails until FLAKY recovers, then BAD is isolated ticker by ticker
+    assert status.loc['BAD', 'attempts'] == 4 + 4
+
+
+def test_rate_limit_spaces_requests(server):
+    fetcher = _fetcher(server, rate_limit=20.0)
+    tickers = [f'T{i}' for i in range(8)]
+    result = fetcher.fetch(tickers, pd.Timestamp('2020-01-01'), pd.Timestamp('2020-01-31'))
+
+    assert result['status']['ok'].all()
+    starts = np.sort([when for when, _ in server.requests])
+    assert len(starts) == len(tickers)
+    # Requests start at most 20 per second, with some slack for scheduling jitter
+    assert np.diff(starts).min() >= 0.04
+    assert starts[-1] - starts[0] >= 0.05 * (len(tickers) - 1) - 0.01
+
+
+def test_cache_collects_status_across_fetches(server, tmp_path):
+    cache = DataCache(str(tmp_path), price_source=_fetcher(server))
+    cache.get_prices(['AAA', 'FLAKY'], '2020-04-01', '2020-06-30')
+
+    # AAA now misses both edges of the wider range, FLAKY has recovered; BAD is new
+    server.flaky_failures = 1
+    prices, status = cache.get_prices(['AAA', 'FLAKY', 'BAD'], '2020-01-01', '2020-09-30',
+                                      return_status=True)
+    assert status.loc['AAA', 'ok'] and status.loc['AAA', 'attempts'] == 2
+    assert status.loc['FLAKY', 'ok'] and status.loc['FLAKY', 'attempts'] == 3
+    assert not status.loc['BAD', 'ok'] and '503' in status.loc['BAD', 'error']
+    assert prices['AAA'].notna().all() and prices['BAD'].isna().all()
+
+    # Nothing left to fetch for the good tickers: a fresh status, not the last fetch's
+    prices, status = cache.get_prices(['AAA', 'FLAKY'], '2020-01-01', '2020-09-30', return_status=True)
+    assert status['ok'].all() and (status['attempts'] == 0).all()
+
+
+def test_ranges_without_sessions_are_not_failures(server, tmp_path):
+    cache = DataCache(str(tmp_path), price_source=_fetcher(server))
+    cache.get_prices(['AAA', 'BBB'], '2020-03-02', '2020-03-06')
+
+    # Ends on a Sunday and starts before the server's history: both new edges are empty
+    prices, status = cache.get_prices(['AAA', 'BBB'], '2019-06-01', '2020-03-08', return_status=True)
+    assert status['ok'].all() and status['error'].isna().all()
+    assert (status['attempts'] == 2).all()
+    assert prices.notna().all().all()
+
+    # A ticker with no rows at all over the requested range does fail
+    prices, status = cache.get_prices(['AAA', 'CCC'], '2021-02-01', '2021-02-28', return_status=True)
+    assert not status['ok'].any() and (status['error'] == 'no data').all()
+    assert prices.empty
+
+
+class RecordingSource(LocalFileSource):
+    """LocalFileSource that records the ranges it was asked for"""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.calls = []
+
+    def fetch_prices(self, tickers, start_date, end_date):
+        self.calls.append((tuple(tickers), start_date, end_date))
+        return super().fetch_prices(tickers, start_date, end_date)
+
+    def fetch_factors(self, dataset, start_date, end_date):
+        self.calls.append((dataset, start_date, end_date))
+        return super().fetch_factors(dataset, start_date, end_date)
+
+
+@pytest.fixture
+def local_source(tmp_path):
+    root = tmp_path / 'source'
+    (root / 'prices').mkdir(parents=True)
+    (root / 'factors').mkdir()
+    for offset, ticker in enumerate(['AAA', 'BBB']):
+        pd.DataFrame({'close': 100.0 + offset + np.arange(len(DATES))}, index=DATES.rename('date')) \
+            .to_csv(root / 'prices' / f'{ticker}.csv')
+    months = pd.date_range('2015-01-01', '2020-12-01', freq='MS')
+    pd.DataFrame({'Mkt-RF': 0.5, 'RF': 0.1}, index=months.rename('date')).to_csv(root / 'factors' / 'FF.csv')
+    return RecordingSource(str(root))
+
+
+def _cache(tmp_path, source):
+    return DataCache(str(tmp_path / 'cache'), price_source=source, factor_source=source)
+
+
+def test_incremental_refresh_fetches_only_missing_edges(tmp_path, local_source):
+    cache = _cache(tmp_path, local_source)
+    cache.get_prices(['AAA', 'BBB'], '2020-03-02', '2020-06-30')
+    local_source.calls.clear()
+
+    prices = cache.get_prices(['AAA', 'BBB'], '2020-01-01', '2020-09-30')
+    assert local_source.calls == [
+        (('AAA', 'BBB'), pd.Timestamp('2020-01-01'), pd.Timestamp('2020-03-01')),
+        (('AAA', 'BBB'), pd.Timestamp('2020-07-01'), pd.Timestamp('2020-09-30')),
+    ]
+    expected = DATES[(DATES >= '2020-01-01') & (DATES <= '2020-09-30')]
+    assert list(prices.index) == list(expected)
+    assert prices.notna().all().all()
+
+    # Fully covered now: nothing is fetched
+    local_source.calls.clear()
+    cache.get_prices(['AAA', 'BBB'], '2020-02-01', '2020-08-31')
+    assert local_source.calls == []
+
+    # A new ticker is fetched on its own over the whole range
+    cache.get_prices(['AAA', 'CCC'], '2020-02-01', '2020-08-31')
+    assert local_source.calls == [(('CCC',), pd.Timestamp('2020-02-01'), pd.Timestamp('2020-08-31'))]
+
+
+def test_empty_ranges_are_covered_once_fetched(tmp_path, local_source):
+    cache = _cache(tmp_path, local_source)
+    # 2020-03-07 is a Saturday
+    cache.get_prices(['AAA'], '2020-03-02', '2020-03-07')
+    assert cache._load_manifest()['prices/AAA'] == {'start': '2020-03-02', 'end': '2020-03-07'}
+    local_source.calls.clear()
+    cache.get_prices(['AAA'], '2020-03-02', '2020-03-07')
+    assert local_source.calls == []
+
+    # Nothing before 2020 or after 2020, and no CCC at all: still answered, so covered
+    cache.get_prices(['AAA', 'CCC'], '2019-01-01', '2021-06-30')
+    manifest = DataCache(str(tmp_path / 'cache'))._load_manifest()
+    assert manifest['prices/AAA'] == {'start': '2019-01-01', 'end': '2021-06-30'}
+    assert manifest['prices/CCC'] == {'start': '2019-01-01', 'end': '2021-06-30'}
+    local_source.calls.clear()
+    cache.get_prices(['AAA', 'CCC'], '2019-01-01', '2021-06-30')
+    assert local_source.calls == []
+
+
+def test_coverage_stops_before_today(tmp_path, local_source):
+    cache = _cache(tmp_path, local_source)
+    today = pd.Timestamp.today().normalize()
+    cache.get_prices(['AAA'], '2020-01-01', today + pd.Timedelta(days=5))
+    assert cache._load_manifest()['prices/AAA']['end'] == (today - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+class FailingSource(RecordingSource):
+    """LocalFileSource whose downloads of BAD always fail"""
+
+    def fetch_prices(self, tickers, start_date, end_date):
+        if 'BAD' in tickers:
+            raise OSError('connection reset')
+        return super().fetch_prices(tickers, start_date, end_date)
+
+
+def test_failed_fetch_does_not_extend_coverage(tmp_path, local_source):
+    fetcher = ConcurrentPriceFetcher(FailingSource(local_source.root), chunk_size=1, max_retries=0)
+    cache = _cache(tmp_path, fetcher)
+    cache.get_prices(['AAA'], '2020-01-01', '2020-06-30')
+
+    _, status = cache.get_prices(['AAA', 'BAD'], '2020-01-01', '2020-09-30', return_status=True)
+    assert status.loc['AAA', 'ok'] and not status.loc['BAD', 'ok']
+    manifest = cache._load_manifest()
+    assert manifest['prices/AAA'] == {'start': '2020-01-01', 'end': '2020-09-30'}
+    assert 'prices/BAD' not in manifest
+
+
+class PaddedSource(RecordingSource):
+    """Returns a month either side of the requested range, as some vendors do"""
+
+    def fetch_prices(self, tickers, start_date, end_date):
+        return super().fetch_prices(tickers, start_date - pd.DateOffset(months=1),
+                                    end_date + pd.DateOffset(months=1))
+
+    def fetch_factors(self, dataset, start_date, end_date):
+        return super().fetch_factors(dataset, start_date - pd.DateOffset(months=6),
+                                     end_date + pd.DateOffset(months=6))
+
+
+def test_overlapping_ranges_merge_without_duplicate_dates(tmp_path, local_source):
+    source = PaddedSource(local_source.root)
+    cache = _cache(tmp_path, source)
+    cache.get_prices(['AAA'], '2020-02-01', '2020-04-30')
+    cache.get_prices(['AAA'], '2020-01-01', '2020-08-31')
+    cache.get_factors('FF', '2018-01-01', '2019-06-30')
+    cache.get_factors('FF', '2017-01-01', '2020-06-30')
+
+    # Every fetch overlapped what was already stored
+    stored = pd.read_parquet(tmp_path / 'cache' / 'prices' / 'AAA.parquet')
+    assert stored.index.is_unique and stored.index.is_monotonic_increasing
+    expected = DATES[DATES <= '2020-09-30']
+    assert list(stored.index) == list(expected)
+    assert (stored['close'].to_numpy() == 100.0 + np.arange(len(expected))).all()
+
+    factors = cache.get_factors('FF', '2016-07-01', '2020-12-31')
+    assert factors.index.is_unique and factors.index.is_monotonic_increasing
+    assert len(factors) == len(pd.date_range('2016-07-01', '2020-12-01', freq='MS'))
@@ -0,0 +1,22 @@
+import numpy as np
+
+from ff_portfolio.frontier import compute_frontier
+
+rng = np.random.default_rng(0)
+B = rng.normal([1.0, 0.2, 0.1, 0.1], [0.2, 0.4, 0.4, 0.3], (39, 4))
+TARGET = {'Mkt-RF': 1.0, 'SMB': 0.2, 'HML': 0.1, 'RMW': 0.0}
+
+
+def test_converged_points_have_no_error():
+    frontier = compute_frontier(B, TARGET, max_weights=[0.1, 0.2], penalties=[0.0, 0.01])
+    assert frontier.converged.all()
+    result = frontier.query(0.2, 0.01)
+    assert result['success'] and 'error' not in result
+    assert np.isclose(result['weights'].sum(), 1.0)
+
+
+def test_non_converged_point_reports_an_error():
+    frontier = compute_frontier(B, TARGET, max_weights=[0.2], penalties=[0.0], tol=-1.0)
+    result = frontier.query(0.2)
+    assert not result['success']
+    assert result['error'].startswith('Maximum iterations reached (duality gap')
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from ff_portfolio.objectives import (BudgetConstraint, ExposureGap, LinearInequality, TurnoverCap,
+                                     check_derivatives, portfolio_objective)
+from ff_portfolio.optimizer import solve_rebalance_qp, solve_tracking_qp
+
+N_ASSETS, N_FACTORS = 50, 4
+rng = np.random.default_rng(0)
+B = rng.normal(0.5, 0.5, (N_ASSETS, N_FACTORS))
+TARGET = rng.normal(0.3, 0.3, N_FACTORS)
+A = rng.standard_normal((N_FACTORS, N_FACTORS))
+FACTOR_COV = A @ A.T / N_FACTORS
+SPECIFIC_VAR = rng.uniform(0.001, 0.01, N_ASSETS)
+COSTS = rng.uniform(0.0, 0.01, N_ASSETS)
+CURRENT = rng.dirichlet(np.ones(N_ASSETS))
+# Keep the point away from the kinks of the L1 terms
+W = rng.dirichlet(np.ones(N_ASSETS))
+W = np.where(np.abs(W - CURRENT) < 1e-3, CURRENT + 1e-3, W)
+
+FUNCTIONS = {
+    'exposure': ExposureGap(B, TARGET),
+    'tracking': portfolio_objective(B, TARGET, factor_cov=FACTOR_COV, specific_var=SPECIFIC_VAR),
+    'turnover_l1': portfolio_objective(B, TARGET, CURRENT, COSTS, 'l1'),
+    'turnover_quadratic': portfolio_objective(B, TARGET, CURRENT, COSTS, 'quadratic'),
+    'diversified': portfolio_objective(B, TARGET, diversification=0.01),
+    'budget': BudgetConstraint(),
+    'turnover_cap': TurnoverCap(CURRENT, 0.5),
+    'linear': LinearInequality(rng.standard_normal((5, N_ASSETS)), rng.standard_normal(5)),
+}
+
+
+@pytest.mark.parametrize('name', list(FUNCTIONS))
+def test_derivatives_match_finite_differences(name):
+    errors = check_derivatives(FUNCTIONS[name], W)
+    assert errors
+    for derivative, error in errors.items():
+        assert error < 1e-6, f"{name} {derivative}: {error:.2e}"
+
+
+def test_value_and_gradient_matches_separate_calls():
+    objective = FUNCTIONS['turnover_quadratic']
+    value, gradient = objective.value_and_gradient(W)
+    assert value == pytest.approx(objective.value(W))
+    np.testing.assert_allclose(gradient, objective.gradient(W))
+
+
+def test_solvers_report_the_same_objective():
+    result = solve_rebalance_qp(B, TARGET, CURRENT, costs=COSTS, penalty='l1')
+    objective = portfolio_objective(B, TARGET, CURRENT, COSTS, 'l1')
+    assert result['objective'] == pytest.approx(objective.value(result['weights']))
+
+    result = solve_tracking_qp(B, TARGET, FACTOR_COV, SPECIFIC_VAR)
+    objective = portfolio_objective(B, TARGET, factor_cov=FACTOR_COV, specific_var=SPECIFIC_VAR)
+    assert result['objective'] == pytest.approx(objective.value(result['weights']), rel=1e-6)
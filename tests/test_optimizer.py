@@ -0,0 +1,142 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.optimize import minimize
+
+from ff_portfolio.betas import FACTOR_COLS
+from ff_portfolio.constraints import LinearConstraints
+from ff_portfolio.optimizer import (optimize_portfolio, optimize_portfolio_batch, solve_cardinality_qp,
+                                    solve_constrained_qp, solve_exposure_qp, solve_rebalance_qp)
+
+N_ASSETS = 39
+rng = np.random.default_rng(0)
+B = rng.normal([1.0, 0.2, 0.1, 0.1], [0.2, 0.4, 0.4, 0.3], (N_ASSETS, 4))
+GRID = np.array(list(itertools.product(np.linspace(0.8, 1.2, 4), np.linspace(-0.3, 0.5, 4),
+                                       np.linspace(-0.3, 0.4, 4), np.linspace(-0.2, 0.3, 4))))
+
+
+def test_batch_matches_cold_solves():
+    batch = optimize_portfolio_batch(B, GRID, bounds=(0.0, 0.2))
+    assert batch['converged'].all()
+    for i in range(0, len(GRID), 17):
+        cold = solve_exposure_qp(B, GRID[i], 0.0, 0.2)
+        assert batch['tracking_error'][i] ** 2 == pytest.approx(cold['objective'], abs=1e-9)
+        assert np.isclose(batch['weights'][i].sum(), 1.0)
+        assert batch['weights'][i].min() >= 0.0 and batch['weights'][i].max() <= 0.2 + 1e-12
+
+
+def test_warm_start_carries_duals_and_proximal_weight():
+    first = solve_exposure_qp(B, GRID[0], 0.0, 0.2)
+    warm = solve_exposure_qp(B, GRID[1], 0.0, 0.2, w0=first['weights'],
+                             lam0=first['lam'], rho0=100.0 * first['rho'])
+    assert warm['converged']
+    assert warm['objective'] == pytest.approx(solve_exposure_qp(B, GRID[1], 0.0, 0.2)['objective'], abs=1e-9)
+
+
+def test_batch_warns_when_a_target_does_not_converge():
+    with pytest.warns(RuntimeWarning, match='did not converge'):
+        batch = optimize_portfolio_batch(B, GRID[:2], bounds=(0.0, 0.2), tol=-1.0)
+    assert not batch['converged'].any()
+
+
+def _cardinality_problem(seed=0, n_assets=300):
+    rng = np.random.default_rng(seed)
+    betas = np.hstack([rng.normal([1.0, 0.2, 0.1, 0.1], [0.3, 0.5, 0.5, 0.4], (n_assets, 4)),
+                       rng.normal(0.0, 0.5, (n_assets, 4))])
+    return betas, rng.normal(0.3, 0.6, 8)
+
+
+def test_cardinality_swaps_improve_on_the_starting_selection():
+    betas, target = _cardinality_problem()
+    start = solve_cardinality_qp(betas, target, 6, 0.05, 0.4, time_budget=0.0)
+    result = solve_cardinality_qp(betas, target, 6, 0.05, 0.4)
+    assert start['swaps'] == 0
+    assert result['swaps'] > 0 and result['objective'] < start['objective']
+    assert len(result['selected']) <= 6
+    held = result['weights'][result['selected']]
+    assert np.isclose(held.sum(), 1.0) and held.min() >= 0.05 - 1e-12 and held.max() <= 0.4 + 1e-12
+    assert result['lower_bound'] <= result['objective']
+
+
+BETAS = pd.DataFrame(B, index=[f'A{i}' for i in range(N_ASSETS)], columns=FACTOR_COLS)
+SECTORS = {asset: f'S{i % 4}' for i, asset in enumerate(BETAS.index)}
+TARGET = np.array([1.2, 0.6, 0.5, 0.3])
+
+
+def _reference(G, h, lb, ub):
+    """SLSQP solve of the same constrained problem"""
+    G = G.toarray()
+    result = minimize(lambda w: np.sum((B.T @ w - TARGET) ** 2), np.full(N_ASSETS, 1.0 / N_ASSETS),
+                      jac=lambda w: 2.0 * B @ (B.T @ w - TARGET), method='SLSQP',
+                      bounds=[(lb, ub)] * N_ASSETS,
+                      constraints=[{'type': 'eq', 'fun': lambda w: w.sum() - 1.0},
+                                   {'type': 'ineq', 'fun': lambda w: h - G @ w}],
+                      options={'ftol': 1e-12, 'maxiter': 1000})
+    assert result.success
+    return result.fun
+
+
+@pytest.mark.parametrize('constraints', [
+    LinearConstraints().add_groups(SECTORS, upper=0.3),
+    LinearConstraints().add_group('Basket', ['A0', 'A1', 'A2', 'A3', 'A4'], lower=0.2, upper=0.25),
+    LinearConstraints().add_factor_band('SMB', upper=0.5).add_factor_band('HML', lower=0.1, upper=0.4),
+], ids=['sector caps', 'group band', 'factor bands'])
+def test_constrained_solve_meets_the_constraints_and_the_reference(constraints):
+    G, h, _ = constraints.compile(BETAS)
+    result = solve_constrained_qp(B, TARGET, G, h, 0.0, 0.2)
+    assert result['converged']
+    w = result['weights']
+    assert np.isclose(w.sum(), 1.0) and w.min() >= 0.0 and w.max() <= 0.2 + 1e-12
+    assert np.all(G @ w - h <= 1e-8)
+    # The constraints bind: the unconstrained optimum is strictly better
+    assert solve_exposure_qp(B, TARGET, 0.0, 0.2)['objective'] < result['objective'] - 1e-6
+    assert result['objective'] == pytest.approx(_reference(G, h, 0.0, 0.2), abs=1e-7)
+
+
+def test_infeasible_constraints_are_reported():
+    constraints = LinearConstraints().add_groups(SECTORS, upper=0.2)
+    G, h, _ = constraints.compile(BETAS)
+    assert not constraints.check_feasible(BETAS, 0.0, 0.2)
+    result = solve_constrained_qp(B, TARGET, G, h, 0.0, 0.2, max_iter=10)
+    assert not result['converged'] and result['violation'] > 1e-8
+
+    result = optimize_portfolio(BETAS, dict(zip(FACTOR_COLS, TARGET)), max_weight=0.2,
+                                constraints=constraints)
+    assert not result['success']
+    assert result['error'] == "The group, sector and factor-band constraints cannot all be met within the weight bounds"
+
+
+CURRENT = np.where(np.arange(N_ASSETS) < 5, 0.2, 0.0)
+
+
+def test_turnover_cap_binds_and_holds():
+    free = solve_rebalance_qp(B, TARGET, CURRENT, 0.0, ub=0.2)
+    cap = 0.5 * free['turnover']
+    capped = solve_rebalance_qp(B, TARGET, CURRENT, 0.0, turnover_cap=cap, ub=0.2)
+    assert capped['converged'] and capped['turnover_multiplier'] > 0
+    assert cap * (1.0 - 1e-4) <= capped['turnover'] <= cap + 1e-8
+    assert np.sum(np.abs(capped['weights'] - CURRENT)) <= cap + 1e-8
+    assert capped['tracking_objective'] > free['tracking_objective']
+
+
+def test_zero_cost_rebalance_is_the_plain_exposure_qp():
+    plain = solve_exposure_qp(B, TARGET, 0.0, 0.2)
+    for penalty in ('l1', 'quadratic'):
+        result = solve_rebalance_qp(B, TARGET, CURRENT, 0.0, penalty=penalty, ub=0.2)
+        assert result['converged'] and result['transaction_cost'] == 0.0
+        assert result['objective'] == pytest.approx(plain['objective'], abs=1e-9)
+
+
+@pytest.mark.parametrize('penalty', ['l1', 'quadratic'])
+def test_higher_costs_stay_closer_to_current_holdings(penalty):
+    distances = []
+    for cost in [0.0, 1e-3, 1e-2, 0.05, 0.2, 1.0]:
+        result = solve_rebalance_qp(B, TARGET, CURRENT, cost, penalty=penalty, ub=0.2)
+        assert result['converged']
+        step = result['weights'] - CURRENT
+        # The quantity each penalty prices is non-increasing in its cost
+        distances.append(np.sum(np.abs(step)) if penalty == 'l1' else np.sum(step ** 2))
+    assert np.all(np.diff(distances) <= 1e-6)
+    assert distances[-1] < distances[0]
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from ff_portfolio.pipeline import build_return_panels
+
+
+def make_data(n_days=90, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2023-01-02', periods=n_days)
+    prices = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.01, (n_days, 3)), axis=0)),
+                          index=dates, columns=['AAA', 'BBB', 'CCC'])
+    factors = pd.DataFrame(rng.normal(0, 0.5, (n_days, 5)), index=dates,
+                           columns=['Mkt-RF', 'SMB', 'HML', 'RMW', 'RF'])
+    factors['RF'] = 0.01
+    return prices, factors
+
+
+def month_end_returns(prices):
+    month_end = prices.groupby(prices.index.to_period('M')).tail(1)
+    return month_end.pct_change().iloc[1:]
+
+
+def test_price_gap_keeps_monthly_return_exact():
+    prices, factors = make_data()
+    full = build_return_panels(prices, factors, freqs=('monthly',))['monthly'][0]
+    gapped_prices = prices.copy()
+    gapped_prices.iloc[30, 0] = np.nan
+    gapped = build_return_panels(gapped_prices, factors, freqs=('monthly',))['monthly'][0]
+
+    expected = month_end_returns(prices)['AAA'].to_numpy()
+    np.testing.assert_allclose(gapped['AAA'].iloc[1:].to_numpy(), expected, rtol=1e-12)
+    pd.testing.assert_frame_equal(gapped, full)
+
+
+def test_partial_periods_are_nan():
+    prices, factors = make_data()
+    prices.iloc[:25, 1] = np.nan    # listed in February
+    prices.iloc[70:, 2] = np.nan    # delisted in April
+    returns = build_return_panels(prices, factors, freqs=('monthly',))['monthly'][0]
+
+    assert returns['BBB'].loc['2023-02'].isna().all()
+    assert returns['BBB'].loc['2023-03'].notna().all()
+    assert returns['CCC'].loc['2023-03'].notna().all()
+    assert returns['CCC'].loc['2023-04'].isna().all()
+
+
+def test_long_short_factors_are_summed():
+    prices, factors = make_data()
+    monthly = build_return_panels(prices, factors, freqs=('monthly',))['monthly'][1]
+    daily = factors.iloc[1:] / 100.0
+    by_month = daily.groupby(daily.index.to_period('M'))
+
+    for col in ['SMB', 'HML', 'RMW']:
+        np.testing.assert_allclose(monthly[col].to_numpy(), by_month[col].sum().to_numpy(), rtol=1e-12)
+    market = by_month.apply(lambda f: np.prod(1 + f['Mkt-RF'] + f['RF']) - np.prod(1 + f['RF']))
+    np.testing.assert_allclose(monthly['Mkt-RF'].to_numpy(), market.to_numpy(), rtol=1e-12)
+
+
+def test_prices_past_the_factor_file_are_dropped():
+    prices, factors = make_data(n_days=110)
+    # Factors end on 2023-03-15, prices run into May
+    trailing = factors.loc[:'2023-03-15']
+    panels = build_return_panels(prices, trailing, freqs=('daily', 'weekly', 'monthly'))
+
+    daily_returns, daily_factors = panels['daily']
+    assert daily_factors.index.max() == pd.Timestamp('2023-03-15')
+    assert daily_returns.index.equals(daily_factors.index)
+
+    # March is incomplete on the factor side; only January and February remain
+    monthly_returns, monthly_factors = panels['monthly']
+    assert list(monthly_factors.index) == [pd.Timestamp('2023-01-31'), pd.Timestamp('2023-02-28')]
+    assert (monthly_factors != 0.0).all().all()
+    full = build_return_panels(prices, factors, freqs=('monthly',))['monthly'][1]
+    pd.testing.assert_frame_equal(monthly_factors, full.loc[:'2023-02'])
+
+    # The week of 2023-03-15 is cut off too
+    weekly_factors = panels['weekly'][1]
+    assert weekly_factors.index.max() == pd.Timestamp('2023-03-10')
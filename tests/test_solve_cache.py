@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from ff_portfolio.betas import FACTOR_COLS
+from ff_portfolio.solve_cache import SolveCache
+
+rng = np.random.default_rng(0)
+BETAS = pd.DataFrame(rng.normal([1.0, 0.2, 0.1, 0.1], [0.2, 0.4, 0.4, 0.3], (20, 4)),
+                     index=[f'A{i}' for i in range(20)], columns=FACTOR_COLS)
+TARGETS = {'Mkt-RF': 1.0, 'SMB': 0.2, 'HML': 0.1, 'RMW': 0.0}
+
+
+def test_callers_get_independent_copies():
+    cache = SolveCache()
+    first = cache.optimize(BETAS, TARGETS, max_weight=0.2)
+    expected = first['weights'].copy()
+    first['weights'][:] = 0.0
+    first['portfolio_exposures']['SMB'] = 99.0
+
+    second = cache.optimize(BETAS, TARGETS, max_weight=0.2)
+    assert cache.hits == 1 and cache.misses == 1
+    np.testing.assert_array_equal(second['weights'], expected)
+    assert second['portfolio_exposures']['SMB'] != 99.0
+
+    second['weights'][:] = 1.0
+    third = cache.optimize(BETAS, TARGETS, max_weight=0.2)
+    assert third['weights'] is not second['weights']
+    np.testing.assert_array_equal(third['weights'], expected)
@@ -0,0 +1,75 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from ff_portfolio.betas import FACTOR_COLS, RF_COL
+from ff_portfolio.store import BetaCache, data_vintage
+
+
+def _data(seed, n_months=36, n_assets=5):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2021-01-31', periods=n_months, freq='ME')
+    factors = pd.DataFrame(rng.normal(0.0, 0.03, (n_months, len(FACTOR_COLS) + 1)), index=dates,
+                           columns=FACTOR_COLS + [RF_COL])
+    returns = pd.DataFrame(rng.normal(0.01, 0.05, (n_months, n_assets)), index=dates,
+                           columns=[f'A{i}' for i in range(n_assets)])
+    return returns, factors
+
+
+def _publish(root, name, mtime):
+    path = os.path.join(root, name)
+    os.makedirs(path)
+    os.utime(path, (mtime, mtime))
+
+
+def test_prune_never_removes_the_vintage_being_returned(tmp_path):
+    cache = BetaCache(str(tmp_path), keep_vintages=2)
+    for mtime, name in enumerate(['old', 'returned', 'newer', 'newest']):
+        _publish(str(tmp_path), name, 1_000_000 + mtime)
+
+    cache._prune(keep='returned')
+    assert sorted(os.listdir(tmp_path)) == ['newest', 'returned']
+
+
+def test_get_survives_a_concurrent_prune(tmp_path, monkeypatch):
+    returns, factors = _data(0)
+    cache = BetaCache(str(tmp_path), keep_vintages=1)
+    vintage = data_vintage(returns, factors)
+    expected = cache.get(returns, factors, vintage=vintage)[0].to_numpy().copy()
+
+    # Another process prunes the vintage right after this one found it on disk
+    load = BetaCache._load
+    calls = []
+
+    def pruned_once(self, path):
+        calls.append(path)
+        if len(calls) == 1:
+            shutil.rmtree(path)
+        return load(self, path)
+
+    monkeypatch.setattr(BetaCache, '_load', pruned_once)
+    betas = cache.get(returns, factors, vintage=vintage)[0]
+    assert len(calls) == 2
+    np.testing.assert_allclose(betas.to_numpy(), expected)
+
+
+def test_publishing_keeps_the_requested_vintage(tmp_path):
+    cache = BetaCache(str(tmp_path), keep_vintages=1)
+    first, second = _data(0), _data(1)
+    cache.get(*first)
+    cache.get(*second)
+    assert os.listdir(tmp_path) == [data_vintage(*second)]
+
+
+def test_vintage_depends_on_index_content_not_identity():
+    def build():
+        returns, factors = _data(0)
+        returns.index = pd.Index([f'{date:%Y-%m}' for date in returns.index], dtype=object)
+        return returns, factors
+
+    first, second = build(), build()
+    assert data_vintage(*first) == data_vintage(*second)
+    revised = build()[0].rename(index={'2021-01': '2020-12'})
+    assert data_vintage(revised, second[1]) != data_vintage(*second)